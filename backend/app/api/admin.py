@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from app.core.database import get_db
+from app.core.resources import resource_usage
+from app.core.security import admin_required
+from app.services.maintenance import storage_stats
+
+
+router = APIRouter(dependencies=[Depends(admin_required)])
+
+
+class ProfileRequest(BaseModel):
+    route: str
+    requests: int = 10
+
+
+@router.get("/latency")
+async def get_route_latency(request: Request):
+    """Per-route latency percentiles with DuckDB vs Python time"""
+    return request.app.state.profiler.summary()
+
+
+@router.get("/slow-requests")
+async def get_slow_requests(request: Request, limit: int = 50):
+    """Most recent requests over the slow threshold, with their SQL"""
+    return list(request.app.state.profiler.slow_requests)[-limit:][::-1]
+
+
+@router.post("/profile")
+async def arm_profiler(body: ProfileRequest, request: Request):
+    """Attach the sampling profiler to the next N requests of a route, e.g. "GET /api/v1/alerts/" """
+    if body.requests <= 0:
+        raise HTTPException(status_code=400, detail="requests must be positive")
+    request.app.state.profiler.arm(body.route, body.requests)
+    return {"message": f"Profiling next {body.requests} requests of {body.route}"}
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def get_profile(route: str, request: Request):
+    """Collected samples in folded-stack format (feed to flamegraph.pl or speedscope)"""
+    profiler = request.app.state.profiler
+    if route not in profiler.profiles:
+        raise HTTPException(status_code=404, detail="No profile for this route")
+    return profiler.folded_profile(route)
+
+
+@router.get("/resources")
+async def get_resource_usage(request: Request, conn = Depends(get_db)):
+    """DuckDB limits, memory and spill usage, running statements and queued batch jobs"""
+    try:
+        usage = resource_usage(conn)
+        scheduler = request.app.state.job_scheduler
+        usage["batch_jobs"] = {
+            "max_concurrent": scheduler.max_concurrent,
+            "running": scheduler.running(),
+            "pending": scheduler.pending(),
+        }
+        return usage
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/startup")
+async def get_startup_report(request: Request):
+    """Cold-start timings: app import, database open, schema init and background warmup"""
+    return request.app.state.startup.summary()
+
+
+@router.get("/maintenance")
+async def get_maintenance_report(request: Request):
+    """Recent checkpoint/analyze/rebuild passes with bytes reclaimed and time taken"""
+    return request.app.state.maintenance.report()
+
+
+@router.get("/storage")
+async def get_storage_stats(conn = Depends(get_db)):
+    """Current file size and free-block share of the caller's database"""
+    try:
+        return storage_stats(conn)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,40 +1,124 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from datetime import datetime
 from typing import List, Optional
-from app.core.database import get_db
-from app.models.schemas import AlertResponse
+from app.core.database import decoded_rows_by_id, get_db
+from app.models.schemas import AlertResponse, AlertFilters, BulkAlertSelection, BulkStatusUpdate
+from app.services.client_profiles import update_alert_summary
+from app.services.compliance_snapshots import record_snapshot
+from app.services.dashboard_metrics import publish_dashboard_changes
+from app.services.archival import (
+    ALERT_COLUMNS, archive_root, archived_alert, archived_evidence, archived_trades_by_id, unified_alerts_sql,
+)
 
 router = APIRouter()
 
+VALID_STATUSES = ["OPEN", "IN_REVIEW", "CLOSED", "FALSE_POSITIVE"]
+
+def build_alert_filters(filters: AlertFilters) -> tuple[str, list]:
+    """SQL predicate (starting with ' AND', or empty) and params for an alert filter set."""
+    clauses = ""
+    params: list = []
+
+    if filters.severity:
+        clauses += " AND severity = ?"
+        params.append(filters.severity.upper())
+
+    if filters.status:
+        clauses += " AND status = ?"
+        params.append(filters.status.upper())
+
+    if filters.client_id:
+        clauses += " AND client_id = ?"
+        params.append(filters.client_id)
+
+    if filters.rule_name:
+        clauses += " AND rule_name = ?"
+        params.append(filters.rule_name)
+
+    if filters.start_date:
+        clauses += " AND created_at >= ?"
+        params.append(filters.start_date)
+
+    if filters.end_date:
+        clauses += " AND created_at <= ?"
+        params.append(filters.end_date)
+
+    risk_expr = "TRY_CAST(json_extract(data_json, '$.risk_score') AS DOUBLE)"
+    if filters.min_risk is not None:
+        clauses += f" AND {risk_expr} >= ?"
+        params.append(filters.min_risk)
+
+    if filters.max_risk is not None:
+        clauses += f" AND {risk_expr} <= ?"
+        params.append(filters.max_risk)
+
+    return clauses, params
+
+def _selection_predicate(selection: BulkAlertSelection) -> tuple[str, list]:
+    if selection.alert_ids is None and selection.filters is None:
+        raise HTTPException(status_code=400, detail="Provide alert_ids or filters")
+    where = "WHERE 1=1"
+    params: list = []
+    if selection.alert_ids is not None:
+        if not selection.alert_ids:
+            raise HTTPException(status_code=400, detail="alert_ids must not be empty")
+        where += " AND alert_id IN (SELECT UNNEST(?))"
+        params.append(selection.alert_ids)
+    if selection.filters is not None:
+        clauses, filter_params = build_alert_filters(selection.filters)
+        if not clauses:
+            # An empty filter set would select every alert
+            raise HTTPException(status_code=400, detail="filters must set at least one criterion")
+        where += clauses
+        params.extend(filter_params)
+    return where, params
+
+def _refresh_aggregates(request: Request, conn) -> None:
+    # Once per (bulk) operation, not per alert
+    try:
+        record_snapshot(conn)
+    except Exception as e:
+        print(f"Compliance snapshot refresh failed: {e}")
+    try:
+        update_alert_summary(conn)
+    except Exception as e:
+        print(f"Client profile alert refresh failed: {e}")
+    publish_dashboard_changes(request.app.state.events, request.state.tenant_id, conn)
+
+def _refresh_client_alerts(conn, alert_id: str) -> None:
+    # Only the alert's own client needs its open-alert summary recomputed
+    owner = conn.execute("SELECT client_id FROM alerts WHERE alert_id = ?", [alert_id]).fetchone()
+    if owner and owner[0]:
+        update_alert_summary(conn, [owner[0]])
+
 @router.get("/", response_model=List[AlertResponse])
 async def get_alerts(
+    request: Request,
     limit: int = 50,
     offset: int = 0,
     severity: Optional[str] = None,
     status: Optional[str] = None,
     client_id: Optional[str] = None,
     rule_name: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_risk: Optional[float] = None,
+    max_risk: Optional[float] = None,
+    include_archived: bool = False,
     conn = Depends(get_db),
 ):
     """Get alerts with optional filtering"""
     try:
-        query = "SELECT * FROM alerts WHERE 1=1"
-        params: list = []
-
-        if severity:
-            query += " AND severity = ?"
-            params.append(severity.upper())
-
-        if status:
-            query += " AND status = ?"
-            params.append(status.upper())
-
-        if client_id:
-            query += " AND client_id = ?"
-            params.append(client_id)
-
-        if rule_name:
-            query += " AND rule_name = ?"
-            params.append(rule_name)
+        if include_archived:
+            source = f"({unified_alerts_sql(archive_root(request.state.tenant_id))}) AS alerts"
+        else:
+            source = "alerts"
+        filters = AlertFilters(
+            severity=severity, status=status, client_id=client_id, rule_name=rule_name,
+            start_date=start_date, end_date=end_date, min_risk=min_risk, max_risk=max_risk,
+        )
+        clauses, params = build_alert_filters(filters)
+        query = f"SELECT {', '.join(ALERT_COLUMNS)} FROM {source} WHERE 1=1{clauses}"
 
         query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
         params.extend([limit, offset])
@@ -89,11 +173,100 @@ async def get_alert_stats(conn = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.put("/bulk/status")
+async def bulk_update_alert_status(request: Request, body: BulkStatusUpdate, conn = Depends(get_db)):
+    """Update the status of every alert matching the ids and/or filters in one statement"""
+    if body.status.upper() not in VALID_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    where, params = _selection_predicate(body)
+    try:
+        conn.begin()
+        try:
+            updated = conn.execute(
+                f"UPDATE alerts SET status = ? {where}", [body.status.upper(), *params]
+            ).fetchone()[0]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        _refresh_aggregates(request, conn)
+        return {"message": f"{updated} alerts updated to {body.status.upper()}", "updated": updated}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/bulk/delete")
+async def bulk_delete_alerts(request: Request, body: BulkAlertSelection, conn = Depends(get_db)):
+    """Delete every alert matching the ids and/or filters in one statement"""
+    where, params = _selection_predicate(body)
+    try:
+        conn.begin()
+        try:
+            conn.execute(f"DELETE FROM alert_evidence WHERE alert_id IN (SELECT alert_id FROM alerts {where})", params)
+            deleted = conn.execute(f"DELETE FROM alerts {where}", params).fetchone()[0]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        _refresh_aggregates(request, conn)
+        return {"message": f"{deleted} alerts deleted", "deleted": deleted}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{alert_id}/evidence")
+async def get_alert_evidence(request: Request, alert_id: str, limit: int = 1000, conn = Depends(get_db)):
+    """Trades and orders that triggered an alert, looked up by id through alert_evidence.
+
+    Archived alerts resolve through their archived evidence, and trades that
+    have moved to the archive are read from it. Orders are never archived, so
+    ids that resolve nowhere are reported in missing_trade_ids/missing_order_ids.
+    """
+    try:
+        root = archive_root(request.state.tenant_id)
+        archived = False
+        alert = conn.execute("SELECT rule_name FROM alerts WHERE alert_id = ?", [alert_id]).fetchone()
+        if alert:
+            links = conn.execute(
+                "SELECT kind, record_id FROM alert_evidence WHERE alert_id = ? ORDER BY record_id", [alert_id]
+            ).fetchall()
+        else:
+            alert = archived_alert(conn, root, alert_id)
+            if not alert:
+                raise HTTPException(status_code=404, detail="Alert not found")
+            archived = True
+            links = archived_evidence(conn, root, alert_id, alert[1])
+        trade_ids = [record_id for kind, record_id in links if kind == "trade"]
+        order_ids = [record_id for kind, record_id in links if kind == "order"]
+
+        trades = decoded_rows_by_id(conn, "trades", trade_ids[:limit])
+        found = {t["trade_id"] for t in trades}
+        cold = [t for t in trade_ids[:limit] if t not in found]
+        if cold:
+            trades += archived_trades_by_id(conn, root, cold)
+            found = {t["trade_id"] for t in trades}
+        orders = decoded_rows_by_id(conn, "orders", order_ids[:limit])
+        found_orders = {o["order_id"] for o in orders}
+        return {
+            "alert_id": alert_id,
+            "rule_name": alert[0],
+            "archived": archived,
+            "trade_count": len(trade_ids),
+            "order_count": len(order_ids),
+            "truncated": len(trade_ids) > limit or len(order_ids) > limit,
+            "trades": trades,
+            "orders": orders,
+            "missing_trade_ids": [t for t in trade_ids[:limit] if t not in found],
+            "missing_order_ids": [o for o in order_ids[:limit] if o not in found_orders],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.put("/{alert_id}/status")
-async def update_alert_status(alert_id: str, status: str, conn = Depends(get_db)):
+async def update_alert_status(request: Request, alert_id: str, status: str, conn = Depends(get_db)):
     """Update alert status"""
     try:
-        if status.upper() not in ["OPEN", "IN_REVIEW", "CLOSED", "FALSE_POSITIVE"]:
+        if status.upper() not in VALID_STATUSES:
             raise HTTPException(status_code=400, detail="Invalid status")
 
         result = conn.execute(
@@ -102,17 +275,24 @@ async def update_alert_status(alert_id: str, status: str, conn = Depends(get_db)
         )
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Alert not found")
+        _refresh_client_alerts(conn, alert_id)
+        publish_dashboard_changes(request.app.state.events, request.state.tenant_id, conn)
         return {"message": f"Alert {alert_id} status updated to {status}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{alert_id}")
-async def delete_alert(alert_id: str, conn = Depends(get_db)):
+async def delete_alert(request: Request, alert_id: str, conn = Depends(get_db)):
     """Delete a specific alert"""
     try:
+        owner = conn.execute("SELECT client_id FROM alerts WHERE alert_id = ?", [alert_id]).fetchone()
+        conn.execute("DELETE FROM alert_evidence WHERE alert_id = ?", [alert_id])
         result = conn.execute("DELETE FROM alerts WHERE alert_id = ?", [alert_id])
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Alert not found")
+        if owner and owner[0]:
+            update_alert_summary(conn, [owner[0]])
+        publish_dashboard_changes(request.app.state.events, request.state.tenant_id, conn)
         return {"message": f"Alert {alert_id} deleted"}
     except HTTPException:
         raise
@@ -1,6 +1,8 @@
+from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from app.core.security import create_access_token
+from app.core.config import settings
+from app.core.security import create_access_token, TENANT_ID_RE
 
 
 router = APIRouter()
@@ -9,13 +11,16 @@ router = APIRouter()
 class LoginRequest(BaseModel):
     username: str
     password: str
+    tenant_id: Optional[str] = None
 
 
 @router.post("/login")
 async def login(body: LoginRequest):
     # Simple demo auth: single admin user. Replace with real user store.
     if body.username == "admin" and body.password == "admin123":
-        token = create_access_token(subject=body.username, role="admin")
+        if settings.multi_tenant and not (body.tenant_id and TENANT_ID_RE.match(body.tenant_id)):
+            raise HTTPException(status_code=400, detail="A valid tenant_id is required")
+        token = create_access_token(subject=body.username, role="admin", tenant_id=body.tenant_id)
         return {"access_token": token, "token_type": "bearer"}
     raise HTTPException(status_code=401, detail="Invalid credentials")
 
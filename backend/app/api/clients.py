@@ -0,0 +1,93 @@
+import json
+from fastapi import APIRouter, HTTPException, Depends
+from app.core.database import get_db
+
+router = APIRouter()
+
+PROFILE_COLUMNS = [
+    'total_trades', 'total_notional', 'symbols_traded', 'first_trade', 'last_trade',
+    'total_orders', 'last_order', 'open_alerts', 'open_alerts_by_rule', 'last_alert_at', 'updated_at'
+]
+CLIENT_COLUMNS = ['client_id', 'client_name', 'client_type', 'risk_rating', 'account_status', 'created_date']
+
+@router.get("/{client_id}/profile")
+async def get_client_profile(client_id: str, days: int = 30, recent_alerts: int = 10, conn = Depends(get_db)):
+    """Client 360: master data, activity summary, daily activity by symbol and recent alerts"""
+    try:
+        master = conn.execute(
+            f"SELECT {', '.join(CLIENT_COLUMNS)} FROM clients WHERE client_id = ?", [client_id]
+        ).fetchone()
+        summary = conn.execute(
+            f"SELECT {', '.join(PROFILE_COLUMNS)} FROM client_profiles WHERE client_id = ?", [client_id]
+        ).fetchone()
+        if master is None and summary is None:
+            raise HTTPException(status_code=404, detail="Client not found")
+
+        profile = dict(zip(PROFILE_COLUMNS, summary)) if summary else {}
+        profile["open_alerts_by_rule"] = json.loads(profile.get("open_alerts_by_rule") or "{}")
+
+        # update_trade_activity writes each batch in client_key order, so a client's rows sit in a few
+        # row groups per batch; resolving the key first makes it a constant filter the scan checks
+        # against row-group min/max to skip the rest, and only aggregated or date-limited rows come back
+        key = conn.execute("SELECT client_key FROM client_dim WHERE client_id = ?", [client_id]).fetchone()
+        client_key = key[0] if key else None
+
+        by_symbol = conn.execute("""
+            SELECT s.symbol, SUM(a.trades), SUM(a.notional), SUM(a.buy_quantity - a.sell_quantity), MAX(a.last_trade)
+            FROM client_activity_daily a
+            JOIN symbol_dim s ON s.symbol_key = a.symbol_key
+            WHERE a.client_key = ?
+            GROUP BY s.symbol
+            ORDER BY 2 DESC, s.symbol
+        """, [client_key]).fetchall()
+
+        # Only the client's `days` most recent trading days
+        daily = conn.execute("""
+            SELECT s.symbol, a.trade_date, a.trades, ROUND(a.notional, 2), a.buy_quantity, a.sell_quantity
+            FROM client_activity_daily a
+            JOIN symbol_dim s ON s.symbol_key = a.symbol_key
+            WHERE a.client_key = $client_key
+              AND a.trade_date >= (
+                  SELECT MIN(trade_date) FROM (
+                      SELECT DISTINCT trade_date FROM client_activity_daily
+                      WHERE client_key = $client_key
+                      ORDER BY trade_date DESC
+                      LIMIT $days
+                  )
+              )
+            ORDER BY a.trade_date DESC, a.trades DESC
+        """, {"client_key": client_key, "days": days}).fetchall()
+
+        alerts = conn.execute("""
+            SELECT alert_id, rule_name, severity, description, symbol, status, created_at
+            FROM alerts
+            WHERE client_id = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, [client_id, recent_alerts]).fetchall()
+
+        last_activity = max(
+            (t for t in (profile.get("last_trade"), profile.get("last_order")) if t),
+            default=None,
+        )
+        return {
+            "client_id": client_id,
+            "client": dict(zip(CLIENT_COLUMNS, master)) if master else None,
+            "summary": profile,
+            "last_activity": last_activity,
+            "by_symbol": [
+                dict(zip(["symbol", "trades", "notional", "net_quantity", "last_trade"], row)) for row in by_symbol
+            ],
+            "daily_activity": [
+                dict(zip(["symbol", "trade_date", "trades", "notional", "buy_quantity", "sell_quantity"], row))
+                for row in daily
+            ],
+            "recent_alerts": [
+                dict(zip(["alert_id", "rule_name", "severity", "description", "symbol", "status", "created_at"], a))
+                for a in alerts
+            ],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
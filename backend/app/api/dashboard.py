@@ -1,48 +1,32 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+import json
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from app.core.database import get_db
+from app.core.events import format_sse
 from app.models.schemas import DashboardStats
+from app.core.config import settings
+from app.services.dashboard_metrics import dashboard_stats, compliance_score, publish_dashboard_changes
+from app.services.sketches import approximate_top_symbols
 
 router = APIRouter()
 
 @router.get("/stats", response_model=DashboardStats)
-async def get_dashboard_stats(conn = Depends(get_db)):
+async def get_dashboard_stats(approximate: Optional[bool] = None, conn = Depends(get_db)):
     """Get comprehensive dashboard statistics"""
     try:
-        # Get alert counts by severity
-        alert_stats = conn.execute("""
-            SELECT 
-                COUNT(*) as total,
-                COUNT(CASE WHEN severity = 'HIGH' THEN 1 END) as high,
-                COUNT(CASE WHEN severity = 'MEDIUM' THEN 1 END) as medium,
-                COUNT(CASE WHEN severity = 'LOW' THEN 1 END) as low,
-                COUNT(CASE WHEN created_at >= CURRENT_DATE THEN 1 END) as today
-            FROM alerts
-        """).fetchone()
-        
-        # Get trade and client counts
-        trade_count = conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
-        client_count = conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
-        # If no client master data, approximate active clients by distinct IDs in trades
-        if client_count == 0:
-            client_count = conn.execute("SELECT COUNT(DISTINCT client_id) FROM trades").fetchone()[0]
-        
-        return {
-            "total_alerts": alert_stats[0],
-            "high_risk_alerts": alert_stats[1],
-            "medium_risk_alerts": alert_stats[2],
-            "low_risk_alerts": alert_stats[3],
-            "alerts_today": alert_stats[4],
-            "total_trades": trade_count,
-            "total_clients": client_count
-        }
+        return dashboard_stats(conn, approximate)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/recent-activity")
-async def get_recent_activity(conn = Depends(get_db)):
+async def get_recent_activity(approximate: Optional[bool] = None, conn = Depends(get_db)):
     """Get recent system activity"""
     try:
+        approximate = settings.approximate_analytics if approximate is None else approximate
         # Recent alerts
         recent_alerts = conn.execute("""
             SELECT alert_id, rule_name, severity, description, created_at
@@ -51,15 +35,26 @@ async def get_recent_activity(conn = Depends(get_db)):
             LIMIT 10
         """).fetchall()
         
-    # Recent trades by symbol
-        symbol_activity = conn.execute("""
-            SELECT symbol, COUNT(*) as trade_count, MAX(timestamp) as last_trade
-            FROM trades 
-            WHERE timestamp >= NOW() - INTERVAL 1 DAY
-            GROUP BY symbol
-            ORDER BY trade_count DESC
-            LIMIT 5
-        """).fetchall()
+        # Recent trades by symbol
+        if approximate:
+            symbol_activity = [
+                (s["symbol"], s["trade_count"], s["last_trade"]) for s in approximate_top_symbols(conn, 5)
+            ]
+        else:
+            symbol_activity = conn.execute("""
+                WITH top_symbols AS (
+                    SELECT symbol_key, COUNT(*) as trade_count, MAX(timestamp) as last_trade
+                    FROM trades 
+                    WHERE timestamp >= NOW() - INTERVAL 1 DAY
+                    GROUP BY symbol_key
+                    ORDER BY trade_count DESC
+                    LIMIT 5
+                )
+                SELECT s.symbol, t.trade_count, t.last_trade
+                FROM top_symbols t
+                JOIN symbol_dim s ON s.symbol_key = t.symbol_key
+                ORDER BY t.trade_count DESC
+            """).fetchall()
         
         return {
             "recent_alerts": [
@@ -79,7 +74,8 @@ async def get_recent_activity(conn = Depends(get_db)):
                     "last_trade": symbol[2]
                 }
                 for symbol in symbol_activity
-            ]
+            ],
+            "approximate": approximate
         }
         
     except Exception as e:
@@ -89,53 +85,130 @@ async def get_recent_activity(conn = Depends(get_db)):
 async def get_compliance_score(conn = Depends(get_db)):
     """Calculate overall compliance score"""
     try:
-        # Calculate compliance metrics (demo-friendly)
-        total_trades = conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
-        low_open = conn.execute("SELECT COUNT(*) FROM alerts WHERE severity = 'LOW' AND status = 'OPEN'").fetchone()[0]
-        med_open = conn.execute("SELECT COUNT(*) FROM alerts WHERE severity = 'MEDIUM' AND status = 'OPEN'").fetchone()[0]
-        high_open = conn.execute("SELECT COUNT(*) FROM alerts WHERE severity = 'HIGH' AND status = 'OPEN'").fetchone()[0]
-
-        if total_trades == 0:
-            # No data uploaded yet - show neutral state
-            compliance_score = 100.0
-            risk_level = "LOW"
-        else:
-            # Calculate score based on alerts vs trades
-            total_open_alerts = low_open + med_open + high_open
-            if total_open_alerts == 0:
-                compliance_score = 100.0
-            else:
-                # Score decreases with more alerts relative to trades
-                compliance_score = max(0.0, 100.0 - (total_open_alerts / total_trades) * 100)
-            
-            # Determine risk level based on score and high-risk alerts
-            if high_open > 0 or compliance_score < 50:
-                risk_level = "HIGH"
-            elif compliance_score < 80:
-                risk_level = "MEDIUM"
-            else:
-                risk_level = "LOW"
-        
-        return {
-            "compliance_score": round(compliance_score, 2),
-            "total_trades": total_trades,
-            "open_alerts": low_open + med_open + high_open,
-            "high_risk_alerts": high_open,
-            "risk_level": risk_level
-        }
+        return compliance_score(conn)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/compliance-score/history")
+async def get_compliance_score_history(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = 1000,
+    conn = Depends(get_db),
+):
+    """Daily compliance-score snapshots for trend charts, oldest first"""
+    try:
+        query = """
+            SELECT snapshot_date, compliance_score, risk_level, total_trades, trades_on_day,
+                   open_alerts, open_high, open_medium, open_low, rule_counts_json
+            FROM compliance_snapshots WHERE 1=1
+        """
+        params: list = []
+        if start_date:
+            query += " AND snapshot_date >= ?"
+            params.append(start_date)
+        if end_date:
+            query += " AND snapshot_date <= ?"
+            params.append(end_date)
+        # Latest `limit` days, returned in chronological order
+        query = f"SELECT * FROM ({query} ORDER BY snapshot_date DESC LIMIT ?) ORDER BY snapshot_date"
+        params.append(limit)
+
+        rows = conn.execute(query, params).fetchall()
+        return [
+            {
+                "date": row[0],
+                "compliance_score": row[1],
+                "risk_level": row[2],
+                "total_trades": row[3],
+                "trades_on_day": row[4],
+                "open_alerts": row[5],
+                "high_risk_alerts": row[6],
+                "medium_risk_alerts": row[7],
+                "low_risk_alerts": row[8],
+                "open_alerts_by_rule": json.loads(row[9] or "{}"),
+            }
+            for row in rows
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stream")
+async def stream_dashboard_events(
+    request: Request,
+    last_event_id: Optional[int] = None,
+    heartbeat_seconds: float = 15.0,
+    conn = Depends(get_db),
+):
+    """Server-sent events: stats deltas, compliance-score deltas and new alerts.
+
+    Resumes from the Last-Event-ID header (or `last_event_id`) when those events
+    are still buffered; otherwise starts with a full `snapshot` event.
+    """
+    events = request.app.state.events
+    tenant_id = request.state.tenant_id
+    header_id = request.headers.get("last-event-id")
+    if last_event_id is None and header_id and header_id.isdigit():
+        last_event_id = int(header_id)
+
+    queue = events.subscribe(tenant_id)
+    backlog = events.replay(tenant_id, last_event_id) if last_event_id is not None else None
+    if backlog is None:
+        # First connect (or too far behind): send current values, computed once and shared
+        if events.latest_values(tenant_id, "stats") is None:
+            publish_dashboard_changes(events, tenant_id, conn)
+        snapshot = {
+            "stats": events.latest_values(tenant_id, "stats"),
+            "compliance_score": events.latest_values(tenant_id, "compliance_score"),
+        }
+        backlog = [{"id": events.last_event_id(tenant_id), "type": "snapshot", "data": snapshot}]
+
+    async def event_stream():
+        sent_id = backlog[-1]["id"] if backlog else (last_event_id or 0)
+        try:
+            for event in backlog:
+                yield format_sse(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                if event is None:
+                    break
+                if event["id"] > sent_id:
+                    sent_id = event["id"]
+                    yield format_sse(event)
+        finally:
+            events.unsubscribe(tenant_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/reset-data")
-async def reset_all_data(conn = Depends(get_db)):
+async def reset_all_data(request: Request, conn = Depends(get_db)):
     """Reset all data in the database (for demo purposes)"""
     try:
         # Clear all data from tables
+        conn.execute("DELETE FROM alert_evidence")
         conn.execute("DELETE FROM alerts")
+        conn.execute("DELETE FROM compliance_snapshots")
         conn.execute("DELETE FROM trades")
         conn.execute("DELETE FROM orders")
         conn.execute("DELETE FROM clients")
+        conn.execute("DELETE FROM client_dim")
+        conn.execute("DELETE FROM symbol_dim")
+        conn.execute("DELETE FROM trade_sketches")
+        conn.execute("DELETE FROM client_hourly_activity")
+        conn.execute("DELETE FROM client_activity_daily")
+        conn.execute("DELETE FROM client_profiles")
+        publish_dashboard_changes(request.app.state.events, request.state.tenant_id, conn)
         
         return {"message": "All data has been reset successfully"}
         
@@ -1,14 +1,131 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends
-import pandas as pd
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends, Request, Header
 import io
-import asyncio
-from app.core.database import get_db
+from typing import Optional
+from app.core.database import get_db, load_encoded
+from app.core.profiling import to_thread
+from app.core.resources import GovernedConnection
 from app.services.detection_rules import ComplianceDetector
+from app.core.security import admin_required
+from app.services.archival import archive_root, run_archive
+from app.services.compliance_snapshots import record_snapshot
+from app.services.dashboard_metrics import publish_dashboard_changes
+from app.services.baselines import update_baselines
+from app.models.schemas import UploadSessionCreate
+from app.services.chunked_uploads import UploadSessionError, UploadSessionStore
+from app.services.client_profiles import update_alert_summary, update_order_activity, update_trade_activity
+from app.services.sketches import update_trade_sketches
+from app.services.upload_validation import REQUIRED_COLUMNS, validate_upload, drop_staging
 
 router = APIRouter()
 
+def _detection_job(cursor):
+    try:
+        conn = GovernedConnection(cursor, "batch")
+        alerts = ComplianceDetector(conn).run_all_detectors()
+        try:
+            record_snapshot(conn)
+        except Exception as snapshot_error:
+            print(f"Compliance snapshot failed: {snapshot_error}")
+        try:
+            update_alert_summary(conn)
+        except Exception as profile_error:
+            print(f"Client profile alert refresh failed: {profile_error}")
+        return alerts
+    finally:
+        cursor.close()
+
+async def run_detection_for_tenant(request: Request, conn):
+    """Run all detectors on the caller's database via the fair per-tenant job scheduler."""
+    scheduler = request.app.state.job_scheduler
+    return await scheduler.submit(request.state.tenant_id, _detection_job, conn.cursor())
+
+# Target schemas (as in DuckDB)
+TARGET_COLUMNS = {
+    "orders": [
+        'order_id', 'client_id', 'trader_id', 'symbol', 'side', 'quantity', 'price', 'timestamp', 'order_type'
+    ],
+    "trades": [
+        'trade_id', 'order_id', 'client_id', 'symbol', 'side', 'quantity', 'price', 'timestamp'
+    ],
+    "clients": [
+        'client_id', 'client_name', 'client_type', 'risk_rating', 'account_status', 'created_date'
+    ]
+}
+
+def _load_validated(conn, table_type: str, target_cols: list[str], replace: bool = True) -> None:
+    """Swap (or append) the validated rows in `upload_valid` into the table in one transaction."""
+    # Strict allowlist mapping to real table names
+    table_map = {"orders": "orders", "trades": "trades", "clients": "clients"}
+    target_table = table_map[table_type]
+
+    conn.begin()
+    try:
+        if replace:
+            # Clear existing data for demo/demo reset behavior
+            conn.execute(f"DELETE FROM {target_table}")
+
+        if target_table in ("orders", "trades"):
+            # Orders/trades are stored dictionary-encoded; casts happen in load_encoded
+            load_encoded(conn, target_table, "upload_valid")
+            if target_table == "orders":
+                update_order_activity(conn)
+            if target_table == "trades":
+                if replace:
+                    update_trade_activity(conn)
+                else:
+                    update_trade_activity(
+                        conn, "(SELECT * FROM trades WHERE trade_id IN (SELECT trade_id FROM upload_valid))",
+                        replace=False,
+                    )
+                if replace:
+                    # Uploads replace the table, so the sketches and baselines start over too
+                    conn.execute("DELETE FROM trade_sketches")
+                    conn.execute("DELETE FROM client_hourly_activity")
+                # Only the uploaded rows are added; late trades join their hour's observation
+                update_baselines(conn, "upload_valid")
+                update_trade_sketches(conn, "upload_valid")
+        else:
+            select_exprs = []
+            for col in target_cols:
+                if col == "created_date":
+                    select_exprs.append("CAST(created_date AS DATE) AS created_date")
+                else:
+                    select_exprs.append(col)
+
+            select_sql = ", ".join(select_exprs)
+            insert_sql = f"INSERT INTO {target_table} ({', '.join(target_cols)}) SELECT {select_sql} FROM upload_valid"
+            conn.execute(insert_sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+async def _finish_upload(request: Request, conn, table_type: str, validation: dict) -> dict:
+    # If trades were uploaded, run detection algorithms
+    new_alerts = []
+    if table_type == "trades":
+        try:
+            new_alerts = await run_detection_for_tenant(request, conn)
+            print(f"Generated {len(new_alerts)} alerts for uploaded trades")
+        except Exception as detection_error:
+            print(f"Detection failed but upload successful: {detection_error}")
+            # Don't fail the upload if detection fails
+
+    publish_dashboard_changes(request.app.state.events, request.state.tenant_id, conn, new_alerts)
+
+    return {
+        "message": f"Successfully uploaded {validation['accepted']} records to {table_type}",
+        "records_uploaded": validation["accepted"],
+        "records_rejected": validation["rejected"],
+        "rejection_reasons": validation["rejection_reasons"],
+        "upload_id": validation["upload_id"],
+        "table_type": table_type,
+        "new_alerts_generated": len(new_alerts)
+    }
+
 @router.post("/upload/csv")
 async def upload_csv_data(
+    request: Request,
     file: UploadFile = File(...),
     table_type: str = Form(...),
     conn = Depends(get_db),
@@ -23,8 +140,11 @@ async def upload_csv_data(
         if not contents:
             raise HTTPException(status_code=400, detail="Uploaded file is empty")
 
+        # pandas is imported on first upload (or by the startup warmup), not at app import
+        import pandas as pd
+
         # Offload blocking CSV read to a thread
-        df = await asyncio.to_thread(pd.read_csv, io.StringIO(contents.decode('utf-8')))
+        df = await to_thread(pd.read_csv, io.StringIO(contents.decode('utf-8')))
 
         # Normalize column names (strip spaces)
         df.columns = [c.strip() for c in df.columns]
@@ -33,32 +153,13 @@ async def upload_csv_data(
         if table_type not in ['orders', 'trades', 'clients']:
             raise HTTPException(status_code=400, detail="Invalid table type")
 
-        # Target schemas (as in DuckDB)
-        target_columns_map = {
-            "orders": [
-                'order_id', 'client_id', 'trader_id', 'symbol', 'side', 'quantity', 'price', 'timestamp', 'order_type'
-            ],
-            "trades": [
-                'trade_id', 'order_id', 'client_id', 'symbol', 'side', 'quantity', 'price', 'timestamp'
-            ],
-            "clients": [
-                'client_id', 'client_name', 'client_type', 'risk_rating', 'account_status', 'created_date'
-            ]
-        }
-
-        required_min_cols = {
-            "orders": ['order_id', 'client_id', 'symbol', 'side', 'quantity', 'price', 'timestamp'],
-            "trades": ['trade_id', 'client_id', 'symbol', 'side', 'quantity', 'price', 'timestamp'],
-            "clients": ['client_id', 'client_name']
-        }
-
-        required_columns = required_min_cols[table_type]
+        required_columns = REQUIRED_COLUMNS[table_type]
         missing_required = [c for c in required_columns if c not in df.columns]
         if missing_required:
             raise HTTPException(status_code=400, detail=f"Missing required columns: {missing_required}")
 
         # Add any missing optional columns with None
-        target_cols = target_columns_map[table_type]
+        target_cols = TARGET_COLUMNS[table_type]
         for col in target_cols:
             if col not in df.columns:
                 df[col] = None
@@ -66,63 +167,120 @@ async def upload_csv_data(
         # Reorder columns to match the table schema
         df = df[target_cols]
 
-        # Insert data with explicit casts using shared connection
+        # Validate in bulk, quarantine bad rows, then replace the table in one transaction
         try:
-            # Strict allowlist mapping to real table names
-            table_map = {"orders": "orders", "trades": "trades", "clients": "clients"}
-            target_table = table_map[table_type]
-
-            # Clear existing data for demo/demo reset behavior
-            conn.execute(f"DELETE FROM {target_table}")
-
+            # Bulk validation and load may legitimately outlast the interactive time limit
+            conn.use_profile("batch")
             conn.register("df_temp", df)
-
-            # Build SELECT with casts for key columns
-            select_exprs = []
-            for col in target_cols:
-                if col == "timestamp":
-                    select_exprs.append("CAST(timestamp AS TIMESTAMP) AS timestamp")
-                elif col == "created_date":
-                    select_exprs.append("CAST(created_date AS DATE) AS created_date")
-                elif col == "quantity":
-                    select_exprs.append("CAST(quantity AS INTEGER) AS quantity")
-                elif col == "price":
-                    select_exprs.append("CAST(price AS DECIMAL(10,4)) AS price")
-                else:
-                    select_exprs.append(col)
-
-            select_sql = ", ".join(select_exprs)
-            insert_sql = f"INSERT INTO {target_table} ({', '.join(target_cols)}) SELECT {select_sql} FROM df_temp"
-            conn.execute(insert_sql)
+            validation = validate_upload(conn, table_type, target_cols)
+            _load_validated(conn, table_type, target_cols)
         finally:
+            drop_staging(conn)
             try:
                 conn.unregister("df_temp")
             except Exception:
                 pass
 
-        # If trades were uploaded, run detection algorithms
-        new_alerts = []
-        if table_type == "trades":
-            try:
-                detector = ComplianceDetector(conn)
-                new_alerts = detector.run_all_detectors()
-                print(f"Generated {len(new_alerts)} alerts for uploaded trades")
-            except Exception as detection_error:
-                print(f"Detection failed but upload successful: {detection_error}")
-                # Don't fail the upload if detection fails
+        return await _finish_upload(request, conn, table_type, validation)
 
-        return {
-            "message": f"Successfully uploaded {len(df)} records to {table_type}",
-            "records_uploaded": len(df),
-            "table_type": table_type,
-            "new_alerts_generated": len(new_alerts)
-        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+def _upload_sessions(request: Request) -> UploadSessionStore:
+    return request.app.state.upload_sessions
+
+@router.post("/upload/sessions")
+async def create_upload_session(request: Request, body: UploadSessionCreate, conn = Depends(get_db)):
+    """Start a resumable upload: PUT numbered chunks, then finalize"""
+    if body.table_type not in TARGET_COLUMNS:
+        raise HTTPException(status_code=400, detail="Invalid table type")
+    try:
+        meta = _upload_sessions(request).create(
+            request.state.tenant_id, body.table_type, body.mode, body.total_chunks, body.filename
+        )
+        return {"session_id": meta["session_id"], "table_type": meta["table_type"], "mode": meta["mode"]}
+    except UploadSessionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@router.put("/upload/sessions/{session_id}/chunks/{index}")
+async def put_upload_chunk(
+    request: Request,
+    session_id: str,
+    index: int,
+    x_chunk_sha256: str = Header(...),
+    conn = Depends(get_db),
+):
+    """Store chunk `index` (raw CSV bytes, whole lines; chunk 0 has the header); idempotent"""
+    try:
+        return await _upload_sessions(request).put_chunk(
+            request.state.tenant_id, session_id, index, request.stream(), x_chunk_sha256
+        )
+    except UploadSessionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@router.get("/upload/sessions/{session_id}")
+async def get_upload_session(request: Request, session_id: str, conn = Depends(get_db)):
+    """Received, missing and parsed chunks, for resuming a transfer"""
+    try:
+        return _upload_sessions(request).status(request.state.tenant_id, session_id)
+    except UploadSessionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@router.post("/upload/sessions/{session_id}/finalize")
+async def finalize_upload_session(request: Request, session_id: str, conn = Depends(get_db)):
+    """Validate all chunks and atomically swap (or append) them into the table"""
+    store = _upload_sessions(request)
+    tenant_id = request.state.tenant_id
+    try:
+        meta, files = await store.parsed_files(tenant_id, session_id)
+        table_type = meta["table_type"]
+        missing_required = [c for c in REQUIRED_COLUMNS[table_type] if c not in (meta["header"] or [])]
+        if missing_required:
+            raise HTTPException(status_code=400, detail=f"Missing required columns: {missing_required}")
+
+        target_cols = TARGET_COLUMNS[table_type]
+        header = set(meta["header"])
+        projection = ", ".join(c if c in header else f"NULL AS {c}" for c in target_cols)
+        file_list = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+        try:
+            conn.use_profile("batch")
+            conn.execute(f"""
+                CREATE OR REPLACE TEMP VIEW chunked_upload AS
+                SELECT {projection} FROM read_parquet([{file_list}], union_by_name = true)
+            """)
+            validation = validate_upload(
+                conn, table_type, target_cols, source="chunked_upload",
+                upload_id=session_id, append=meta["mode"] == "append",
+            )
+            _load_validated(conn, table_type, target_cols, replace=meta["mode"] == "replace")
+        finally:
+            drop_staging(conn)
+            conn.execute("DROP VIEW IF EXISTS chunked_upload")
+
+        store.discard(tenant_id, session_id)
+        result = await _finish_upload(request, conn, table_type, validation)
+        result["mode"] = meta["mode"]
+        result["chunks"] = len(files)
+        return result
+    except UploadSessionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+@router.delete("/upload/sessions/{session_id}")
+async def abort_upload_session(request: Request, session_id: str, conn = Depends(get_db)):
+    """Abandon an upload and delete its spooled chunks"""
+    try:
+        _upload_sessions(request).status(request.state.tenant_id, session_id)
+        _upload_sessions(request).discard(request.state.tenant_id, session_id)
+        return {"message": f"Upload session {session_id} discarded"}
+    except UploadSessionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
 @router.get("/tables/info")
 async def get_table_info(conn = Depends(get_db)):
     """Get information about all tables"""
@@ -139,12 +297,48 @@ async def get_table_info(conn = Depends(get_db)):
     
     return tables_info
 
+@router.get("/quarantine")
+async def get_quarantined_rows(
+    upload_id: Optional[str] = None,
+    table_type: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    conn = Depends(get_db),
+):
+    """List rows rejected by upload validation, with their reasons"""
+    try:
+        query = "SELECT upload_id, table_type, source_row, reason, raw_record, quarantined_at FROM upload_quarantine WHERE 1=1"
+        params: list = []
+        if upload_id:
+            query += " AND upload_id = ?"
+            params.append(upload_id)
+        if table_type:
+            query += " AND table_type = ?"
+            params.append(table_type)
+        query += " ORDER BY quarantined_at DESC, source_row LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        rows = conn.execute(query, params).fetchall()
+        return [
+            {
+                "upload_id": row[0],
+                "table_type": row[1],
+                "source_row": row[2],
+                "reason": row[3],
+                "raw_record": row[4],
+                "quarantined_at": row[5],
+            }
+            for row in rows
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/run-detection")
-async def run_detection_manually():
+async def run_detection_manually(request: Request, conn = Depends(get_db)):
     """Manually trigger compliance detection"""
     try:
-        detector = ComplianceDetector()
-        alerts = detector.run_all_detectors()
+        alerts = await run_detection_for_tenant(request, conn)
+        publish_dashboard_changes(request.app.state.events, request.state.tenant_id, conn, alerts)
         
         return {
             "message": "Detection completed successfully",
@@ -154,8 +348,27 @@ async def run_detection_manually():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
 
+def _archive_job(cursor, root):
+    try:
+        return run_archive(GovernedConnection(cursor, "batch"), root)
+    finally:
+        cursor.close()
+
+@router.post("/archive")
+async def archive_cold_data(request: Request, conn = Depends(get_db), _admin = Depends(admin_required)):
+    """Move closed alerts and trades beyond the rule lookback to Parquet"""
+    try:
+        root = archive_root(request.state.tenant_id)
+        result = await request.app.state.job_scheduler.submit(
+            request.state.tenant_id, _archive_job, conn.cursor(), root
+        )
+        publish_dashboard_changes(request.app.state.events, request.state.tenant_id, conn)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Archive failed: {str(e)}")
+
 @router.delete("/clear")
-async def clear_table(table_type: str, conn = Depends(get_db)):
+async def clear_table(request: Request, table_type: str, conn = Depends(get_db)):
     """Clear data from a specific table"""
     try:
         valid_tables = ['trades', 'orders', 'clients', 'alerts']
@@ -163,18 +376,30 @@ async def clear_table(table_type: str, conn = Depends(get_db)):
             raise HTTPException(status_code=400, detail=f"Invalid table type. Must be one of: {valid_tables}")
         
         conn.execute(f"DELETE FROM {table_type}")
+        if table_type == "trades":
+            conn.execute("DELETE FROM trade_sketches")
+            conn.execute("DELETE FROM client_hourly_activity")
+            update_trade_activity(conn)
+        elif table_type == "orders":
+            update_order_activity(conn)
+        elif table_type == "alerts":
+            conn.execute("DELETE FROM alert_evidence")
+            update_alert_summary(conn)
+        publish_dashboard_changes(request.app.state.events, request.state.tenant_id, conn)
         
         return {"message": f"Table '{table_type}' cleared successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to clear table: {str(e)}")
 
 @router.delete("/clear-all")
-async def clear_all_data(conn = Depends(get_db)):
+async def clear_all_data(request: Request, conn = Depends(get_db)):
     """Clear all data from all tables"""
     try:
-        tables = ['alerts', 'trades', 'orders', 'clients']
+        tables = ['alert_evidence', 'alerts', 'compliance_snapshots', 'trades', 'orders', 'clients', 'client_dim', 'symbol_dim', 'trade_sketches', 'client_hourly_activity',
+                  'client_activity_daily', 'client_profiles']
         for table in tables:
             conn.execute(f"DELETE FROM {table}")
+        publish_dashboard_changes(request.app.state.events, request.state.tenant_id, conn)
         
         return {"message": "All data cleared successfully"}
     except Exception as e:
@@ -8,6 +8,68 @@ class Settings(BaseSettings):
     allowed_origins: list[str] = ["http://localhost:3000", "http://localhost:3001"]
     trusted_hosts: list[str] = ["*"]
 
+    # Multi-tenant mode: one DuckDB file per tenant, selected by the JWT `tenant` claim
+    multi_tenant: bool = False
+    tenant_data_dir: str = "tenants"
+    tenant_pool_size: int = 16
+    tenant_idle_seconds: int = 600
+    tenant_memory_limit: str | None = "1GB"
+    max_concurrent_jobs: int = 2
+
+    # DuckDB resource governance: instance limits (unset = DuckDB defaults), spill
+    # directory, and per-statement time limits for API reads vs batch jobs
+    duckdb_memory_limit: str | None = None
+    duckdb_threads: int | None = None
+    duckdb_temp_directory: str | None = None
+    duckdb_max_temp_directory_size: str | None = None
+    interactive_query_timeout_seconds: float = 60
+    batch_query_timeout_seconds: float = 900
+
+    # Import rarely used modules, load rule packs and read hot table columns in
+    # the background after startup, so the first requests don't pay for it
+    startup_warmup: bool = True
+
+    # Storage maintenance: ANALYZE + CHECKPOINT every interval once requests have
+    # been quiet for quiet_seconds; the file is rebuilt when at least this share
+    # of its blocks (and this many bytes) are free
+    maintenance_enabled: bool = True
+    maintenance_interval_seconds: int = 900
+    maintenance_quiet_seconds: int = 60
+    maintenance_rebuild_fragmentation: float = 0.3
+    maintenance_rebuild_min_free_bytes: int = 64 * 1024 * 1024
+    # Requests arriving during a pass wait this long for it, then get 503 + Retry-After
+    maintenance_gate_wait_seconds: float = 10.0
+
+    # Resumable chunked uploads are spooled here until finalized
+    upload_spool_dir: str = "uploads"
+    upload_max_chunk_bytes: int = 256 * 1024 * 1024
+    upload_parse_workers: int = 4
+    upload_session_ttl_hours: int = 24
+
+    # Hot/cold tiering: closed alerts and cold trades move to Parquet under archive_dir
+    archive_dir: str = "archive"
+    archive_alert_age_days: int = 90
+    archive_trade_margin_days: int = 1
+
+    # Answer distinct-count and top-k dashboard metrics from ingest-time sketches
+    approximate_analytics: bool = False
+
+    # Requests slower than this are logged with their SQL statements
+    slow_request_ms: int = 1000
+
+    # Rate limiting: "memory" (per process), "shared" (mmap file shared by local
+    # workers) or "redis"; limits are requests per minute per client IP
+    rate_limit_backend: str = "memory"
+    rate_limit_redis_url: str = "redis://localhost:6379/0"
+    rate_limit_shared_path: str = "/tmp/complylite-ratelimit.bin"
+    rate_limit_max_keys: int = 100_000
+    rate_limit_default_per_minute: int = 600
+    rate_limit_rules: dict[str, int] = {
+        "POST /api/v1/data/upload": 20,
+        "POST /api/v1/data/run-detection": 10,
+        "POST /api/v1/auth/login": 20,
+    }
+
     class Config:
         env_file = ".env"
         env_prefix = "COMPLYLITE_"
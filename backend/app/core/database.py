@@ -1,38 +1,104 @@
 import duckdb
 from fastapi import Request
 from app.core.config import settings
+from app.core.profiling import TimedConnection
+from app.core.resources import GovernedConnection, connection_config
+from app.core.security import tenant_from_request
 
 def get_db_connection():
     """Create a new database connection (fallback). Prefer using the FastAPI dependency get_db for requests."""
-    return duckdb.connect(settings.database_url)
+    return duckdb.connect(settings.database_url, config=connection_config())
 
 def get_db(request: Request):
-    """FastAPI dependency: return the application-scoped DuckDB connection."""
-    return request.app.state.db
+    """FastAPI dependency: yield a DuckDB cursor for this request.
 
-def init_database(conn: duckdb.DuckDBPyConnection | None = None):
+    The cursor is opened on the application-scoped connection (single-tenant)
+    or on the pooled connection of the caller's tenant. It is the request's
+    own, so a statement timeout interrupts only this request's statement, and
+    transactions, temp tables and registered frames stay per request.
+    """
+    pool = getattr(request.app.state, "tenant_pool", None)
+    tenant_id = tenant_from_request(request)
+    request.state.tenant_id = tenant_id
+    conn = request.app.state.db if pool is None else pool.acquire(tenant_id)
+    try:
+        cursor = conn.cursor()
+        try:
+            yield TimedConnection(GovernedConnection(cursor))
+        finally:
+            cursor.close()
+    finally:
+        if pool is not None:
+            pool.release(tenant_id)
+
+# Bump whenever init_database changes, so existing files get the new DDL on next start
+SCHEMA_VERSION = 7
+
+def current_schema_version(conn) -> int | None:
+    """Schema version recorded by init_database, or None for a new or pre-versioning file."""
+    try:
+        return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0]
+    except duckdb.CatalogException:
+        return None
+
+def init_database(conn: duckdb.DuckDBPyConnection | None = None) -> bool:
     """Initialize database with required tables.
 
     If a connection is provided, it will be used and not closed here.
     Otherwise, a temporary connection will be created and closed.
+    Returns False without running any DDL when the file is already at
+    SCHEMA_VERSION.
     """
     own_conn = False
     if conn is None:
         conn = get_db_connection()
         own_conn = True
+
+    previous_version = current_schema_version(conn)
+    if previous_version == SCHEMA_VERSION:
+        if own_conn:
+            conn.close()
+        return False
     
+    # Enumerated columns are stored as 1-byte ENUM codes instead of strings
+    conn.execute("CREATE TYPE IF NOT EXISTS trade_side AS ENUM ('BUY', 'SELL')")
+    conn.execute(
+        "CREATE TYPE IF NOT EXISTS order_type AS ENUM ('MARKET', 'LIMIT', 'STOP', 'STOP_LIMIT')"
+    )
+    conn.execute("CREATE TYPE IF NOT EXISTS evidence_kind AS ENUM ('trade', 'order')")
+
+    # Dimension tables: client_id and symbol are dictionary-encoded to integer keys
+    conn.execute("CREATE SEQUENCE IF NOT EXISTS client_key_seq START 1")
+    conn.execute("CREATE SEQUENCE IF NOT EXISTS symbol_key_seq START 1")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS client_dim (
+            client_key INTEGER PRIMARY KEY,
+            client_id VARCHAR UNIQUE NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS symbol_dim (
+            symbol_key INTEGER PRIMARY KEY,
+            symbol VARCHAR UNIQUE NOT NULL
+        )
+    """)
+
+    legacy = _legacy_tables(conn)
+    for table in legacy:
+        conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+
     # Create orders table
     conn.execute("""
         CREATE TABLE IF NOT EXISTS orders (
             order_id VARCHAR PRIMARY KEY,
-            client_id VARCHAR,
+            client_key INTEGER,
             trader_id VARCHAR,
-            symbol VARCHAR,
-            side VARCHAR,
+            symbol_key INTEGER,
+            side trade_side,
             quantity INTEGER,
             price DECIMAL(10,4),
             timestamp TIMESTAMP,
-            order_type VARCHAR
+            order_type order_type
         )
     """)
     
@@ -41,14 +107,37 @@ def init_database(conn: duckdb.DuckDBPyConnection | None = None):
         CREATE TABLE IF NOT EXISTS trades (
             trade_id VARCHAR PRIMARY KEY,
             order_id VARCHAR,
-            client_id VARCHAR,
-            symbol VARCHAR,
-            side VARCHAR,
+            client_key INTEGER,
+            symbol_key INTEGER,
+            side trade_side,
             quantity INTEGER,
             price DECIMAL(10,4),
             timestamp TIMESTAMP
         )
     """)
+
+    # Rows rejected by upload validation or schema migration, kept for review and re-submission
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS upload_quarantine (
+            upload_id VARCHAR,
+            table_type VARCHAR,
+            source_row BIGINT,
+            reason VARCHAR,
+            raw_record TEXT,
+            quarantined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    for table in legacy:
+        source = f"{table}_legacy"
+        if table == "orders":
+            source = _quarantine_unknown_order_types(conn, source)
+        load_encoded(conn, table, source)
+        conn.execute(f"DROP TABLE {table}_legacy")
+
+    # Readable views that decode the surrogate keys for output and ad-hoc queries
+    conn.execute(f"CREATE OR REPLACE VIEW orders_named AS {_decoded_select('orders')}")
+    conn.execute(f"CREATE OR REPLACE VIEW trades_named AS {_decoded_select('trades')}")
     
     # Create clients table
     conn.execute("""
@@ -73,10 +162,249 @@ def init_database(conn: duckdb.DuckDBPyConnection | None = None):
             symbol VARCHAR,
             data_json TEXT,
             status VARCHAR DEFAULT 'OPEN',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            as_of TIMESTAMP,
+            superseded_at TIMESTAMP
+        )
+    """)
+    # Event time an offline or replayed run was evaluated at; NULL for live detection
+    conn.execute("ALTER TABLE alerts ADD COLUMN IF NOT EXISTS as_of TIMESTAMP")
+    # Set when a replay no longer produces an alert an analyst has already worked
+    conn.execute("ALTER TABLE alerts ADD COLUMN IF NOT EXISTS superseded_at TIMESTAMP")
+    
+    # Trades/orders that triggered each alert, written by the detectors in bulk
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS alert_evidence (
+            alert_id VARCHAR,
+            kind evidence_kind,
+            record_id VARCHAR
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS alert_evidence_alert_idx ON alert_evidence (alert_id)")
+    
+    # One precomputed row per day for compliance-score trend charts
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS compliance_snapshots (
+            snapshot_date DATE PRIMARY KEY,
+            compliance_score DOUBLE,
+            risk_level VARCHAR,
+            total_trades BIGINT,
+            trades_on_day BIGINT,
+            open_alerts BIGINT,
+            open_high BIGINT,
+            open_medium BIGINT,
+            open_low BIGINT,
+            rule_counts_json TEXT,
+            updated_at TIMESTAMP
+        )
+    """)
+    
+    # Per-(client, symbol, hour) activity; behavioral baselines are rolling windows over it
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS client_hourly_activity (
+            client_key INTEGER,
+            symbol_key INTEGER,
+            hour TIMESTAMP,
+            trades BIGINT,
+            notional DOUBLE,
+            net BIGINT,
+            PRIMARY KEY (client_key, symbol_key, hour)
+        )
+    """)
+    
+    # Client 360: per-client daily activity plus one summary row per client
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS client_activity_daily (
+            client_key INTEGER,
+            symbol_key INTEGER,
+            trade_date DATE,
+            trades BIGINT,
+            notional DOUBLE,
+            buy_quantity BIGINT,
+            sell_quantity BIGINT,
+            last_trade TIMESTAMP,
+            PRIMARY KEY (client_key, symbol_key, trade_date)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS client_profiles (
+            client_id VARCHAR PRIMARY KEY,
+            total_trades BIGINT,
+            total_notional DOUBLE,
+            symbols_traded BIGINT,
+            first_trade DATE,
+            last_trade TIMESTAMP,
+            total_orders BIGINT,
+            last_order TIMESTAMP,
+            open_alerts BIGINT,
+            open_alerts_by_rule VARCHAR,
+            last_alert_at TIMESTAMP,
+            updated_at TIMESTAMP
         )
     """)
     
+    # Mergeable per-hour sketches (HyperLogLog, top-k) for approximate dashboard metrics
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS trade_sketches (
+            bucket_start TIMESTAMP,
+            sketch_type VARCHAR,
+            payload BLOB,
+            PRIMARY KEY (bucket_start, sketch_type)
+        )
+    """)
+    if previous_version is not None and previous_version < 7:
+        # Version 5 changed the HyperLogLog hash and added the all-time rollup;
+        # version 7 added the distinct-symbol HyperLogLogs
+        from app.services.sketches import rebuild_trade_sketches
+        rebuild_trade_sketches(conn)
+    if previous_version is not None and previous_version < 6:
+        # Version 6 replaced the all-time running baselines with hourly observations
+        from app.services.baselines import rebuild_baselines
+        conn.execute("DROP TABLE IF EXISTS client_baselines")
+        rebuild_baselines(conn)
+
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER, applied_at TIMESTAMP)")
+    conn.execute("INSERT INTO schema_version VALUES (?, now())", [SCHEMA_VERSION])
+    
     if own_conn:
         conn.close()
     print("Database initialized successfully")
+    return True
+
+
+# Column layout of the encoded fact tables as seen by uploads and readers
+TABLE_COLUMNS = {
+    "orders": [
+        'order_id', 'client_id', 'trader_id', 'symbol', 'side', 'quantity', 'price', 'timestamp', 'order_type'
+    ],
+    "trades": [
+        'trade_id', 'order_id', 'client_id', 'symbol', 'side', 'quantity', 'price', 'timestamp'
+    ],
+}
+
+
+# A text order type (blank = none) that is not a member of the order_type ENUM
+_UNKNOWN_ORDER_TYPE_SQL = (
+    "NULLIF(TRIM(CAST({col} AS VARCHAR)), '') IS NOT NULL "
+    "AND TRY_CAST(UPPER(TRIM(CAST({col} AS VARCHAR))) AS order_type) IS NULL"
+)
+
+
+def _quarantine_unknown_order_types(conn, source: str) -> str:
+    """Move legacy orders whose order_type is not in the ENUM to upload_quarantine.
+
+    Returns a relation over the remaining rows, so migrating the table
+    never stores such a value as NULL without a trace.
+    """
+    unknown = _UNKNOWN_ORDER_TYPE_SQL.format(col="src.order_type")
+    moved = conn.execute(f"""
+        INSERT INTO upload_quarantine (upload_id, table_type, source_row, reason, raw_record)
+        SELECT 'schema-migration', 'orders', src.rowid + 1, 'invalid order_type', to_json(src)
+        FROM {source} src
+        WHERE {unknown}
+    """).fetchone()[0]
+    if moved:
+        print(f"Quarantined {moved} legacy orders with an unknown order_type (upload_id 'schema-migration')")
+    return f"(SELECT * FROM {source} src WHERE NOT ({unknown}))"
+
+
+def _legacy_tables(conn) -> list[str]:
+    """Return fact tables still stored with the old VARCHAR client_id/symbol layout."""
+    rows = conn.execute("""
+        SELECT table_name FROM information_schema.columns
+        WHERE table_name IN ('orders', 'trades') AND column_name = 'client_id'
+    """).fetchall()
+    return [r[0] for r in rows]
+
+
+def _decoded_select(table: str, source: str | None = None) -> str:
+    exprs = []
+    for col in TABLE_COLUMNS[table]:
+        if col == "client_id":
+            exprs.append("c.client_id")
+        elif col == "symbol":
+            exprs.append("s.symbol")
+        else:
+            exprs.append(f"f.{col}")
+    return (
+        f"SELECT {', '.join(exprs)} FROM {source or table} f "
+        "LEFT JOIN client_dim c ON c.client_key = f.client_key "
+        "LEFT JOIN symbol_dim s ON s.symbol_key = f.symbol_key"
+    )
+
+
+# Keep IN-lists under DuckDB's index_scan_max_count so each chunk is an index lookup
+ID_LOOKUP_CHUNK = 1000
+
+
+def decoded_rows_by_id(conn, table: str, ids: list[str]) -> list[dict]:
+    """Decoded rows of `table` ("orders" or "trades") for the given ids, via the primary-key index."""
+    id_column = "order_id" if table == "orders" else "trade_id"
+    rows = []
+    for i in range(0, len(ids), ID_LOOKUP_CHUNK):
+        chunk = ids[i:i + ID_LOOKUP_CHUNK]
+        placeholders = ", ".join("?" * len(chunk))
+        source = f"(SELECT * FROM {table} WHERE {id_column} IN ({placeholders}))"
+        cursor = conn.execute(f"{_decoded_select(table, source)} ORDER BY f.timestamp, f.{id_column}", chunk)
+        columns = [d[0] for d in cursor.description]
+        rows.extend(dict(zip(columns, row)) for row in cursor.fetchall())
+    return rows
+
+
+def register_dimensions(conn, source: str) -> None:
+    """Assign surrogate keys to client_ids and symbols in `source` not yet seen."""
+    conn.execute(f"""
+        INSERT INTO client_dim (client_key, client_id)
+        SELECT nextval('client_key_seq'), n.client_id
+        FROM (SELECT DISTINCT CAST(client_id AS VARCHAR) AS client_id FROM {source}
+              WHERE client_id IS NOT NULL) n
+        ANTI JOIN client_dim d ON d.client_id = n.client_id
+    """)
+    conn.execute(f"""
+        INSERT INTO symbol_dim (symbol_key, symbol)
+        SELECT nextval('symbol_key_seq'), n.symbol
+        FROM (SELECT DISTINCT CAST(symbol AS VARCHAR) AS symbol FROM {source}
+              WHERE symbol IS NOT NULL) n
+        ANTI JOIN symbol_dim d ON d.symbol = n.symbol
+    """)
+
+
+def load_encoded(conn, table: str, source: str) -> None:
+    """Insert rows from relation `source` (readable layout) into the encoded `table`.
+
+    `source` must expose the columns in TABLE_COLUMNS[table]; values are cast to the
+    table types and client_id/symbol are replaced by their dimension keys.
+    """
+    register_dimensions(conn, source)
+    select_exprs = []
+    insert_cols = []
+    for col in TABLE_COLUMNS[table]:
+        if col == "client_id":
+            insert_cols.append("client_key")
+            select_exprs.append("c.client_key")
+            continue
+        if col == "symbol":
+            insert_cols.append("symbol_key")
+            select_exprs.append("s.symbol_key")
+            continue
+        insert_cols.append(col)
+        if col == "timestamp":
+            select_exprs.append("CAST(src.timestamp AS TIMESTAMP)")
+        elif col == "quantity":
+            select_exprs.append("CAST(src.quantity AS INTEGER)")
+        elif col == "price":
+            select_exprs.append("CAST(src.price AS DECIMAL(10,4))")
+        elif col == "side":
+            select_exprs.append("CAST(UPPER(TRIM(CAST(src.side AS VARCHAR))) AS trade_side)")
+        elif col == "order_type":
+            # Strict: callers quarantine unknown order types first, anything left fails the load
+            select_exprs.append("CAST(NULLIF(UPPER(TRIM(CAST(src.order_type AS VARCHAR))), '') AS order_type)")
+        else:
+            select_exprs.append(f"CAST(src.{col} AS VARCHAR)")
+    conn.execute(f"""
+        INSERT INTO {table} ({', '.join(insert_cols)})
+        SELECT {', '.join(select_exprs)}
+        FROM {source} src
+        LEFT JOIN client_dim c ON c.client_id = CAST(src.client_id AS VARCHAR)
+        LEFT JOIN symbol_dim s ON s.symbol = CAST(src.symbol AS VARCHAR)
+    """)
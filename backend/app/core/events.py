@@ -0,0 +1,101 @@
+import asyncio
+import json
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def format_sse(event: dict) -> str:
+    """Serialize an event dict as a server-sent-events frame."""
+    data = json.dumps(event["data"], default=_json_default)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+class _Channel:
+    def __init__(self, history: int):
+        self.next_id = 1
+        self.history: deque[dict] = deque(maxlen=history)
+        self.subscribers: set[asyncio.Queue] = set()
+        self.last_values: dict[str, dict] = {}
+
+
+class EventBroadcaster:
+    """In-process fan-out of change events to SSE subscribers, one channel per tenant.
+
+    Each channel numbers its events and keeps the last `history` of them so a
+    reconnecting client can resume from its Last-Event-ID. Subscribers whose
+    queue fills up are dropped and expected to reconnect and resume.
+    """
+
+    def __init__(self, history: int = 500, queue_size: int = 100):
+        self.history = history
+        self.queue_size = queue_size
+        self._channels: dict[str, _Channel] = {}
+
+    def _channel(self, tenant_id: str) -> _Channel:
+        channel = self._channels.get(tenant_id)
+        if channel is None:
+            channel = self._channels[tenant_id] = _Channel(self.history)
+        return channel
+
+    def publish(self, tenant_id: str, event_type: str, data) -> dict:
+        channel = self._channel(tenant_id)
+        event = {"id": channel.next_id, "type": event_type, "data": data}
+        channel.next_id += 1
+        channel.history.append(event)
+        for queue in list(channel.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow consumer: drop it; it reconnects and resumes from its last event id
+                channel.subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        return event
+
+    def publish_values(self, tenant_id: str, event_type: str, values: dict) -> dict | None:
+        """Publish only the keys of `values` that changed since the last call, if any."""
+        channel = self._channel(tenant_id)
+        previous = channel.last_values.get(event_type, {})
+        delta = {k: v for k, v in values.items() if previous.get(k) != v}
+        channel.last_values[event_type] = dict(values)
+        if not delta:
+            return None
+        return self.publish(tenant_id, event_type, delta)
+
+    def latest_values(self, tenant_id: str, event_type: str) -> dict | None:
+        return self._channel(tenant_id).last_values.get(event_type)
+
+    def subscribe(self, tenant_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._channel(tenant_id).subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, tenant_id: str, queue: asyncio.Queue) -> None:
+        self._channel(tenant_id).subscribers.discard(queue)
+
+    def replay(self, tenant_id: str, last_event_id: int) -> list[dict] | None:
+        """Events after `last_event_id`, or None if they are no longer all buffered."""
+        channel = self._channel(tenant_id)
+        if last_event_id >= channel.next_id:
+            return None
+        events = [e for e in channel.history if e["id"] > last_event_id]
+        oldest_needed = last_event_id + 1
+        if oldest_needed < channel.next_id and (not events or events[0]["id"] != oldest_needed):
+            return None
+        return events
+
+    def last_event_id(self, tenant_id: str) -> int:
+        return self._channel(tenant_id).next_id - 1
+
+    def subscriber_count(self, tenant_id: str) -> int:
+        return len(self._channel(tenant_id).subscribers)
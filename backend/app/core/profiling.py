@@ -0,0 +1,339 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import logging
+import math
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+from starlette.routing import Match
+
+logger = logging.getLogger("complylite.requests")
+
+# Per-request timing state, shared by the middleware and TimedConnection
+_current_timing: contextvars.ContextVar["RequestTiming | None"] = contextvars.ContextVar(
+    "complylite_request_timing", default=None
+)
+# Sampler of the current request while it is being profiled; worker threads see it too
+_current_sampler: contextvars.ContextVar["SamplingProfiler | None"] = contextvars.ContextVar(
+    "complylite_request_sampler", default=None
+)
+
+
+@dataclass
+class RequestTiming:
+    db_seconds: float = 0.0
+    statements: list = field(default_factory=list)
+
+    def add(self, sql: str, params, seconds: float, keep: int = 20) -> None:
+        self.db_seconds += seconds
+        # Keep only the `keep` slowest statements for the slow-request log
+        if len(self.statements) < keep:
+            self.statements.append((sql, params, seconds))
+            return
+        fastest = min(range(len(self.statements)), key=lambda i: self.statements[i][2])
+        if seconds > self.statements[fastest][2]:
+            self.statements[fastest] = (sql, params, seconds)
+
+
+class TimedConnection:
+    """Thin proxy over a DuckDB connection that attributes execute() time to the current request."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, parameters=None):
+        timing = _current_timing.get()
+        started = time.perf_counter()
+        try:
+            with sampled_thread():
+                if parameters is None:
+                    return self._conn.execute(sql)
+                return self._conn.execute(sql, parameters)
+        finally:
+            if timing is not None:
+                timing.add(" ".join(str(sql).split()), parameters, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram: O(1) record, percentiles within one bucket (~20%)."""
+
+    MIN_SECONDS = 0.0001
+    FACTOR = 1.2
+    BUCKETS = 80
+
+    def __init__(self):
+        self.counts = [0] * (self.BUCKETS + 1)
+        self.count = 0
+        self.total = 0.0
+        self.db_total = 0.0
+        self.max = 0.0
+
+    def _bucket(self, seconds: float) -> int:
+        if seconds <= self.MIN_SECONDS:
+            return 0
+        return min(self.BUCKETS, int(math.log(seconds / self.MIN_SECONDS, self.FACTOR)) + 1)
+
+    def record(self, seconds: float, db_seconds: float) -> None:
+        self.counts[self._bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.db_total += db_seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = math.ceil(q * self.count)
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                upper = self.MIN_SECONDS * self.FACTOR ** i
+                return min(upper, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        avg = self.total / self.count if self.count else 0.0
+        avg_db = self.db_total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "p50_ms": round(self.percentile(0.50) * 1000, 2),
+            "p95_ms": round(self.percentile(0.95) * 1000, 2),
+            "p99_ms": round(self.percentile(0.99) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+            "avg_ms": round(avg * 1000, 2),
+            "avg_db_ms": round(avg_db * 1000, 2),
+            "avg_python_ms": round((avg - avg_db) * 1000, 2),
+        }
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of a request's threads at a fixed interval into folded-stack counts.
+
+    The event-loop thread is sampled throughout; worker threads are sampled
+    while they run work for the request (see `sampled_thread`). Each stack
+    is rooted at its thread's name, so loop and worker time stay apart.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        # thread id -> (name, nesting depth)
+        self._threads: dict[int, tuple[str, int]] = {}
+        self._lock = threading.Lock()
+        self.add_thread(thread_id)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def add_thread(self, thread_id: int) -> None:
+        with self._lock:
+            name, depth = self._threads.get(thread_id, (threading.current_thread().name, 0))
+            self._threads[thread_id] = (name, depth + 1)
+
+    def remove_thread(self, thread_id: int) -> None:
+        with self._lock:
+            name, depth = self._threads[thread_id]
+            if depth > 1:
+                self._threads[thread_id] = (name, depth - 1)
+            else:
+                del self._threads[thread_id]
+
+    def start(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = {thread_id: name for thread_id, (name, _) in self._threads.items()}
+            frames = sys._current_frames()
+            for thread_id, name in threads.items():
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if stack:
+                    stack.append(f"thread {name}")
+                    self.samples[";".join(reversed(stack))] += 1
+
+
+@contextlib.contextmanager
+def sampled_thread():
+    """Sample the current thread while it works for a profiled request."""
+    sampler = _current_sampler.get()
+    if sampler is None:
+        yield
+        return
+    sampler.add_thread(threading.get_ident())
+    try:
+        yield
+    finally:
+        sampler.remove_thread(threading.get_ident())
+
+
+def profiled(fn):
+    """Wrap `fn` so the thread that later runs it is sampled if the calling request is profiled."""
+    sampler = _current_sampler.get()
+    if sampler is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        token = _current_sampler.set(sampler)
+        try:
+            with sampled_thread():
+                return fn(*args, **kwargs)
+        finally:
+            _current_sampler.reset(token)
+    return run
+
+
+async def to_thread(fn, *args):
+    """asyncio.to_thread for request work: the worker thread shows up in the request's profile."""
+    return await asyncio.to_thread(profiled(fn), *args)
+
+
+class RequestProfiler:
+    """Route latency histograms, a slow-request log and on-demand sampling profiles."""
+
+    def __init__(self, slow_request_ms: float = 1000, slow_log_size: int = 200):
+        self.slow_request_seconds = slow_request_ms / 1000
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.slow_requests: deque[dict] = deque(maxlen=slow_log_size)
+        self._armed: dict[str, int] = {}
+        self.profiles: dict[str, Counter] = {}
+        # Request activity, used to find quiet periods for background maintenance
+        self.in_flight = 0
+        self.last_request_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def arm(self, route_key: str, requests: int) -> None:
+        with self._lock:
+            self._armed[route_key] = requests
+            self.profiles[route_key] = Counter()
+
+    def armed(self) -> dict[str, int]:
+        return dict(self._armed)
+
+    def take_armed(self, route_key: str) -> bool:
+        with self._lock:
+            remaining = self._armed.get(route_key, 0)
+            if remaining <= 0:
+                return False
+            if remaining == 1:
+                del self._armed[route_key]
+            else:
+                self._armed[route_key] = remaining - 1
+            return True
+
+    def add_samples(self, route_key: str, samples: Counter) -> None:
+        with self._lock:
+            self.profiles.setdefault(route_key, Counter()).update(samples)
+
+    def folded_profile(self, route_key: str) -> str:
+        """Profile in folded-stack format ("frame;frame;frame count"), ready for flamegraph tools."""
+        samples = self.profiles.get(route_key, Counter())
+        return "\n".join(f"{stack} {count}" for stack, count in samples.most_common())
+
+    def record(self, route_key: str, seconds: float, timing: RequestTiming, status: int) -> None:
+        with self._lock:
+            histogram = self.histograms.get(route_key)
+            if histogram is None:
+                histogram = self.histograms[route_key] = LatencyHistogram()
+            histogram.record(seconds, timing.db_seconds)
+        if seconds >= self.slow_request_seconds:
+            entry = {
+                "route": route_key,
+                "status": status,
+                "duration_ms": round(seconds * 1000, 2),
+                "db_ms": round(timing.db_seconds * 1000, 2),
+                "statements": [
+                    {"sql": sql, "params": repr(params)[:500], "ms": round(sec * 1000, 2)}
+                    for sql, params, sec in sorted(timing.statements, key=lambda s: -s[2])
+                ],
+                "at": time.time(),
+            }
+            self.slow_requests.append(entry)
+            logger.warning("Slow request %s took %.1f ms (db %.1f ms)", route_key, entry["duration_ms"], entry["db_ms"])
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {route: h.summary() for route, h in sorted(self.histograms.items())}
+
+
+def _route_key(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        for candidate in getattr(scope.get("app"), "routes", []):
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                path = candidate.path
+                break
+    return f"{scope['method']} {path or 'unmatched'}"
+
+
+class ProfilingMiddleware:
+    """ASGI middleware recording per-route latency, DuckDB vs Python time and profiles."""
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        status = {"code": 500, "streaming": False}
+        self.profiler.in_flight += 1
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                status["streaming"] = content_type.startswith(b"text/event-stream")
+                if status["streaming"]:
+                    # An open event stream is idle, not in flight
+                    self.profiler.in_flight -= 1
+            await send(message)
+
+        sampler = sampler_token = None
+        if self.profiler.armed():
+            route_key = _route_key(scope)
+            if self.profiler.take_armed(route_key):
+                sampler = SamplingProfiler(threading.get_ident()).start()
+                sampler_token = _current_sampler.set(sampler)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_timing.reset(token)
+            if sampler_token is not None:
+                _current_sampler.reset(sampler_token)
+            if not status["streaming"]:
+                self.profiler.in_flight -= 1
+            self.profiler.last_request_at = time.monotonic()
+            route_key = _route_key(scope)
+            if sampler is not None:
+                self.profiler.add_samples(route_key, sampler.stop())
+            # Long-lived event streams would only pollute the latency figures
+            if not status["streaming"]:
+                self.profiler.record(route_key, elapsed, timing, status["code"])
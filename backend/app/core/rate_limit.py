@@ -0,0 +1,323 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from fastapi.responses import JSONResponse
+
+
+# Sliding-window counter: each key keeps only the counts of the current and previous
+# fixed window, and the previous count is weighted by how much of it still overlaps
+# the sliding window. Every check is O(1) whatever the limit.
+def _estimate(prev: int, cur: int, now: float, window: float) -> float:
+    overlap = 1.0 - (now % window) / window
+    return prev * overlap + cur
+
+
+class MemoryBackend:
+    """Per-process counters in an LRU dict; idle keys expire after two windows."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # key -> [window_id, current_count, previous_count, expires_at]
+        self._entries: OrderedDict[str, list] = OrderedDict()
+
+    def hit(self, key: str, limit: int, window: float, now: float | None = None) -> tuple[bool, float]:
+        now = time.time() if now is None else now
+        wid = int(now // window)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [wid, 0, 0, 0.0]
+            else:
+                self._entries.move_to_end(key)
+                if entry[0] != wid:
+                    entry[2] = entry[1] if entry[0] == wid - 1 else 0
+                    entry[1] = 0
+                    entry[0] = wid
+            allowed = _estimate(entry[2], entry[1] + 1, now, window) <= limit
+            if allowed:
+                entry[1] += 1
+            entry[3] = now + 2 * window
+            self._trim(now)
+        return allowed, 0.0 if allowed else window - (now % window)
+
+    def _trim(self, now: float) -> None:
+        # Least recently used entries sit at the front; drop them while over capacity or expired
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_keys and entry[3] >= now:
+                break
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SharedMemoryBackend:
+    """Counters in a fixed-size memory-mapped file shared by local worker processes.
+
+    Keys hash into `slots` fixed slots (with a short linear probe), so memory is
+    bounded by construction and stale slots are simply reused. Keys whose probe
+    window is full of live keys share one overflow counter after the slots, so
+    they are limited together rather than resetting each other's counts.
+    Access is serialized with an advisory file lock.
+    """
+
+    _SLOT = struct.Struct("<QqII")  # key hash, window id, current count, previous count
+    _PROBE = 4
+
+    def __init__(self, path: str, slots: int = 65_536):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.slots = slots
+        size = (slots + 1) * self._SLOT.size  # + the overflow slot
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # Stable across processes, unlike hash(); 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def hit(self, key: str, limit: int, window: float, now: float | None = None) -> tuple[bool, float]:
+        now = time.time() if now is None else now
+        wid = int(now // window)
+        khash = self._hash(key)
+        home = khash % self.slots
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                slot, record = self._find(khash, home, wid)
+                owner, swid, cur, prev = record
+                if swid != wid:
+                    prev = cur if swid == wid - 1 else 0
+                    cur = 0
+                allowed = _estimate(prev, cur + 1, now, window) <= limit
+                if allowed:
+                    cur += 1
+                self._SLOT.pack_into(self._map, slot * self._SLOT.size, owner, wid, cur, prev)
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+        return allowed, 0.0 if allowed else window - (now % window)
+
+    def _find(self, khash: int, home: int, wid: int):
+        fallback = None
+        for i in range(self._PROBE):
+            slot = (home + i) % self.slots
+            record = self._SLOT.unpack_from(self._map, slot * self._SLOT.size)
+            if record[0] == khash:
+                return slot, record
+            if fallback is None and (record[0] == 0 or record[1] < wid - 1):
+                fallback = slot
+        if fallback is None:
+            # Probe window full of live keys: count against the shared overflow slot (hash 0)
+            return self.slots, self._SLOT.unpack_from(self._map, self.slots * self._SLOT.size)
+        return fallback, (khash, wid, 0, 0)
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+class RedisBackend:
+    """Counters in Redis (or any server speaking the RESP protocol).
+
+    Uses INCR/PEXPIRE on a per-window key plus GET of the previous window in
+    one pipelined round trip. If the server is unreachable, requests are
+    allowed rather than failing the API, and no reconnect is attempted until a
+    backoff (doubling up to `max_backoff` seconds) has passed, so an outage
+    costs one connect timeout per backoff period rather than one per request.
+    hit() does blocking socket I/O; async callers run it in a thread.
+    """
+
+    blocking = True
+
+    def __init__(self, url: str, timeout: float = 0.5, prefix: str = "complylite:rl:",
+                 max_backoff: float = 30.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int((parsed.path or "/0").lstrip("/") or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._sock = None
+        self._buf = b""
+        self.max_backoff = max_backoff
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock, self._buf = sock, b""
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", str(self.db)))
+        if setup:
+            self._pipeline(setup)
+
+    def _pipeline(self, commands) -> list:
+        payload = b"".join(self._encode(cmd) for cmd in commands)
+        self._sock.sendall(payload)
+        return [self._read_reply() for _ in commands]
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    def _readline(self) -> bytes:
+        while b"\r\n" not in self._buf:
+            chunk = self._sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("Connection closed by server")
+            self._buf += chunk
+        line, _, self._buf = self._buf.partition(b"\r\n")
+        return line
+
+    def _read_reply(self):
+        line = self._readline()
+        kind, rest = line[:1], line[1:]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            while len(self._buf) < length + 2:
+                chunk = self._sock.recv(4096)
+                if not chunk:
+                    raise ConnectionError("Connection closed by server")
+                self._buf += chunk
+            data, self._buf = self._buf[:length], self._buf[length + 2:]
+            return data.decode()
+        if kind == b"*":
+            return [self._read_reply() for _ in range(int(rest))]
+        raise RuntimeError(f"Unexpected reply: {line!r}")
+
+    def hit(self, key: str, limit: int, window: float, now: float | None = None) -> tuple[bool, float]:
+        now = time.time() if now is None else now
+        wid = int(now // window)
+        cur_key = f"{self.prefix}{key}:{wid}"
+        prev_key = f"{self.prefix}{key}:{wid - 1}"
+        try:
+            with self._lock:
+                if self._sock is None:
+                    if time.monotonic() < self._retry_at:
+                        return True, 0.0
+                    self._connect()
+                cur, _, prev = self._pipeline([
+                    ("INCR", cur_key),
+                    ("PEXPIRE", cur_key, int(window * 2000)),
+                    ("GET", prev_key),
+                ])
+                allowed = _estimate(int(prev or 0), cur, now, window) <= limit
+                if not allowed:
+                    # Rejected requests do not count against the window
+                    self._pipeline([("DECR", cur_key)])
+                self._failures = 0
+        except (OSError, RuntimeError) as e:
+            with self._lock:
+                self.close()
+                self._failures += 1
+                backoff = min(self.max_backoff, 0.5 * 2 ** (self._failures - 1))
+                self._retry_at = time.monotonic() + backoff
+            if self._failures == 1:
+                print(f"Rate limiter backend unavailable, allowing requests: {e}")
+            return True, 0.0
+        return allowed, 0.0 if allowed else window - (now % window)
+
+    def close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+
+
+def create_backend(kind: str, redis_url: str = "", shared_path: str = "", max_keys: int = 100_000):
+    if kind == "memory":
+        return MemoryBackend(max_keys)
+    if kind == "shared":
+        return SharedMemoryBackend(shared_path)
+    if kind == "redis":
+        return RedisBackend(redis_url)
+    raise ValueError(f"Unknown rate limit backend: {kind!r}")
+
+
+def parse_rules(rules: dict[str, int]) -> list[tuple[str, str, int]]:
+    """Turn {"POST /api/v1/data/upload": 10} into (method, prefix, limit), longest prefix first."""
+    parsed = []
+    for spec, limit in rules.items():
+        method, _, prefix = spec.strip().partition(" ")
+        if not prefix:
+            method, prefix = "*", method
+        parsed.append((method.upper(), prefix, int(limit)))
+    return sorted(parsed, key=lambda r: len(r[1]), reverse=True)
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing per-route, per-client request limits.
+
+    `rules` maps "METHOD /path/prefix" (or just a prefix) to requests per
+    window; unmatched routes use `default_limit` (0 disables limiting).
+    """
+
+    def __init__(self, app, backend, rules: dict[str, int], default_limit: int, window: float = 60.0):
+        self.app = app
+        self.backend = backend
+        self.rules = parse_rules(rules)
+        self.default_limit = default_limit
+        self.window = window
+
+    def _limit_for(self, method: str, path: str) -> tuple[str, int]:
+        for rule_method, prefix, limit in self.rules:
+            if path.startswith(prefix) and rule_method in ("*", method):
+                return f"{rule_method} {prefix}", limit
+        return "default", self.default_limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        rule, limit = self._limit_for(scope["method"], scope["path"])
+        if limit > 0:
+            client = scope.get("client")
+            key = f"{client[0] if client else 'anonymous'}|{rule}"
+            if getattr(self.backend, "blocking", False):
+                # Network backends must not stall the event loop for a round trip
+                allowed, retry_after = await asyncio.to_thread(self.backend.hit, key, limit, self.window)
+            else:
+                allowed, retry_after = self.backend.hit(key, limit, self.window)
+            if not allowed:
+                response = JSONResponse(
+                    {"detail": "Too Many Requests"},
+                    status_code=429,
+                    headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,180 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import duckdb
+from app.core.config import settings
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class ResourceProfile:
+    name: str
+    timeout_seconds: float
+
+
+# DuckDB's memory_limit, threads and temp_directory are per database instance, so
+# they are set once at connect time; profiles differ in how long a single
+# statement may run. Batch work is additionally capped by the job scheduler.
+PROFILES = {
+    "interactive": ResourceProfile("interactive", settings.interactive_query_timeout_seconds),
+    "batch": ResourceProfile("batch", settings.batch_query_timeout_seconds),
+}
+
+
+def connection_config(memory_limit: str | None = None, temp_subdir: str | None = None) -> dict:
+    """DuckDB connect() config from Settings; `memory_limit` overrides the instance default."""
+    config = {}
+    memory_limit = memory_limit or settings.duckdb_memory_limit
+    if memory_limit:
+        config["memory_limit"] = memory_limit
+    if settings.duckdb_threads:
+        config["threads"] = settings.duckdb_threads
+    if settings.duckdb_temp_directory:
+        temp_dir = settings.duckdb_temp_directory
+        if temp_subdir:
+            temp_dir = os.path.join(temp_dir, temp_subdir)
+        os.makedirs(temp_dir, exist_ok=True)
+        config["temp_directory"] = temp_dir
+    if settings.duckdb_max_temp_directory_size:
+        config["max_temp_directory_size"] = settings.duckdb_max_temp_directory_size
+    return config
+
+
+class QueryGovernor:
+    """Enforces per-statement timeouts by calling interrupt() from one watchdog thread.
+
+    Also keeps the set of statements currently running and per-profile
+    counters, for the admin resource report.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._ids = itertools.count(1)
+        self._deadlines: list[tuple[float, int]] = []
+        # query id -> {"conn", "profile", "sql", "started", "timed_out"}
+        self._active: dict[int, dict] = {}
+        self.stats = {name: {"queries": 0, "timeouts": 0} for name in PROFILES}
+        self._thread = None
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="query-governor", daemon=True)
+            self._thread.start()
+
+    def _watch(self) -> None:
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    _, query_id = heapq.heappop(self._deadlines)
+                    entry = self._active.get(query_id)
+                    if entry is not None and not entry["timed_out"]:
+                        entry["timed_out"] = True
+                        try:
+                            entry["conn"].interrupt()
+                        except Exception as e:
+                            print(f"Interrupting query {query_id} failed: {e}")
+                timeout = self._deadlines[0][0] - now if self._deadlines else None
+                self._wakeup.wait(timeout)
+
+    def execute(self, conn, profile: ResourceProfile, method: str, sql, parameters=None):
+        with self._lock:
+            self._ensure_thread()
+            query_id = next(self._ids)
+            self._active[query_id] = {
+                "conn": conn, "profile": profile.name, "sql": " ".join(str(sql).split())[:500],
+                "started": time.monotonic(), "timed_out": False,
+            }
+            self.stats[profile.name]["queries"] += 1
+            heapq.heappush(self._deadlines, (time.monotonic() + profile.timeout_seconds, query_id))
+            self._wakeup.notify()
+        try:
+            run = getattr(conn, method)
+            return run(sql) if parameters is None else run(sql, parameters)
+        except duckdb.InterruptException as e:
+            if self._active[query_id]["timed_out"]:
+                self.stats[profile.name]["timeouts"] += 1
+                raise QueryTimeout(
+                    f"Query exceeded the {profile.timeout_seconds:g}s {profile.name} time limit and was cancelled"
+                ) from e
+            raise
+        finally:
+            with self._lock:
+                self._active.pop(query_id, None)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            active = [
+                {"profile": q["profile"], "sql": q["sql"], "running_seconds": round(now - q["started"], 3)}
+                for q in self._active.values()
+            ]
+            return {
+                "profiles": {name: {"timeout_seconds": p.timeout_seconds, **self.stats[name]}
+                             for name, p in PROFILES.items()},
+                "active_queries": sorted(active, key=lambda q: -q["running_seconds"]),
+            }
+
+
+governor = QueryGovernor()
+
+
+class GovernedConnection:
+    """Connection proxy running every statement under a resource profile's time limit.
+
+    A timeout interrupts the wrapped connection, so wrap a cursor the caller
+    owns (as get_db and the batch jobs do), never a connection other requests share.
+    """
+
+    def __init__(self, conn, profile: str = "interactive"):
+        self._conn = conn
+        self._profile = PROFILES[profile]
+
+    def use_profile(self, profile: str) -> None:
+        """Switch this (per-request) proxy to another profile, e.g. "batch" for bulk loads."""
+        self._profile = PROFILES[profile]
+
+    def execute(self, sql, parameters=None):
+        return governor.execute(self._conn, self._profile, "execute", sql, parameters)
+
+    def executemany(self, sql, parameters=None):
+        return governor.execute(self._conn, self._profile, "executemany", sql, parameters)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def resource_usage(conn) -> dict:
+    """Effective DuckDB limits, memory and spill usage of `conn`'s database, and running statements."""
+    names = ("memory_limit", "threads", "temp_directory", "max_temp_directory_size")
+    limits = dict(conn.execute(
+        "SELECT name, value FROM duckdb_settings() WHERE name IN (SELECT UNNEST(?))", [list(names)]
+    ).fetchall())
+    memory = conn.execute("""
+        SELECT tag, memory_usage_bytes, temporary_storage_bytes
+        FROM duckdb_memory()
+        WHERE memory_usage_bytes > 0 OR temporary_storage_bytes > 0
+        ORDER BY memory_usage_bytes DESC
+    """).fetchall()
+    temp_files, temp_bytes = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM duckdb_temporary_files()"
+    ).fetchone()
+    size = conn.execute("PRAGMA database_size").fetchone()
+    return {
+        "limits": limits,
+        "memory_usage_bytes": sum(row[1] for row in memory),
+        "memory_by_tag": {tag: {"memory_bytes": mem, "spilled_bytes": spilled} for tag, mem, spilled in memory},
+        "temporary_files": temp_files,
+        "temporary_bytes": temp_bytes,
+        "database_size": size[1],
+        "wal_size": size[6],
+        **governor.snapshot(),
+    }
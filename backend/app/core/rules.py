@@ -1,5 +1,4 @@
 import os
-import yaml
 from functools import lru_cache
 
 DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'rule_packs', 'default_rules.yaml')
@@ -7,6 +6,8 @@ DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'd
 @lru_cache(maxsize=1)
 def load_rules(path: str | None = None) -> dict:
     """Load rule configuration from YAML. Returns an empty dict if missing."""
+    import yaml
+
     rules_path = path or DEFAULT_RULES_PATH
     try:
         with open(rules_path, 'r', encoding='utf-8') as f:
@@ -1,14 +1,24 @@
+import re
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from jose import JWTError, jwt
 
 from app.core.config import settings
+from app.core.rate_limit import create_backend
 
 
-def create_access_token(subject: str, role: str, expires_minutes: Optional[int] = None) -> str:
+DEFAULT_TENANT = "default"
+TENANT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def create_access_token(
+    subject: str,
+    role: str,
+    expires_minutes: Optional[int] = None,
+    tenant_id: Optional[str] = None,
+) -> str:
     expire_in = expires_minutes or settings.access_token_expire_minutes
     now = datetime.now(timezone.utc)
     expire = now + timedelta(minutes=expire_in)
@@ -18,37 +28,70 @@ def create_access_token(subject: str, role: str, expires_minutes: Optional[int]
         "iat": int(now.timestamp()),
         "exp": int(expire.timestamp()),
     }
+    if tenant_id:
+        payload["tenant"] = tenant_id
+    from jose import jwt
+
     token = jwt.encode(payload, settings.secret_key, algorithm=settings.algorithm)
     return token
 
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
-# Simple in-memory rate limit (per-process). For real prod, use Redis.
-_rate_state: dict[str, list[float]] = {}
+_rate_limiter = None
+
+def get_rate_limiter():
+    """Process-wide rate limit backend selected by settings.rate_limit_backend."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = create_backend(
+            settings.rate_limit_backend,
+            redis_url=settings.rate_limit_redis_url,
+            shared_path=settings.rate_limit_shared_path,
+            max_keys=settings.rate_limit_max_keys,
+        )
+    return _rate_limiter
 
 def rate_limit(request: Request, max_per_minute: int = 60):
     if max_per_minute <= 0:
         return
-    now = datetime.now(timezone.utc).timestamp()
     key = request.client.host if request.client else "anonymous"
-    bucket = _rate_state.setdefault(key, [])
-    window_start = now - 60
-    # drop old
-    while bucket and bucket[0] < window_start:
-        bucket.pop(0)
-    if len(bucket) >= max_per_minute:
-        raise HTTPException(status_code=429, detail="Too Many Requests")
-    bucket.append(now)
+    allowed, retry_after = get_rate_limiter().hit(f"{key}|{request.url.path}", max_per_minute, 60)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too Many Requests",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
 
 
 def decode_token(token: str) -> dict:
+    # Imported lazily to keep it off the cold-start path
+    from jose import JWTError, jwt
+
     try:
         return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
     except JWTError as e:
         raise HTTPException(status_code=401, detail="Invalid or expired token") from e
 
 
+def tenant_from_request(request: Request) -> str:
+    """Resolve the tenant for a request from the `tenant` claim of its bearer token."""
+    if not settings.multi_tenant:
+        return DEFAULT_TENANT
+    auth = request.headers.get("authorization", "")
+    scheme, _, token = auth.partition(" ")
+    if not auth and request.query_params.get("access_token"):
+        # EventSource cannot set headers, so streams may pass the token in the URL
+        scheme, token = "bearer", request.query_params["access_token"]
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    tenant_id = decode_token(token).get("tenant")
+    if not tenant_id or not TENANT_ID_RE.match(tenant_id):
+        raise HTTPException(status_code=403, detail="Token has no valid tenant")
+    return tenant_id
+
+
 def admin_required(
     creds: HTTPAuthorizationCredentials = Depends(bearer_scheme),
 ):
@@ -0,0 +1,36 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Modules kept off the import path of app.main; they load on first use or in the warmup
+LAZY_MODULES = ("pandas", "yaml", "jose.jwt")
+
+
+class StartupReport:
+    """Timings of the cold-start phases: app import, lifespan steps and background warmup."""
+
+    def __init__(self):
+        self.started_at = datetime.now().isoformat()
+        self.phases: dict[str, float] = {}
+        self.schema_initialized: bool | None = None
+        self.warmup: dict = {"status": "pending"}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = round(seconds, 4)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def summary(self) -> dict:
+        return {
+            "started_at": self.started_at,
+            "phases": dict(self.phases),
+            "ready_seconds": round(sum(self.phases.values()), 4),
+            "schema_initialized": self.schema_initialized,
+            "warmup": dict(self.warmup),
+        }
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import duckdb
+from app.core.config import settings
+from app.core.database import init_database
+from app.core.profiling import profiled
+from app.core.resources import connection_config
+from app.core.security import TENANT_ID_RE
+
+
+def tenant_database_path(tenant_id: str) -> str:
+    if not TENANT_ID_RE.match(tenant_id):
+        raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+    return os.path.join(settings.tenant_data_dir, f"{tenant_id}.db")
+
+
+class TenantConnectionPool:
+    """LRU-bounded set of open per-tenant DuckDB connections.
+
+    At most `max_open` idle connections are kept; the least recently used one
+    is closed when a new tenant is opened, and connections idle longer than
+    `idle_seconds` are closed by `evict_idle`. Connections checked out by an
+    in-flight request are never closed underneath it.
+    """
+
+    def __init__(self, max_open: int, idle_seconds: float, memory_limit: str | None = None):
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self.memory_limit = memory_limit
+        self._lock = threading.Lock()
+        # Signalled when a tenant comes back from maintenance
+        self._online = threading.Condition(self._lock)
+        # tenant_id -> [connection, last_used, in_use]
+        self._entries: OrderedDict[str, list] = OrderedDict()
+        # Tenants whose file is being maintained; acquire() waits for them
+        self._offline: set[str] = set()
+
+    def _open(self, tenant_id: str):
+        path = tenant_database_path(tenant_id)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = duckdb.connect(path, config=connection_config(self.memory_limit, temp_subdir=tenant_id))
+        init_database(conn)
+        return conn
+
+    def acquire(self, tenant_id: str):
+        with self._lock:
+            while tenant_id in self._offline:
+                self._online.wait()
+            entry = self._entries.get(tenant_id)
+            if entry is not None:
+                self._entries.move_to_end(tenant_id)
+                entry[1] = time.monotonic()
+                entry[2] += 1
+                return entry[0]
+        conn = self._open(tenant_id)
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is not None:
+                # Another request opened it first
+                conn.close()
+                conn = entry[0]
+                entry[2] += 1
+            else:
+                self._entries[tenant_id] = [conn, time.monotonic(), 1]
+            self._entries.move_to_end(tenant_id)
+            victims = self._over_capacity()
+        self._close_all(victims)
+        return conn
+
+    def release(self, tenant_id: str) -> None:
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is not None:
+                entry[1] = time.monotonic()
+                entry[2] = max(0, entry[2] - 1)
+
+    def _over_capacity(self) -> list:
+        victims = []
+        for tenant_id in list(self._entries):
+            if len(self._entries) <= self.max_open:
+                break
+            if self._entries[tenant_id][2] == 0:
+                victims.append(self._entries.pop(tenant_id)[0])
+        return victims
+
+    def evict_idle(self) -> int:
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            idle = [t for t, e in self._entries.items() if e[2] == 0 and e[1] < cutoff]
+            victims = [self._entries.pop(t)[0] for t in idle]
+        self._close_all(victims)
+        return len(victims)
+
+    def take_offline(self, tenant_id: str, quiet_seconds: float) -> bool:
+        """Close a tenant's connection for exclusive file access, if unused for `quiet_seconds`."""
+        cutoff = time.monotonic() - quiet_seconds
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is not None and (entry[2] > 0 or entry[1] > cutoff):
+                return False
+            self._offline.add(tenant_id)
+            victim = self._entries.pop(tenant_id, None)
+        if victim is not None:
+            self._close_all([victim[0]])
+        return True
+
+    def bring_online(self, tenant_id: str) -> None:
+        with self._lock:
+            self._offline.discard(tenant_id)
+            self._online.notify_all()
+
+    def open_tenants(self) -> list[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def close(self) -> None:
+        with self._lock:
+            victims = [e[0] for e in self._entries.values()]
+            self._entries.clear()
+        self._close_all(victims)
+
+    @staticmethod
+    def _close_all(conns) -> None:
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+class FairJobScheduler:
+    """Round-robin scheduler for blocking jobs (e.g. detection runs) across tenants.
+
+    Each tenant has its own FIFO queue and at most one running job, and the
+    dispatcher takes the next job from the next tenant in turn, so a tenant
+    with many heavy jobs queued cannot starve the others. At most
+    `max_concurrent` jobs run at once, in worker threads.
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self._queues: OrderedDict[str, deque] = OrderedDict()
+        self._running: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, tenant_id: str, fn, *args):
+        """Queue `fn(*args)` for `tenant_id` and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        # Bound here, in the submitting request's context, so a profiled request samples its job
+        self._queues.setdefault(tenant_id, deque()).append((profiled(fn), args, future))
+        self._dispatch()
+        return await future
+
+    def pending(self) -> dict[str, int]:
+        return {t: len(q) for t, q in self._queues.items() if q}
+
+    def running(self) -> list[str]:
+        return sorted(self._running)
+
+    def _next_tenant(self) -> str | None:
+        for tenant_id in list(self._queues):
+            if tenant_id in self._running:
+                continue
+            if not self._queues[tenant_id]:
+                del self._queues[tenant_id]
+                continue
+            # Rotate so the next pick starts after this tenant
+            self._queues.move_to_end(tenant_id)
+            return tenant_id
+        return None
+
+    def _dispatch(self) -> None:
+        while len(self._running) < self.max_concurrent:
+            tenant_id = self._next_tenant()
+            if tenant_id is None:
+                return
+            fn, args, future = self._queues[tenant_id].popleft()
+            self._running.add(tenant_id)
+            task = asyncio.get_running_loop().create_task(self._run(tenant_id, fn, args, future))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, tenant_id: str, fn, args, future) -> None:
+        try:
+            result = await asyncio.to_thread(fn, *args)
+            if not future.done():
+                future.set_result(result)
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            self._running.discard(tenant_id)
+            # A tenant that just ran goes behind everyone already waiting
+            if tenant_id in self._queues:
+                self._queues.move_to_end(tenant_id)
+            self._dispatch()
@@ -1,22 +1,123 @@
+import time
+_import_started = time.perf_counter()
+
+import asyncio
+import glob
+import os
+from datetime import datetime, timedelta
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import data_upload, alerts, dashboard, auth
+from app.api import data_upload, alerts, dashboard, auth, admin, clients
+from app.core.config import settings
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.security import get_rate_limiter
 from app.core.database import init_database, get_db_connection
+from app.core.events import EventBroadcaster
+from app.core.profiling import ProfilingMiddleware, RequestProfiler
+from app.core.resources import GovernedConnection
+from app.core.startup import StartupReport
+from app.core.tenancy import TenantConnectionPool, FairJobScheduler
+from app.services.chunked_uploads import UploadSessionStore
+from app.services.compliance_snapshots import record_snapshot
+from app.services.maintenance import MaintenanceGateMiddleware, MaintenanceScheduler
+from app.services.warmup import warm_up
+
+async def _evict_idle_tenants(pool: TenantConnectionPool):
+    while True:
+        await asyncio.sleep(min(60, pool.idle_seconds))
+        closed = await asyncio.to_thread(pool.evict_idle)
+        if closed:
+            print(f"Closed {closed} idle tenant connections")
+
+def _snapshot_job(cursor, day):
+    try:
+        record_snapshot(GovernedConnection(cursor, "batch"), day)
+    finally:
+        cursor.close()
+
+async def _end_of_day_snapshots(app: FastAPI):
+    """Record each database's compliance snapshot for the day just ending."""
+    while True:
+        now = datetime.now()
+        end_of_day = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        await asyncio.sleep((end_of_day - now).total_seconds() - 1)
+        day = datetime.now().date()
+        if settings.multi_tenant:
+            pool = app.state.tenant_pool
+            tenants = [os.path.splitext(os.path.basename(p))[0]
+                       for p in glob.glob(os.path.join(settings.tenant_data_dir, "*.db"))]
+        else:
+            pool, tenants = None, [None]
+        for tenant_id in tenants:
+            try:
+                if pool:
+                    # Blocks while the tenant's file is offline for maintenance
+                    conn = await asyncio.to_thread(pool.acquire, tenant_id)
+                else:
+                    await app.state.maintenance.gate.wait()
+                    conn = app.state.db
+                try:
+                    await app.state.job_scheduler.submit(tenant_id or "default", _snapshot_job, conn.cursor(), day)
+                finally:
+                    if pool:
+                        pool.release(tenant_id)
+            except Exception as e:
+                print(f"End-of-day snapshot failed for {tenant_id or 'default'}: {e}")
+        await asyncio.sleep(2)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: create a single DuckDB connection for the app
-    app.state.db = get_db_connection()
-    try:
-        init_database(app.state.db)
-        print("✅ Database initialized successfully")
-    except Exception as e:
-        print(f"❌ Database initialization failed: {e}")
+    app.state.job_scheduler = FairJobScheduler(settings.max_concurrent_jobs)
+    app.state.events = EventBroadcaster()
+    app.state.upload_sessions = UploadSessionStore(settings.upload_spool_dir)
+    evictor = None
+    if settings.multi_tenant:
+        # Startup: tenant databases are opened lazily through a bounded pool
+        app.state.db = None
+        app.state.tenant_pool = TenantConnectionPool(
+            settings.tenant_pool_size, settings.tenant_idle_seconds, settings.tenant_memory_limit
+        )
+        evictor = asyncio.create_task(_evict_idle_tenants(app.state.tenant_pool))
+    else:
+        # Startup: create a single DuckDB connection for the app
+        startup = app.state.startup
+        with startup.phase("open_database"):
+            app.state.db = get_db_connection()
+        try:
+            # Skipped (no DDL at all) when the file is already at the current schema version
+            with startup.phase("init_schema"):
+                startup.schema_initialized = init_database(app.state.db)
+            print("✅ Database initialized successfully" if startup.schema_initialized
+                  else "✅ Database schema is current")
+        except Exception as e:
+            print(f"❌ Database initialization failed: {e}")
+    warmer = None
+    if settings.startup_warmup:
+        cursor = app.state.db.cursor() if app.state.db is not None else None
+        warmer = asyncio.create_task(asyncio.to_thread(warm_up, cursor, app.state.startup))
+    snapshotter = asyncio.create_task(_end_of_day_snapshots(app))
+    app.state.maintenance = MaintenanceScheduler(
+        settings.maintenance_interval_seconds,
+        settings.maintenance_quiet_seconds,
+        settings.maintenance_rebuild_fragmentation,
+        settings.maintenance_rebuild_min_free_bytes,
+    )
+    maintainer = asyncio.create_task(app.state.maintenance.run_forever(app)) if settings.maintenance_enabled else None
+    print(f"Startup: {app.state.startup.summary()['phases']}")
     yield
-    # Shutdown: close the DuckDB connection
+    # Shutdown: close the DuckDB connection(s)
+    if warmer is not None and not warmer.done():
+        await warmer
+    snapshotter.cancel()
+    if maintainer is not None:
+        maintainer.cancel()
+    if evictor is not None:
+        evictor.cancel()
+        app.state.tenant_pool.close()
     try:
-        app.state.db.close()
+        if app.state.db is not None:
+            app.state.db.close()
     except Exception:
         pass
 
@@ -27,6 +128,19 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+app.state.profiler = RequestProfiler(settings.slow_request_ms)
+app.state.startup = StartupReport()
+app.state.startup.record("import", time.perf_counter() - _import_started)
+app.add_middleware(MaintenanceGateMiddleware)
+app.add_middleware(ProfilingMiddleware, profiler=app.state.profiler)
+
+app.add_middleware(
+    RateLimitMiddleware,
+    backend=get_rate_limiter(),
+    rules=settings.rate_limit_rules,
+    default_limit=settings.rate_limit_default_per_minute,
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:3001"],
@@ -41,6 +155,8 @@ app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(data_upload.router, prefix="/api/v1/data", tags=["data"])
 app.include_router(alerts.router, prefix="/api/v1/alerts", tags=["alerts"])
 app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["dashboard"])
+app.include_router(clients.router, prefix="/api/v1/clients", tags=["clients"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 
 @app.get("/")
 async def root():
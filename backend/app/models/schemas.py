@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 class OrderBase(BaseModel):
     order_id: str
@@ -49,4 +49,29 @@ class DashboardStats(BaseModel):
     low_risk_alerts: int
     total_trades: int
     total_clients: int
+    total_symbols: int = 0
     alerts_today: int
+    approximate: bool = False
+
+class AlertFilters(BaseModel):
+    severity: Optional[str] = None
+    status: Optional[str] = None
+    client_id: Optional[str] = None
+    rule_name: Optional[str] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    min_risk: Optional[float] = None
+    max_risk: Optional[float] = None
+
+class BulkAlertSelection(BaseModel):
+    alert_ids: Optional[List[str]] = None
+    filters: Optional[AlertFilters] = None
+
+class UploadSessionCreate(BaseModel):
+    table_type: str
+    mode: str = "replace"
+    total_chunks: Optional[int] = None
+    filename: Optional[str] = None
+
+class BulkStatusUpdate(BulkAlertSelection):
+    status: str
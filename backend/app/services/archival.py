@@ -0,0 +1,205 @@
+import glob
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.core.rules import load_rules
+from app.services.rule_dsl import compile_rule_pack
+from app.services.sketches import rebuild_trade_sketches
+
+ALERT_COLUMNS = [
+    'alert_id', 'rule_name', 'severity', 'description', 'client_id', 'symbol', 'data_json', 'status', 'created_at'
+]
+TRADE_COLUMNS = [
+    'trade_id', 'order_id', 'client_id', 'symbol', 'side', 'quantity', 'price', 'timestamp'
+]
+EVIDENCE_COLUMNS = ['alert_id', 'kind', 'record_id']
+ARCHIVABLE_STATUSES = ('CLOSED', 'FALSE_POSITIVE')
+
+
+def archive_root(tenant_id: str = "default") -> str:
+    return os.path.abspath(os.path.join(settings.archive_dir, tenant_id))
+
+
+def _has_files(path: str) -> bool:
+    return bool(glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True))
+
+
+def _parquet_scan(path: str) -> str:
+    pattern = os.path.join(path, "**", "*.parquet").replace("'", "''")
+    return f"read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)"
+
+
+def max_rule_lookback(rules: dict | None = None) -> timedelta:
+    """Longest window any detector looks back over; trades older than this are cold."""
+    rules = load_rules() if rules is None else rules
+    return max(
+        timedelta(hours=int(rules.get('self_trade_detection', {}).get('max_hours_window', 24))),
+        timedelta(days=int(rules.get('wash_trade_detection', {}).get('lookback_days', 7))),
+        timedelta(hours=int(rules.get('high_frequency_pattern', {}).get('lookback_hours', 24))),
+        timedelta(days=int(rules.get('cross_account_matching', {}).get('lookback_days', 1))),
+        timedelta(hours=int(rules.get('behavioral_baseline', {}).get('lookback_hours', 24))),
+        timedelta(days=int(rules.get('marking_the_close', {}).get('lookback_days', 1))),
+        timedelta(days=int(rules.get('ramping', {}).get('lookback_days', 1))),
+        timedelta(days=int(rules.get('front_running', {}).get('lookback_days', 1))),
+        *(timedelta(hours=rule.lookback_hours) for rule in compile_rule_pack(rules)[0]),
+    )
+
+
+def unified_alerts_sql(root: str) -> str:
+    """SELECT over live alerts plus any archived alert partitions."""
+    cols = ", ".join(ALERT_COLUMNS)
+    sql = f"SELECT {cols}, FALSE AS archived FROM alerts"
+    path = os.path.join(root, "alerts")
+    if _has_files(path):
+        sql += f" UNION ALL SELECT {cols}, TRUE AS archived FROM {_parquet_scan(path)}"
+    return sql
+
+
+def unified_trades_sql(root: str) -> str:
+    """SELECT over live (decoded) trades plus any archived trade partitions."""
+    cols = ", ".join(TRADE_COLUMNS)
+    sql = f"SELECT {cols}, FALSE AS archived FROM trades_named"
+    path = os.path.join(root, "trades")
+    if _has_files(path):
+        sql += f" UNION ALL SELECT {cols}, TRUE AS archived FROM {_parquet_scan(path)}"
+    return sql
+
+
+def refresh_archive_views(conn, root: str) -> None:
+    """(Re)create the alerts_all / trades_all audit views over live and archived rows."""
+    conn.execute(f"CREATE OR REPLACE VIEW alerts_all AS {unified_alerts_sql(root)}")
+    conn.execute(f"CREATE OR REPLACE VIEW trades_all AS {unified_trades_sql(root)}")
+
+
+def archived_alert(conn, root: str, alert_id: str) -> tuple | None:
+    """(rule_name, created_at) of an archived alert, or None if it was never archived."""
+    path = os.path.join(root, "alerts")
+    if not _has_files(path):
+        return None
+    return conn.execute(
+        f"SELECT rule_name, created_at FROM {_parquet_scan(path)} WHERE alert_id = ?", [alert_id]
+    ).fetchone()
+
+
+def archived_evidence(conn, root: str, alert_id: str, created_at: datetime) -> list[tuple]:
+    """(kind, record_id) links of an archived alert; its evidence shares the alert's archive_date."""
+    path = os.path.join(root, "evidence")
+    if not _has_files(path):
+        return []
+    return conn.execute(
+        f"SELECT kind, record_id FROM {_parquet_scan(path)} "
+        f"WHERE archive_date = CAST(? AS DATE) AND alert_id = ? ORDER BY record_id",
+        [created_at, alert_id],
+    ).fetchall()
+
+
+def archived_trades_by_id(conn, root: str, ids: list[str]) -> list[dict]:
+    """Archived trades (same columns as decoded live trades) for the given ids."""
+    path = os.path.join(root, "trades")
+    if not ids or not _has_files(path):
+        return []
+    cursor = conn.execute(
+        f"SELECT {', '.join(TRADE_COLUMNS)} FROM {_parquet_scan(path)} "
+        f"WHERE trade_id IN (SELECT UNNEST(?)) ORDER BY timestamp, trade_id",
+        [ids],
+    )
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _copy_partitioned(conn, select_sql: str, path: str, run_id: str) -> None:
+    os.makedirs(path, exist_ok=True)
+    target = path.replace("'", "''")
+    conn.execute(f"""
+        COPY ({select_sql}) TO '{target}'
+        (FORMAT PARQUET, COMPRESSION ZSTD, PARTITION_BY (archive_date),
+         FILENAME_PATTERN 'part_{run_id}_{{uuid}}', APPEND)
+    """)
+
+
+def _remove_run_files(root: str, run_id: str) -> None:
+    for path in glob.glob(os.path.join(root, "**", f"part_{run_id}_*.parquet"), recursive=True):
+        os.remove(path)
+
+
+def run_archive(conn, root: str, alert_age_days: int | None = None,
+                trade_margin_days: int | None = None) -> dict:
+    """Move closed alerts and cold trades to date-partitioned Parquet under `root`.
+
+    Alerts with status CLOSED/FALSE_POSITIVE older than `alert_age_days` (with
+    their alert_evidence links) and trades older than the longest rule lookback
+    plus `trade_margin_days` are selected once into temp id tables; the Parquet writes and the deletes both
+    go through those ids inside one transaction. If the transaction fails, the
+    files this run wrote are removed, so a re-run cannot archive a row twice.
+    """
+    started = time.perf_counter()
+    alert_age_days = settings.archive_alert_age_days if alert_age_days is None else alert_age_days
+    trade_margin_days = settings.archive_trade_margin_days if trade_margin_days is None else trade_margin_days
+    now = datetime.now()
+    alert_cutoff = now - timedelta(days=alert_age_days)
+    trade_cutoff = now - max_rule_lookback() - timedelta(days=trade_margin_days)
+    run_id = uuid.uuid4().hex
+
+    conn.begin()
+    try:
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE archive_alert_ids AS
+            SELECT alert_id FROM alerts WHERE status IN {ARCHIVABLE_STATUSES} AND created_at < ?
+        """, [alert_cutoff])
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE archive_trade_ids AS SELECT trade_id FROM trades WHERE timestamp < ?
+        """, [trade_cutoff])
+        alert_count = conn.execute("SELECT COUNT(*) FROM archive_alert_ids").fetchone()[0]
+        trade_count = conn.execute("SELECT COUNT(*) FROM archive_trade_ids").fetchone()[0]
+
+        if alert_count:
+            _copy_partitioned(
+                conn,
+                f"SELECT {', '.join(ALERT_COLUMNS)}, CAST(created_at AS DATE) AS archive_date "
+                f"FROM alerts SEMI JOIN archive_alert_ids USING (alert_id)",
+                os.path.join(root, "alerts"),
+                run_id,
+            )
+            _copy_partitioned(
+                conn,
+                f"SELECT {', '.join('e.' + c for c in EVIDENCE_COLUMNS)}, CAST(a.created_at AS DATE) AS archive_date "
+                f"FROM alert_evidence e JOIN alerts a USING (alert_id) SEMI JOIN archive_alert_ids USING (alert_id)",
+                os.path.join(root, "evidence"),
+                run_id,
+            )
+            conn.execute("DELETE FROM alert_evidence WHERE alert_id IN (SELECT alert_id FROM archive_alert_ids)")
+            conn.execute("DELETE FROM alerts WHERE alert_id IN (SELECT alert_id FROM archive_alert_ids)")
+        if trade_count:
+            _copy_partitioned(
+                conn,
+                f"SELECT {', '.join(TRADE_COLUMNS)}, CAST(timestamp AS DATE) AS archive_date "
+                f"FROM trades_named SEMI JOIN archive_trade_ids USING (trade_id)",
+                os.path.join(root, "trades"),
+                run_id,
+            )
+            conn.execute("DELETE FROM trades WHERE trade_id IN (SELECT trade_id FROM archive_trade_ids)")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        _remove_run_files(root, run_id)
+        raise
+    finally:
+        conn.execute("DROP TABLE IF EXISTS archive_alert_ids")
+        conn.execute("DROP TABLE IF EXISTS archive_trade_ids")
+
+    if trade_count:
+        # client_activity_daily and client_hourly_activity are rollups of every trade
+        # ever loaded, so archived days stay in the Client 360 and baselines as-is
+        rebuild_trade_sketches(conn)
+    refresh_archive_views(conn, root)
+    return {
+        "alerts_archived": alert_count,
+        "trades_archived": trade_count,
+        "alert_cutoff": alert_cutoff,
+        "trade_cutoff": trade_cutoff,
+        "archive_path": root,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
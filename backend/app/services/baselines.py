@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+# Hourly observations kept per (client, symbol): trade count, notional and net signed quantity
+METRICS = ("trades", "notional", "net")
+
+_HOURLY_SQL = """
+    SELECT c.client_key, s.symbol_key, date_trunc('hour', t.timestamp) AS hour,
+           COUNT(*) AS trades,
+           CAST(SUM(t.quantity * t.price) AS DOUBLE) AS notional,
+           SUM(CASE WHEN t.side = 'BUY' THEN t.quantity ELSE -t.quantity END) AS net
+    FROM {source} t
+    JOIN client_dim c ON c.client_id = t.client_id
+    JOIN symbol_dim s ON s.symbol = t.symbol
+    WHERE t.timestamp IS NOT NULL
+    GROUP BY ALL
+"""
+
+
+def update_baselines(conn, source: str = "trades_named") -> int:
+    """Add the decoded trades in `source` (e.g. a validated upload) to client_hourly_activity.
+
+    Observations are additive, so late or back-filled trades land in their
+    own hour even if that hour was already recorded. `source` must hold only
+    trades not added before (uploads reject already-loaded ids). Returns the
+    number of (client, symbol, hour) rows touched.
+    """
+    return conn.execute(f"""
+        INSERT INTO client_hourly_activity
+        {_HOURLY_SQL.format(source=source)}
+        ON CONFLICT (client_key, symbol_key, hour) DO UPDATE SET
+            trades = trades + EXCLUDED.trades,
+            notional = notional + EXCLUDED.notional,
+            net = net + EXCLUDED.net
+    """).fetchone()[0]
+
+
+def rebuild_baselines(conn) -> int:
+    """Recompute client_hourly_activity from the trades table."""
+    conn.execute("DELETE FROM client_hourly_activity")
+    return update_baselines(conn, "trades_named")
+
+
+def baseline_scores(conn, lookback_hours: int = 24, min_hours: int = 20,
+                    now: datetime | None = None, window_days: int = 30) -> list[dict]:
+    """Z-scores of each recent (client, symbol, hour) against that pair's own rolling baseline.
+
+    Hours in the `lookback_hours` before `now` are scored against the pair's
+    active hours in the `window_days` before them, so a run as of a past
+    `now` sees only what had happened by then. Pairs with fewer than
+    `min_hours` baseline hours are skipped; z is None when the baseline has
+    no variance.
+    """
+    now = now or datetime.now()
+    scored_from = (now - timedelta(hours=lookback_hours)).replace(minute=0, second=0, microsecond=0)
+    stats = ", ".join(f"AVG({m}) AS mean_{m}, STDDEV_SAMP({m}) AS sd_{m}" for m in METRICS)
+    zscores = ", ".join(f"(h.{m} - b.mean_{m}) / NULLIF(b.sd_{m}, 0) AS z_{m}" for m in METRICS)
+    rows = conn.execute(f"""
+        WITH recent AS (
+            SELECT * FROM client_hourly_activity WHERE hour >= $scored_from AND hour < $now
+        ),
+        baseline AS (
+            SELECT client_key, symbol_key, COUNT(*) AS hours, {stats}
+            FROM client_hourly_activity
+            SEMI JOIN (SELECT DISTINCT client_key, symbol_key FROM recent) USING (client_key, symbol_key)
+            WHERE hour >= $window_start AND hour < $scored_from
+            GROUP BY client_key, symbol_key
+        )
+        SELECT c.client_id, s.symbol, h.hour, h.trades, h.notional, h.net, b.hours, {zscores}
+        FROM recent h
+        JOIN baseline b USING (client_key, symbol_key)
+        JOIN client_dim c ON c.client_key = h.client_key
+        JOIN symbol_dim s ON s.symbol_key = h.symbol_key
+        WHERE b.hours >= $min_hours
+        ORDER BY c.client_id, s.symbol, h.hour
+    """, {
+        "scored_from": scored_from,
+        "now": now,
+        "window_start": scored_from - timedelta(days=window_days),
+        "min_hours": max(2, min_hours),
+    }).fetchall()
+    keys = ["client_id", "symbol", "hour", "trades", "notional", "net", "baseline_hours",
+            "z_trades", "z_notional", "z_net"]
+    return [dict(zip(keys, row)) for row in rows]
@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+from app.core.config import settings
+
+UPLOAD_MODES = ("replace", "append")
+
+# Chunks are converted CSV -> Parquet off the request path, a few at a time
+_parse_pool = ThreadPoolExecutor(max_workers=settings.upload_parse_workers, thread_name_prefix="chunk-parse")
+
+
+class UploadSessionError(Exception):
+    """Client-side protocol error (unknown session, bad checksum, missing chunks...)."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _sql_path(path: str) -> str:
+    return path.replace("'", "''")
+
+
+def parse_chunk(chunk_path: str, parquet_path: str, header: list[str] | None) -> int:
+    """Convert one spooled CSV chunk to Parquet (all columns text); returns its row count.
+
+    Chunk 0 carries the CSV header; later chunks are read with the header's
+    column names. Runs on its own in-memory DuckDB so chunks parse in parallel.
+    """
+    conn = duckdb.connect()
+    try:
+        if header is None:
+            options = "header = true, all_varchar = true"
+        else:
+            columns = ", ".join(f"'{_sql_path(c)}': 'VARCHAR'" for c in header)
+            options = f"header = false, columns = {{{columns}}}"
+        conn.execute(f"""
+            COPY (SELECT * FROM read_csv('{_sql_path(chunk_path)}', {options}, delim = ','))
+            TO '{_sql_path(parquet_path)}' (FORMAT PARQUET)
+        """)
+        return conn.execute(f"SELECT COUNT(*) FROM read_parquet('{_sql_path(parquet_path)}')").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class UploadSessionStore:
+    """Resumable uploads spooled under `root/<tenant>/<session id>/`.
+
+    Session metadata (table, mode, received chunk checksums, CSV header) lives
+    in session.json next to the chunk files, so sessions survive restarts.
+    Each stored chunk is parsed to Parquet in the background as it arrives;
+    re-sending a chunk replaces it, so a dropped transfer costs one chunk.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        # (tenant, session, chunk) -> asyncio future of the background parse
+        self._parsing: dict[tuple, asyncio.Future] = {}
+
+    def _dir(self, tenant_id: str, session_id: str) -> str:
+        try:
+            uuid.UUID(session_id)
+        except ValueError:
+            raise UploadSessionError("Upload session not found", 404)
+        return os.path.join(self.root, tenant_id, session_id)
+
+    def _read(self, tenant_id: str, session_id: str) -> dict:
+        path = os.path.join(self._dir(tenant_id, session_id), "session.json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadSessionError("Upload session not found", 404)
+
+    def _write(self, tenant_id: str, meta: dict) -> None:
+        directory = self._dir(tenant_id, meta["session_id"])
+        tmp = os.path.join(directory, "session.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(directory, "session.json"))
+
+    def create(self, tenant_id: str, table_type: str, mode: str, total_chunks: int | None = None,
+               filename: str | None = None) -> dict:
+        if mode not in UPLOAD_MODES:
+            raise UploadSessionError(f"Invalid mode. Must be one of: {list(UPLOAD_MODES)}")
+        self.purge_expired(tenant_id)
+        session_id = str(uuid.uuid4())
+        os.makedirs(self._dir(tenant_id, session_id))
+        meta = {
+            "session_id": session_id,
+            "table_type": table_type,
+            "mode": mode,
+            "filename": filename,
+            "total_chunks": total_chunks,
+            "header": None,
+            "chunks": {},
+            "created_at": time.time(),
+        }
+        self._write(tenant_id, meta)
+        return meta
+
+    def status(self, tenant_id: str, session_id: str) -> dict:
+        meta = self._read(tenant_id, session_id)
+        received = sorted(int(n) for n in meta["chunks"])
+        expected = meta["total_chunks"] if meta["total_chunks"] is not None else (max(received) + 1 if received else 0)
+        return {
+            "session_id": session_id,
+            "table_type": meta["table_type"],
+            "mode": meta["mode"],
+            "total_chunks": meta["total_chunks"],
+            "received_chunks": received,
+            "missing_chunks": sorted(set(range(expected)) - set(received)),
+            "parsed_chunks": sorted(int(n) for n, c in meta["chunks"].items() if c.get("rows") is not None),
+        }
+
+    async def put_chunk(self, tenant_id: str, session_id: str, index: int, body, checksum: str) -> dict:
+        """Spool chunk `index` from the async byte iterator `body`, verifying its SHA-256."""
+        meta = self._read(tenant_id, session_id)
+        if index < 0 or (meta["total_chunks"] is not None and index >= meta["total_chunks"]):
+            raise UploadSessionError("Chunk index out of range")
+        directory = self._dir(tenant_id, session_id)
+        chunk_path = os.path.join(directory, f"chunk_{index:06d}.csv")
+        tmp_path = chunk_path + ".part"
+        digest = hashlib.sha256()
+        size = 0
+        with open(tmp_path, "wb") as f:
+            async for piece in body:
+                size += len(piece)
+                if size > settings.upload_max_chunk_bytes:
+                    f.close()
+                    os.remove(tmp_path)
+                    raise UploadSessionError("Chunk too large", 413)
+                digest.update(piece)
+                await asyncio.to_thread(f.write, piece)
+        if digest.hexdigest() != checksum.strip().lower():
+            os.remove(tmp_path)
+            raise UploadSessionError("Checksum mismatch; resend the chunk", 422)
+        os.replace(tmp_path, chunk_path)
+
+        with self._lock:
+            meta = self._read(tenant_id, session_id)
+            if index == 0:
+                with open(chunk_path, "rb") as f:
+                    first_line = f.readline().decode("utf-8-sig").strip()
+                meta["header"] = [c.strip().strip('"') for c in first_line.split(",")]
+            meta["chunks"][str(index)] = {"sha256": digest.hexdigest(), "bytes": size, "rows": None}
+            self._write(tenant_id, meta)
+
+        # Parse whatever can be parsed now; chunks before the header arrives wait for chunk 0
+        for n in ([int(k) for k in meta["chunks"]] if index == 0 else [index]):
+            if meta["header"] is not None:
+                self._schedule_parse(tenant_id, session_id, n)
+        return {"chunk": index, "bytes": size, "sha256": digest.hexdigest()}
+
+    def _schedule_parse(self, tenant_id: str, session_id: str, index: int) -> asyncio.Future:
+        key = (tenant_id, session_id, index)
+        existing = self._parsing.get(key)
+        if existing is not None and not existing.done():
+            # Only stops a parse that has not started; a running one is discarded by its sha256 check
+            existing.cancel()
+        directory = self._dir(tenant_id, session_id)
+        meta = self._read(tenant_id, session_id)
+        future = asyncio.get_running_loop().run_in_executor(
+            _parse_pool, self._parse_and_record, tenant_id, session_id, index,
+            meta["chunks"][str(index)]["sha256"],
+            os.path.join(directory, f"chunk_{index:06d}.csv"),
+            os.path.join(directory, f"chunk_{index:06d}.parquet"),
+            None if index == 0 else meta["header"],
+        )
+        self._parsing[key] = future
+        return future
+
+    def _parse_and_record(self, tenant_id, session_id, index, sha256, chunk_path, parquet_path,
+                          header) -> int | None:
+        """Parse a chunk and publish its Parquet file, unless the chunk was re-sent meanwhile.
+
+        `sha256` identifies the chunk this parse was scheduled for; if the
+        session now records a different checksum, the result is dropped so it
+        cannot replace the Parquet file of the newer chunk.
+        """
+        tmp_path = f"{parquet_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            rows = parse_chunk(chunk_path, tmp_path, header)
+            with self._lock:
+                meta = self._read(tenant_id, session_id)
+                chunk = meta["chunks"].get(str(index))
+                if chunk is None or chunk["sha256"] != sha256:
+                    return None
+                os.replace(tmp_path, parquet_path)
+                chunk["rows"] = rows
+                self._write(tenant_id, meta)
+            return rows
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    async def parsed_files(self, tenant_id: str, session_id: str) -> tuple[dict, list[str]]:
+        """Wait for every chunk to be parsed; returns the session and its Parquet files in order."""
+        meta = self._read(tenant_id, session_id)
+        status = self.status(tenant_id, session_id)
+        if not status["received_chunks"] or 0 not in status["received_chunks"]:
+            raise UploadSessionError("Chunk 0 (with the CSV header) has not been received")
+        if status["missing_chunks"]:
+            raise UploadSessionError(f"Missing chunks: {status['missing_chunks'][:20]}")
+        files = []
+        for index in status["received_chunks"]:
+            key = (tenant_id, session_id, index)
+            future = self._parsing.get(key)
+            if future is None and meta["chunks"][str(index)].get("rows") is None:
+                # e.g. after a restart: parse now
+                future = self._schedule_parse(tenant_id, session_id, index)
+            if future is not None:
+                try:
+                    await future
+                except Exception as e:
+                    raise UploadSessionError(f"Chunk {index} could not be parsed: {e}")
+            files.append(os.path.join(self._dir(tenant_id, session_id), f"chunk_{index:06d}.parquet"))
+        return self._read(tenant_id, session_id), files
+
+    def discard(self, tenant_id: str, session_id: str) -> None:
+        directory = self._dir(tenant_id, session_id)
+        for key in [k for k in self._parsing if k[:2] == (tenant_id, session_id)]:
+            self._parsing.pop(key).cancel()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def purge_expired(self, tenant_id: str) -> int:
+        """Remove sessions older than upload_session_ttl_hours."""
+        cutoff = time.time() - settings.upload_session_ttl_hours * 3600
+        removed = 0
+        base = os.path.join(self.root, tenant_id)
+        for session_id in os.listdir(base) if os.path.isdir(base) else []:
+            try:
+                if self._read(tenant_id, session_id)["created_at"] < cutoff:
+                    self.discard(tenant_id, session_id)
+                    removed += 1
+            except UploadSessionError:
+                continue
+        return removed
@@ -0,0 +1,95 @@
+from datetime import datetime
+
+# Alerts still needing attention; CLOSED / FALSE_POSITIVE are resolved
+OPEN_STATUSES = ('OPEN', 'IN_REVIEW')
+
+_TRADE_COLUMNS = ("total_trades", "total_notional", "symbols_traded", "first_trade", "last_trade")
+_ORDER_COLUMNS = ("total_orders", "last_order")
+_ALERT_COLUMNS = ("open_alerts", "open_alerts_by_rule", "last_alert_at")
+
+
+def _upsert(conn, columns: tuple, select_sql: str, params: list, now: datetime) -> None:
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns)
+    conn.execute(f"""
+        INSERT INTO client_profiles (client_id, {', '.join(columns)}, updated_at)
+        SELECT *, CAST(? AS TIMESTAMP) FROM ({select_sql})
+        ON CONFLICT (client_id) DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at
+    """, [now, *params])
+
+
+def update_trade_activity(conn, source: str = "trades", replace: bool = True) -> None:
+    """Fold trades from the encoded `source` into the per-client daily activity and profile rows.
+
+    With `replace` the activity is rebuilt from scratch (uploads replace the
+    trades table); otherwise the source rows are added to the existing totals.
+    """
+    now = datetime.now()
+    if replace:
+        conn.execute("DELETE FROM client_activity_daily")
+    # Rows are written in client order so a single client's days sit in few row groups
+    conn.execute(f"""
+        INSERT INTO client_activity_daily
+        SELECT client_key, symbol_key, CAST(timestamp AS DATE) AS trade_date,
+               COUNT(*) AS trades,
+               CAST(SUM(quantity * price) AS DOUBLE) AS notional,
+               SUM(CASE WHEN side = 'BUY' THEN quantity ELSE 0 END) AS buy_quantity,
+               SUM(CASE WHEN side = 'SELL' THEN quantity ELSE 0 END) AS sell_quantity,
+               MAX(timestamp) AS last_trade
+        FROM {source}
+        WHERE client_key IS NOT NULL AND timestamp IS NOT NULL
+        GROUP BY ALL
+        ORDER BY client_key, trade_date
+        ON CONFLICT (client_key, symbol_key, trade_date) DO UPDATE SET
+            trades = trades + EXCLUDED.trades,
+            notional = notional + EXCLUDED.notional,
+            buy_quantity = buy_quantity + EXCLUDED.buy_quantity,
+            sell_quantity = sell_quantity + EXCLUDED.sell_quantity,
+            last_trade = GREATEST(last_trade, EXCLUDED.last_trade)
+    """)
+    if replace:
+        conn.execute(f"UPDATE client_profiles SET {', '.join(f'{c} = NULL' for c in _TRADE_COLUMNS)}")
+    # Roll the (much smaller) daily table up to one row per client
+    _upsert(conn, _TRADE_COLUMNS, """
+        SELECT c.client_id, SUM(a.trades), SUM(a.notional), COUNT(DISTINCT a.symbol_key),
+               MIN(a.trade_date), MAX(a.last_trade)
+        FROM client_activity_daily a
+        JOIN client_dim c ON c.client_key = a.client_key
+        GROUP BY c.client_id
+    """, [], now)
+
+
+def update_order_activity(conn) -> None:
+    """Recompute order counts and last order time per client from the orders table."""
+    conn.execute(f"UPDATE client_profiles SET {', '.join(f'{c} = NULL' for c in _ORDER_COLUMNS)}")
+    _upsert(conn, _ORDER_COLUMNS, """
+        SELECT c.client_id, COUNT(*), MAX(o.timestamp)
+        FROM orders o
+        JOIN client_dim c ON c.client_key = o.client_key
+        GROUP BY c.client_id
+    """, [], datetime.now())
+
+
+def update_alert_summary(conn, client_ids: list[str] | None = None) -> None:
+    """Recompute open alerts by rule per client, for all clients or just `client_ids`."""
+    scope, params = "", []
+    if client_ids is not None:
+        scope, params = " AND client_id IN (SELECT UNNEST(?))", [list(client_ids)]
+    conn.execute(
+        f"UPDATE client_profiles SET open_alerts = 0, open_alerts_by_rule = '{{}}', last_alert_at = NULL WHERE 1=1{scope}", params
+    )
+    _upsert(conn, _ALERT_COLUMNS, f"""
+        WITH per_rule AS (
+            SELECT client_id, rule_name, COUNT(*) AS n, MAX(created_at) AS last_alert_at
+            FROM alerts
+            WHERE client_id IS NOT NULL AND status IN {OPEN_STATUSES}{scope}
+            GROUP BY client_id, rule_name
+        )
+        SELECT client_id, SUM(n), CAST(to_json(map(list(rule_name), list(n))) AS VARCHAR), MAX(last_alert_at)
+        FROM per_rule
+        GROUP BY client_id
+    """, params, datetime.now())
+
+
+def clear_client_profiles(conn) -> None:
+    conn.execute("DELETE FROM client_activity_daily")
+    conn.execute("DELETE FROM client_profiles")
@@ -0,0 +1,81 @@
+import json
+from datetime import date
+
+
+def score_from_counts(total_trades: int, low_open: int, med_open: int, high_open: int) -> tuple[float, str]:
+    """Compliance score (0-100) and risk level from trade and open-alert counts."""
+    if total_trades == 0:
+        # No data uploaded yet - show neutral state
+        return 100.0, "LOW"
+
+    # Calculate score based on alerts vs trades
+    total_open_alerts = low_open + med_open + high_open
+    if total_open_alerts == 0:
+        compliance_score = 100.0
+    else:
+        # Score decreases with more alerts relative to trades
+        compliance_score = max(0.0, 100.0 - (total_open_alerts / total_trades) * 100)
+
+    # Determine risk level based on score and high-risk alerts
+    if high_open > 0 or compliance_score < 50:
+        risk_level = "HIGH"
+    elif compliance_score < 80:
+        risk_level = "MEDIUM"
+    else:
+        risk_level = "LOW"
+    return compliance_score, risk_level
+
+
+def trade_count_source(conn) -> str:
+    """trades_all (live plus archived trades) once anything has been archived, else trades."""
+    archived = conn.execute(
+        "SELECT COUNT(*) FROM duckdb_views() WHERE view_name = 'trades_all' AND NOT temporary"
+    ).fetchone()[0]
+    return "trades_all" if archived else "trades"
+
+
+def record_snapshot(conn, snapshot_date: date | None = None) -> dict:
+    """Compute and upsert the compliance snapshot row for `snapshot_date` (default: today).
+
+    Re-running for the same day overwrites its row, so this can be called after
+    every detection run and once more at end of day. Trade counts include
+    archived trades, so archiving does not change a day's totals.
+    """
+    snapshot_date = snapshot_date or date.today()
+    total_trades, trades_on_day = conn.execute(
+        f"SELECT COUNT(*), COUNT(*) FILTER (WHERE CAST(timestamp AS DATE) = ?) FROM {trade_count_source(conn)}",
+        [snapshot_date],
+    ).fetchone()
+    low_open, med_open, high_open = conn.execute("""
+        SELECT COUNT(*) FILTER (WHERE severity = 'LOW'),
+               COUNT(*) FILTER (WHERE severity = 'MEDIUM'),
+               COUNT(*) FILTER (WHERE severity = 'HIGH')
+        FROM alerts WHERE status = 'OPEN'
+    """).fetchone()
+    rule_counts = dict(conn.execute(
+        "SELECT rule_name, COUNT(*) FROM alerts WHERE status = 'OPEN' GROUP BY rule_name"
+    ).fetchall())
+    score, risk_level = score_from_counts(total_trades, low_open, med_open, high_open)
+
+    row = {
+        "snapshot_date": snapshot_date,
+        "compliance_score": round(score, 2),
+        "risk_level": risk_level,
+        "total_trades": total_trades,
+        "trades_on_day": trades_on_day,
+        "open_alerts": low_open + med_open + high_open,
+        "open_high": high_open,
+        "open_medium": med_open,
+        "open_low": low_open,
+        "rule_counts": rule_counts,
+    }
+    conn.execute("""
+        INSERT OR REPLACE INTO compliance_snapshots (
+            snapshot_date, compliance_score, risk_level, total_trades, trades_on_day,
+            open_alerts, open_high, open_medium, open_low, rule_counts_json, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    """, [
+        snapshot_date, row["compliance_score"], risk_level, total_trades, trades_on_day,
+        row["open_alerts"], high_open, med_open, low_open, json.dumps(rule_counts),
+    ])
+    return row
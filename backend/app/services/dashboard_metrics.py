@@ -0,0 +1,87 @@
+from app.core.config import settings
+from app.services.compliance_snapshots import score_from_counts, trade_count_source
+from app.services.sketches import approximate_distinct
+
+
+def dashboard_stats(conn, approximate: bool | None = None) -> dict:
+    """Alert counts by severity plus trade and client totals for the dashboard.
+
+    With `approximate` (default: settings.approximate_analytics) the distinct
+    client fallback and the distinct symbol count are answered from the
+    HyperLogLog sketches instead of a scan.
+    """
+    approximate = settings.approximate_analytics if approximate is None else approximate
+    # Get alert counts by severity
+    alert_stats = conn.execute("""
+        SELECT 
+            COUNT(*) as total,
+            COUNT(CASE WHEN severity = 'HIGH' THEN 1 END) as high,
+            COUNT(CASE WHEN severity = 'MEDIUM' THEN 1 END) as medium,
+            COUNT(CASE WHEN severity = 'LOW' THEN 1 END) as low,
+            COUNT(CASE WHEN created_at >= CURRENT_DATE THEN 1 END) as today
+        FROM alerts
+    """).fetchone()
+    
+    # Get trade and client counts
+    trade_count = conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+    client_count = conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+    # If no client master data, approximate active clients by distinct IDs in trades
+    used_sketch = False
+    if client_count == 0:
+        if approximate:
+            client_count = approximate_distinct(conn, "clients_hll")["estimate"]
+            used_sketch = True
+        else:
+            client_count = conn.execute("SELECT COUNT(DISTINCT client_key) FROM trades").fetchone()[0]
+    if approximate:
+        symbol_count = approximate_distinct(conn, "symbols_hll")["estimate"]
+        used_sketch = True
+    else:
+        symbol_count = conn.execute("SELECT COUNT(DISTINCT symbol_key) FROM trades").fetchone()[0]
+    
+    return {
+        "total_alerts": alert_stats[0],
+        "high_risk_alerts": alert_stats[1],
+        "medium_risk_alerts": alert_stats[2],
+        "low_risk_alerts": alert_stats[3],
+        "alerts_today": alert_stats[4],
+        "total_trades": trade_count,
+        "total_clients": client_count,
+        "total_symbols": symbol_count,
+        "approximate": used_sketch
+    }
+
+
+def compliance_score(conn) -> dict:
+    """Overall compliance score from trade count and open alerts by severity."""
+    # Calculate compliance metrics (demo-friendly); archived trades still count
+    total_trades = conn.execute(f"SELECT COUNT(*) FROM {trade_count_source(conn)}").fetchone()[0]
+    low_open = conn.execute("SELECT COUNT(*) FROM alerts WHERE severity = 'LOW' AND status = 'OPEN'").fetchone()[0]
+    med_open = conn.execute("SELECT COUNT(*) FROM alerts WHERE severity = 'MEDIUM' AND status = 'OPEN'").fetchone()[0]
+    high_open = conn.execute("SELECT COUNT(*) FROM alerts WHERE severity = 'HIGH' AND status = 'OPEN'").fetchone()[0]
+
+    score, risk_level = score_from_counts(total_trades, low_open, med_open, high_open)
+    
+    return {
+        "compliance_score": round(score, 2),
+        "total_trades": total_trades,
+        "open_alerts": low_open + med_open + high_open,
+        "high_risk_alerts": high_open,
+        "risk_level": risk_level
+    }
+
+
+def publish_dashboard_changes(events, tenant_id: str, conn, new_alerts: list | None = None) -> None:
+    """Compute dashboard values once after a change and fan them out to SSE subscribers."""
+    if events is None:
+        return
+    try:
+        events.publish_values(tenant_id, "stats", dashboard_stats(conn))
+        events.publish_values(tenant_id, "compliance_score", compliance_score(conn))
+        if new_alerts:
+            events.publish(tenant_id, "alerts", [
+                {key: alert[key] for key in ("alert_id", "rule_name", "severity", "description")}
+                for alert in new_alerts
+            ])
+    except Exception as e:
+        print(f"Publishing dashboard changes failed: {e}")
@@ -0,0 +1,277 @@
+"""Offline detection over trade/order/client files, bypassing the HTTP upload path.
+
+    python -m app.services.detect --trades 'archive/default/trades/**/*.parquet' \\
+        --orders 'exports/orders_*.csv' --clients clients.csv --out alerts.parquet
+
+Files are read with DuckDB's Parquet/CSV scanners (globs, directories and
+hive-partitioned archives all work) into a scratch database using every
+core, the rule pack's detectors run there as of `--as-of` (default now), and
+the alerts are written to a Parquet file (`--out`, with the ids of the
+trades/orders behind each alert as list columns) and/or merged into a
+DuckDB database file (`--db`, with their alert_evidence rows). Alert ids
+are derived from the rule, as-of time and what identifies the alert (client,
+symbol, window or order ids), so re-running the same as-of time updates the
+earlier run's alerts instead of duplicating them. The live database is
+locked while the API server has it open, so write to Parquet when the
+server is running.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import duckdb
+from app.core.database import init_database, load_encoded
+from app.core.rules import load_rules
+from app.services.baselines import rebuild_baselines
+from app.services.detection_rules import ALERT_KEYS, ComplianceDetector
+from app.services.rule_dsl import compile_rule_pack
+
+CLIENT_COLUMNS = ['client_id', 'client_name', 'client_type', 'risk_rating', 'account_status', 'created_date']
+CSV_SUFFIXES = (".csv", ".csv.gz", ".tsv", ".txt")
+
+
+def sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def file_scan(patterns: list[str]) -> str:
+    """Table function reading every file matched by `patterns` (all CSV or all Parquet)."""
+    paths = [os.path.join(p, "**", "*.parquet") if os.path.isdir(p) else p for p in patterns]
+    files = ", ".join(sql_literal(p) for p in paths)
+    if all(p.lower().endswith(CSV_SUFFIXES) for p in paths):
+        return f"read_csv([{files}], header = true, union_by_name = true)"
+    if any(p.lower().endswith(CSV_SUFFIXES) for p in paths):
+        raise ValueError("Mixing CSV and Parquet inputs for one table is not supported")
+    return f"read_parquet([{files}], hive_partitioning = true, union_by_name = true)"
+
+
+def open_scratch(path: str = ":memory:", threads: int | None = None, memory_limit: str | None = None):
+    """Scratch database with the application schema; uses all cores unless told otherwise."""
+    config = {"threads": threads or os.cpu_count() or 1, "preserve_insertion_order": False}
+    if memory_limit:
+        config["memory_limit"] = memory_limit
+    conn = duckdb.connect(path, config=config)
+    init_database(conn)
+    return conn
+
+
+def load_files(conn, trades: list[str] | None = None, orders: list[str] | None = None,
+               clients: list[str] | None = None) -> dict:
+    """Load the given files into the scratch tables; returns row counts and load seconds per table."""
+    loaded = {}
+    for table, patterns in (("clients", clients), ("orders", orders), ("trades", trades)):
+        if not patterns:
+            continue
+        started = time.perf_counter()
+        conn.execute(f"CREATE OR REPLACE TEMP VIEW {table}_files AS SELECT * FROM {file_scan(patterns)}")
+        if table == "clients":
+            exprs = ", ".join("CAST(created_date AS DATE)" if c == "created_date" else f"CAST({c} AS VARCHAR)"
+                              for c in CLIENT_COLUMNS)
+            conn.execute(f"INSERT OR REPLACE INTO clients SELECT {exprs} FROM clients_files")
+        else:
+            load_encoded(conn, table, f"{table}_files")
+        if table == "trades":
+            rebuild_baselines(conn)
+        conn.execute(f"DROP VIEW {table}_files")
+        rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        loaded[table] = {"rows": rows, "seconds": round(time.perf_counter() - started, 3)}
+    return loaded
+
+
+def alert_key_sql(rules: dict) -> str:
+    """SQL expression over `data` (the parsed data_json) with each rule's identifying fields."""
+    keys = dict(ALERT_KEYS)
+    keys.update((rule.name, rule.key_fields) for rule in compile_rule_pack(rules)[0])
+    cases = []
+    for rule_name, fields in sorted(keys.items()):
+        if fields:
+            parts = ", ".join(f"COALESCE(data->>'{f}', '')" for f in fields)
+            cases.append(f"WHEN {sql_literal(rule_name)} THEN concat_ws('|', {parts})")
+    return f"CASE rule_name {' '.join(cases)} ELSE '' END" if cases else "''"
+
+
+def stable_alerts_sql(source: str, rules: dict) -> str:
+    """SELECT over as-of alerts in `source` with ids derived from what identifies each alert.
+
+    The id hashes the rule, as_of, client, symbol and the rule's key fields
+    (see ALERT_KEYS and the declarative rules' partition keys), not the
+    description or amounts, so a correction that changes a number keeps the
+    id. Alerts sharing all of those are told apart by their rank.
+    """
+    return f"""
+        SELECT CAST(CAST(md5(concat_ws('|', rule_name, CAST(as_of AS VARCHAR), COALESCE(client_id, ''),
+                    COALESCE(symbol, ''), alert_key,
+                    CAST(row_number() OVER (PARTITION BY rule_name, as_of, client_id, symbol, alert_key
+                                            ORDER BY data_json) AS VARCHAR))) AS UUID) AS VARCHAR) AS alert_id,
+               rule_name, severity, description, client_id, symbol, data_json, as_of, source_alert_id
+        FROM (
+            SELECT *, alert_id AS source_alert_id,
+                   {alert_key_sql(rules)} AS alert_key
+            FROM (SELECT *, CAST(data_json AS JSON) AS data FROM {source})
+        )
+    """
+
+
+def export_alerts_sql(source: str, evidence: str, rules: dict) -> str:
+    """Stable-id alerts of `source` with their evidence as trade_ids / order_ids list columns."""
+    return f"""
+        SELECT a.* EXCLUDE (source_alert_id),
+               list_sort(list(e.record_id) FILTER (WHERE e.kind = 'trade')) AS trade_ids,
+               list_sort(list(e.record_id) FILTER (WHERE e.kind = 'order')) AS order_ids
+        FROM ({stable_alerts_sql(source, rules)}) a
+        LEFT JOIN {evidence} e ON e.alert_id = a.source_alert_id
+        GROUP BY ALL
+        ORDER BY a.as_of, a.rule_name, a.client_id, a.symbol
+    """
+
+
+def merge_alerts(conn, source: str, evidence: str, as_ofs: list[datetime], rules: dict) -> dict:
+    """Make `alerts` hold the alerts in `source` for each of the `as_ofs` times.
+
+    Alerts produced again keep their id, status and created_at, and take the
+    new severity, description and data. Alerts an earlier run produced for
+    those times and this run did not are removed while still OPEN; ones an
+    analyst has already worked are kept and marked with superseded_at. The
+    evidence of every written alert is replaced by the rows of `evidence`
+    (keyed by the source ids).
+    """
+    conn.execute(f"CREATE OR REPLACE TEMP TABLE merged_alerts AS {stable_alerts_sql(source, rules)}")
+    conn.begin()
+    try:
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE stale_alerts AS
+            SELECT alert_id, status FROM alerts
+            WHERE as_of IN (SELECT UNNEST($as_ofs)) AND alert_id NOT IN (SELECT alert_id FROM merged_alerts)
+        """, {"as_ofs": as_ofs})
+        conn.execute("""
+            DELETE FROM alert_evidence
+            WHERE alert_id IN (SELECT alert_id FROM merged_alerts)
+               OR alert_id IN (SELECT alert_id FROM stale_alerts WHERE status = 'OPEN')
+        """)
+        removed = conn.execute("""
+            DELETE FROM alerts WHERE alert_id IN (SELECT alert_id FROM stale_alerts WHERE status = 'OPEN')
+        """).fetchone()[0]
+        superseded = conn.execute("""
+            UPDATE alerts SET superseded_at = now()
+            WHERE alert_id IN (SELECT alert_id FROM stale_alerts WHERE status <> 'OPEN') AND superseded_at IS NULL
+        """).fetchone()[0]
+        written = conn.execute("""
+            INSERT INTO alerts (alert_id, rule_name, severity, description, client_id, symbol, data_json, as_of)
+            SELECT * EXCLUDE (source_alert_id) FROM merged_alerts
+            ON CONFLICT (alert_id) DO UPDATE SET
+                severity = EXCLUDED.severity, description = EXCLUDED.description,
+                data_json = EXCLUDED.data_json, superseded_at = NULL
+        """).fetchone()[0]
+        conn.execute(f"""
+            INSERT INTO alert_evidence (alert_id, kind, record_id)
+            SELECT m.alert_id, e.kind, e.record_id
+            FROM {evidence} e
+            JOIN merged_alerts m ON m.source_alert_id = e.alert_id
+        """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DROP TABLE IF EXISTS merged_alerts")
+        conn.execute("DROP TABLE IF EXISTS stale_alerts")
+    return {"written": written, "removed": removed, "superseded": superseded}
+
+
+def write_alerts(conn, as_of: datetime, rules: dict, out: str | None = None, db: str | None = None) -> int:
+    """Write the scratch alerts, tagged with `as_of`, to a Parquet file and/or merge them into a database file."""
+    conn.execute("UPDATE alerts SET as_of = $as_of", {"as_of": as_of})
+    count = conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+    if out:
+        conn.execute(f"COPY ({export_alerts_sql('alerts', 'alert_evidence', rules)}) TO {sql_literal(out)} "
+                     "(FORMAT PARQUET, COMPRESSION ZSTD)")
+    if db:
+        target = duckdb.connect(db)
+        try:
+            init_database(target)
+        finally:
+            target.close()
+        scratch = conn.execute("SELECT current_database()").fetchone()[0]
+        conn.execute(f"ATTACH {sql_literal(db)} AS target_db")
+        try:
+            conn.execute("USE target_db")
+            merge_alerts(conn, f'"{scratch}".main.alerts', f'"{scratch}".main.alert_evidence', [as_of], rules)
+        finally:
+            conn.execute(f'USE "{scratch}"')
+            conn.execute("DETACH target_db")
+    return count
+
+
+def run(trades=None, orders=None, clients=None, out=None, db=None, rules_path=None,
+        threads=None, memory_limit=None, scratch=":memory:", as_of: datetime | None = None) -> dict:
+    """Load files, run every detector as of `as_of` and write the alerts; returns a timing report."""
+    started = time.perf_counter()
+    conn = open_scratch(scratch, threads, memory_limit)
+    try:
+        loaded = load_files(conn, trades, orders, clients)
+        detector = ComplianceDetector(conn, rules=load_rules(rules_path) if rules_path else None, as_of=as_of)
+        detector.run_all_detectors()
+        written = write_alerts(conn, detector.as_of, detector.rules, out, db)
+        return {
+            "threads": conn.execute("SELECT current_setting('threads')").fetchone()[0],
+            "as_of": detector.as_of.isoformat(),
+            "loaded": loaded,
+            "rules": detector.timings,
+            "alerts": written,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+    finally:
+        conn.close()
+
+
+def format_report(report: dict) -> str:
+    lines = [f"Threads: {report['threads']}, as of {report['as_of']}"]
+    for table, info in report["loaded"].items():
+        lines.append(f"Loaded {info['rows']:>12,} {table:<8} in {info['seconds']:>8.3f}s")
+    lines.append(f"{'Rule':<24}{'Alerts':>10}{'Seconds':>10}")
+    for name, info in report["rules"].items():
+        lines.append(f"{name:<24}{info['alerts']:>10,}{info['seconds']:>10.3f}")
+    lines.append(f"Total alerts: {report['alerts']:,} in {report['seconds']:.3f}s")
+    return "\n".join(lines)
+
+
+def add_input_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--trades", action="append", help="Trade files: path, glob or directory (repeatable)")
+    parser.add_argument("--orders", action="append", help="Order files: path, glob or directory (repeatable)")
+    parser.add_argument("--clients", action="append", help="Client files: path, glob or directory (repeatable)")
+    parser.add_argument("--out", help="Write alerts to this Parquet file")
+    parser.add_argument("--rules", help="Rule pack YAML (default: the bundled rule pack)")
+    parser.add_argument("--memory-limit", help="DuckDB memory limit, e.g. 8GB")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.services.detect",
+                                     description="Run the compliance detectors over Parquet/CSV files.")
+    add_input_arguments(parser)
+    parser.add_argument("--db", help="Merge alerts into this DuckDB database file")
+    parser.add_argument("--as-of", type=datetime.fromisoformat,
+                        help="Event time the lookback windows end at, e.g. 2024-03-31T00:00 (default: now)")
+    parser.add_argument("--threads", type=int, help="DuckDB threads (default: all cores)")
+    parser.add_argument("--scratch", default=":memory:",
+                        help="Scratch database file for inputs larger than memory (default: in-memory)")
+    args = parser.parse_args(argv)
+    if not (args.trades or args.orders):
+        parser.error("give --trades and/or --orders")
+    if not (args.out or args.db):
+        parser.error("give --out and/or --db")
+
+    try:
+        report = run(args.trades, args.orders, args.clients, args.out, args.db, args.rules,
+                     args.threads, args.memory_limit, args.scratch, args.as_of)
+    except (duckdb.Error, ValueError) as e:
+        print(f"Detection failed: {e}", file=sys.stderr)
+        return 1
+    print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
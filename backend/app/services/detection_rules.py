@@ -1,14 +1,68 @@
 import json
+import time
 import uuid
 from datetime import datetime
 from app.core.database import get_db_connection
 from app.core.rules import load_rules
+from app.services.baselines import baseline_scores
+from app.services.rule_dsl import compile_rule_pack, run_compiled_rule
+
+def _cluster_accounts(pairs):
+    """Group linked accounts with union-find; returns a list of sorted member lists."""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    clusters = {}
+    for x in parent:
+        clusters.setdefault(find(x), []).append(x)
+    return [sorted(members) for members in clusters.values()]
+
+# (label, method) in the order run_all_detectors runs them
+DETECTORS = (
+    ("self-trade", "detect_self_trades"),
+    ("wash trade", "detect_wash_trades"),
+    ("high frequency", "detect_high_frequency_patterns"),
+    ("behavioral anomaly", "detect_behavioral_anomalies"),
+    ("cross-account", "detect_cross_account_matches"),
+    ("marking-the-close", "detect_marking_the_close"),
+    ("ramping", "detect_ramping"),
+    ("front-running", "detect_front_running"),
+    ("declarative rule", "detect_declarative_rules"),
+)
+
+# data_json fields that, with client_id and symbol, identify one alert of a rule at
+# a given as-of time; computed amounts are left out so corrections keep the identity
+ALERT_KEYS = {
+    "SELF_TRADE_DETECTION": (),
+    "WASH_TRADE_DETECTION": (),
+    "HIGH_FREQUENCY_PATTERN": (),
+    "BEHAVIORAL_ANOMALY": (),
+    "CROSS_ACCOUNT_MATCHING": ("accounts",),
+    "MARKING_THE_CLOSE": ("session_close",),
+    "RAMPING": ("side", "started_at"),
+    "FRONT_RUNNING": ("leading_order_id", "lagging_order_id"),
+}
 
 class ComplianceDetector:
-    def __init__(self, conn=None):
+    def __init__(self, conn=None, rules: dict | None = None, as_of: datetime | None = None):
         # Use provided app-scoped connection if available, else create one
         self.conn = conn or get_db_connection()
-        self.rules = load_rules()
+        self.rules = load_rules() if rules is None else rules
+        # Every lookback window ends at as_of (event time), so past days can be re-run
+        self.as_of = as_of or datetime.now()
+        # label -> {"alerts": n, "seconds": s} for the last run_all_detectors
+        self.timings = {}
     
     def detect_self_trades(self):
         """Detect potential self-trading patterns"""
@@ -22,24 +76,27 @@ class ComplianceDetector:
             query = f"""
             WITH self_trade_analysis AS (
                 SELECT 
-                    t1.client_id,
-                    t1.symbol,
+                    t1.client_key,
+                    t1.symbol_key,
                     COUNT(*) as trade_pairs,
                     SUM(CASE WHEN t1.side != t2.side THEN 1 ELSE 0 END) as offsetting_trades,
                     AVG(ABS(t1.price - t2.price)) as avg_price_diff
                 FROM trades t1
-                JOIN trades t2 ON t1.client_id = t2.client_id 
-                              AND t1.symbol = t2.symbol
+                JOIN trades t2 ON t1.client_key = t2.client_key 
+                              AND t1.symbol_key = t2.symbol_key
                               AND t1.trade_id != t2.trade_id
                               AND ABS(EPOCH(t1.timestamp - t2.timestamp))/3600 <= {max_hours}
-                GROUP BY t1.client_id, t1.symbol
+                WHERE t1.timestamp < $as_of AND t2.timestamp < $as_of
+                GROUP BY t1.client_key, t1.symbol_key
             )
-            SELECT client_id, symbol, trade_pairs, offsetting_trades, avg_price_diff
-            FROM self_trade_analysis 
-            WHERE offsetting_trades >= {min_offset} AND trade_pairs >= {min_pairs}
+            SELECT c.client_id, s.symbol, a.trade_pairs, a.offsetting_trades, a.avg_price_diff
+            FROM self_trade_analysis a
+            JOIN client_dim c ON c.client_key = a.client_key
+            JOIN symbol_dim s ON s.symbol_key = a.symbol_key
+            WHERE a.offsetting_trades >= {min_offset} AND a.trade_pairs >= {min_pairs}
             """
             
-            results = self.conn.execute(query).fetchall()
+            results = self.conn.execute(query, {"as_of": self.as_of}).fetchall()
             alerts = []
             
             for row in results:
@@ -73,7 +130,19 @@ class ComplianceDetector:
                     "data": alert_data
                 })
             
-            return alerts
+            # Evidence: every trade that has a same-client, same-symbol partner within the window
+            return self._link_evidence(alerts, "trade", f"""
+                SELECT f.alert_id, t1.trade_id AS record_id
+                FROM flagged f
+                JOIN trades t1 ON t1.client_key = f.client_key AND t1.symbol_key = f.symbol_key
+                WHERE t1.timestamp < $as_of
+                  AND EXISTS (
+                      SELECT 1 FROM trades t2
+                      WHERE t2.client_key = t1.client_key AND t2.symbol_key = t1.symbol_key
+                        AND t2.trade_id != t1.trade_id AND t2.timestamp < $as_of
+                        AND ABS(EPOCH(t1.timestamp - t2.timestamp))/3600 <= {max_hours}
+                  )
+            """, {"as_of": self.as_of})
         except Exception as e:
             print(f"Error in detect_self_trades: {e}")
             return []
@@ -90,24 +159,26 @@ class ComplianceDetector:
             query = f"""
             WITH position_analysis AS (
                 SELECT 
-                    client_id,
-                    symbol,
+                    client_key,
+                    symbol_key,
                     SUM(CASE WHEN side = 'BUY' THEN quantity ELSE -quantity END) as net_position,
                     COUNT(*) as trade_count,
                     AVG(quantity) as avg_quantity,
                     MIN(timestamp) as first_trade,
                     MAX(timestamp) as last_trade
                 FROM trades 
-                WHERE timestamp >= CURRENT_TIMESTAMP - INTERVAL {lookback_days} DAY
-                GROUP BY client_id, symbol
+                WHERE timestamp >= $as_of - INTERVAL {lookback_days} DAY AND timestamp < $as_of
+                GROUP BY client_key, symbol_key
             )
-            SELECT client_id, symbol, net_position, trade_count, avg_quantity
-            FROM position_analysis 
-            WHERE ABS(net_position) <= (avg_quantity * {net_pos_ratio})
-            AND trade_count >= {min_trades}
+            SELECT c.client_id, s.symbol, p.net_position, p.trade_count, p.avg_quantity
+            FROM position_analysis p
+            JOIN client_dim c ON c.client_key = p.client_key
+            JOIN symbol_dim s ON s.symbol_key = p.symbol_key
+            WHERE ABS(p.net_position) <= (p.avg_quantity * {net_pos_ratio})
+            AND p.trade_count >= {min_trades}
             """
             
-            results = self.conn.execute(query).fetchall()
+            results = self.conn.execute(query, {"as_of": self.as_of}).fetchall()
             alerts = []
             
             for row in results:
@@ -140,7 +211,12 @@ class ComplianceDetector:
                     "data": alert_data
                 })
             
-            return alerts
+            return self._link_evidence(alerts, "trade", f"""
+                SELECT f.alert_id, t.trade_id AS record_id
+                FROM flagged f
+                JOIN trades t ON t.client_key = f.client_key AND t.symbol_key = f.symbol_key
+                WHERE t.timestamp >= $as_of - INTERVAL {lookback_days} DAY AND t.timestamp < $as_of
+            """, {"as_of": self.as_of})
         except Exception as e:
             print(f"Error in detect_wash_trades: {e}")
             return []
@@ -156,25 +232,45 @@ class ComplianceDetector:
             query = f"""
             WITH hourly_trading AS (
                 SELECT 
-                    client_id,
-                    symbol,
+                    client_key,
+                    symbol_key,
                     DATE_TRUNC('hour', timestamp) as trading_hour,
                     COUNT(*) as trades_per_hour
                 FROM trades
-                WHERE timestamp >= CURRENT_TIMESTAMP - INTERVAL {lookback_hours} HOUR
-                GROUP BY client_id, symbol, DATE_TRUNC('hour', timestamp)
+                WHERE timestamp >= $as_of - INTERVAL {lookback_hours} HOUR AND timestamp < $as_of
+                GROUP BY client_key, symbol_key, DATE_TRUNC('hour', timestamp)
+            ), peaks AS (
+                SELECT client_key, symbol_key, MAX(trades_per_hour) as max_hourly_trades
+                FROM hourly_trading
+                GROUP BY client_key, symbol_key
+                HAVING MAX(trades_per_hour) > {min_max_trades}
             )
-            SELECT client_id, symbol, MAX(trades_per_hour) as max_hourly_trades
-            FROM hourly_trading
-            GROUP BY client_id, symbol
-            HAVING MAX(trades_per_hour) > {min_max_trades}
+            SELECT c.client_id, s.symbol, p.max_hourly_trades
+            FROM peaks p
+            JOIN client_dim c ON c.client_key = p.client_key
+            JOIN symbol_dim s ON s.symbol_key = p.symbol_key
             """
             
-            results = self.conn.execute(query).fetchall()
+            results = self.conn.execute(query, {"as_of": self.as_of}).fetchall()
             alerts = []
+
+            # Clients with enough history are judged against their own hourly norm, so a
+            # market maker's usual pace does not trip the global threshold
+            baseline_z = {}
+            if cfg.get('suppress_within_baseline', True):
+                bcfg = self.rules.get('behavioral_baseline', {})
+                for score in baseline_scores(self.conn, lookback_hours, int(bcfg.get('min_baseline_hours', 20)),
+                                             now=self.as_of, window_days=int(bcfg.get('window_days', 30))):
+                    key = (score["client_id"], score["symbol"])
+                    if score["z_trades"] is not None:
+                        baseline_z[key] = max(baseline_z.get(key, score["z_trades"]), score["z_trades"])
+                z_threshold = float(bcfg.get('z_threshold', 4.0))
             
             for row in results:
                 client_id, symbol, max_trades = row
+                z_trades = baseline_z.get((client_id, symbol))
+                if z_trades is not None and z_trades < z_threshold:
+                    continue
                 
                 alert_data = {
                     "client_id": client_id,
@@ -182,6 +278,8 @@ class ComplianceDetector:
                     "max_hourly_trades": max_trades,
                     "risk_score": min(100, max_trades)
                 }
+                if z_trades is not None:
+                    alert_data["baseline_z_trades"] = round(z_trades, 2)
                 
                 severity = "HIGH" if max_trades > high_freq_threshold else "MEDIUM"
                 
@@ -201,30 +299,637 @@ class ComplianceDetector:
                     "data": alert_data
                 })
             
-            return alerts
+            # Evidence: the trades of the peak hour(s)
+            return self._link_evidence(alerts, "trade", f"""
+                SELECT alert_id, record_id
+                FROM (
+                    SELECT f.alert_id, t.trade_id AS record_id,
+                           COUNT(*) OVER (PARTITION BY f.alert_id, date_trunc('hour', t.timestamp)) AS hour_trades,
+                           CAST(f.data->>'max_hourly_trades' AS BIGINT) AS peak
+                    FROM flagged f
+                    JOIN trades t ON t.client_key = f.client_key AND t.symbol_key = f.symbol_key
+                    WHERE t.timestamp >= $as_of - INTERVAL {lookback_hours} HOUR AND t.timestamp < $as_of
+                )
+                WHERE hour_trades = peak
+            """, {"as_of": self.as_of})
         except Exception as e:
             print(f"Error in detect_high_frequency_patterns: {e}")
             return []
     
+    def detect_behavioral_anomalies(self):
+        """Detect hours that deviate sharply from a client's own per-symbol baseline"""
+        try:
+            cfg = self.rules.get('behavioral_baseline', {})
+            lookback_hours = int(cfg.get('lookback_hours', 24))
+            min_hours = int(cfg.get('min_baseline_hours', 20))
+            window_days = int(cfg.get('window_days', 30))
+            z_threshold = float(cfg.get('z_threshold', 4.0))
+            high_z = float(cfg.get('high_severity_z', 6.0))
+
+            # Keep the most extreme hour per (client, symbol)
+            worst = {}
+            for score in baseline_scores(self.conn, lookback_hours, min_hours, now=self.as_of, window_days=window_days):
+                zs = {m: score[f"z_{m}"] for m in ("trades", "notional", "net") if score[f"z_{m}"] is not None}
+                if not zs:
+                    continue
+                metric = max(zs, key=lambda m: abs(zs[m]))
+                key = (score["client_id"], score["symbol"])
+                if abs(zs[metric]) >= z_threshold and (key not in worst or abs(zs[metric]) > worst[key][1]):
+                    worst[key] = (metric, abs(zs[metric]), zs, score)
+
+            alerts = []
+            for (client_id, symbol), (metric, z, zs, score) in worst.items():
+                alert_data = {
+                    "client_id": client_id,
+                    "symbol": symbol,
+                    "hour": score["hour"].isoformat(),
+                    "metric": metric,
+                    "z_scores": {m: round(v, 2) for m, v in zs.items()},
+                    "hourly_trades": score["trades"],
+                    "hourly_notional": round(score["notional"], 2),
+                    "hourly_net_position": score["net"],
+                    "baseline_hours": score["baseline_hours"],
+                    "risk_score": min(100, round(z * 10))
+                }
+
+                severity = "HIGH" if z >= high_z else "MEDIUM"
+
+                alert_id = str(uuid.uuid4())
+                description = (
+                    f"Client {client_id} {symbol} hourly {metric} is {z:.1f} standard deviations "
+                    f"from its {score['baseline_hours']}-hour baseline"
+                )
+
+                self.conn.execute("""
+                    INSERT INTO alerts (alert_id, rule_name, severity, description, client_id, symbol, data_json)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [alert_id, "BEHAVIORAL_ANOMALY", severity, description, client_id, symbol, json.dumps(alert_data)])
+
+                alerts.append({
+                    "alert_id": alert_id,
+                    "rule_name": "BEHAVIORAL_ANOMALY",
+                    "severity": severity,
+                    "description": description,
+                    "data": alert_data
+                })
+
+            return self._link_evidence(alerts, "trade", """
+                SELECT f.alert_id, t.trade_id AS record_id
+                FROM flagged f
+                JOIN trades t ON t.client_key = f.client_key AND t.symbol_key = f.symbol_key
+                WHERE t.timestamp >= CAST(f.data->>'hour' AS TIMESTAMP)
+                  AND t.timestamp < CAST(f.data->>'hour' AS TIMESTAMP) + INTERVAL 1 HOUR
+            """)
+        except Exception as e:
+            print(f"Error in detect_behavioral_anomalies: {e}")
+            return []
+
+    def detect_cross_account_matches(self):
+        """Detect accounts that repeatedly take opposite sides of the same trade"""
+        try:
+            cfg = self.rules.get('cross_account_matching', {})
+            lookback_days = int(cfg.get('lookback_days', 1))
+            window = max(1, int(cfg.get('match_window_seconds', 5)))
+            min_pairs = int(cfg.get('min_matched_pairs', 3))
+            high_cluster = int(cfg.get('high_severity_cluster_size', 3))
+            high_pairs = int(cfg.get('high_severity_matched_pairs', 10))
+
+            # Trades are bucketed by (symbol, price, quantity, time bucket) and buys are
+            # hash-joined to sells in the same or a neighbouring bucket, so no range join.
+            bucket_join = """
+                SELECT b.client_key AS buy_client, s.client_key AS sell_client, b.symbol_key,
+                       b.trade_id AS buy_trade, s.trade_id AS sell_trade
+                FROM buys b
+                JOIN sells s ON s.symbol_key = b.symbol_key
+                            AND s.price = b.price
+                            AND s.quantity = b.quantity
+                            AND s.bucket = b.bucket {offset}
+                WHERE s.client_key != b.client_key
+                  AND ABS(EPOCH(s.timestamp - b.timestamp)) <= {window}
+            """
+            query = f"""
+            WITH recent AS (
+                SELECT trade_id, client_key, symbol_key, side, quantity, price, timestamp,
+                       CAST(FLOOR(EPOCH(timestamp) / {window}) AS BIGINT) AS bucket
+                FROM trades
+                WHERE timestamp >= $as_of - INTERVAL {lookback_days} DAY AND timestamp < $as_of
+            ),
+            buys AS (SELECT * FROM recent WHERE side = 'BUY'),
+            sells AS (SELECT * FROM recent WHERE side = 'SELL'),
+            matches AS (
+                {bucket_join.format(offset="", window=window)}
+                UNION ALL
+                {bucket_join.format(offset="+ 1", window=window)}
+                UNION ALL
+                {bucket_join.format(offset="- 1", window=window)}
+            ),
+            linked AS (
+                SELECT LEAST(m.buy_client, m.sell_client) AS client_a,
+                       GREATEST(m.buy_client, m.sell_client) AS client_b,
+                       COUNT(*) AS matched_pairs,
+                       list_sort(LIST(DISTINCT sd.symbol)) AS symbols,
+                       list_concat(LIST(m.buy_trade), LIST(m.sell_trade)) AS trade_ids
+                FROM matches m
+                JOIN symbol_dim sd ON sd.symbol_key = m.symbol_key
+                GROUP BY 1, 2
+                HAVING COUNT(*) >= {min_pairs}
+            )
+            SELECT ca.client_id, cb.client_id, l.matched_pairs, l.symbols, l.trade_ids
+            FROM linked l
+            JOIN client_dim ca ON ca.client_key = l.client_a
+            JOIN client_dim cb ON cb.client_key = l.client_b
+            """
+
+            results = self.conn.execute(query, {"as_of": self.as_of}).fetchall()
+            pair_stats = {(a, b): (matched, symbols) for a, b, matched, symbols, _ in results}
+            pair_trades = {(a, b): trade_ids for a, b, _, _, trade_ids in results}
+            alerts = []
+            evidence = []
+
+            for members in _cluster_accounts(pair_stats.keys()):
+                member_set = set(members)
+                links = [
+                    {"accounts": [a, b], "matched_pairs": matched, "symbols": symbols}
+                    for (a, b), (matched, symbols) in pair_stats.items()
+                    if a in member_set
+                ]
+                total_matches = sum(link["matched_pairs"] for link in links)
+                symbols = sorted({sym for link in links for sym in link["symbols"]})
+
+                alert_data = {
+                    "accounts": members,
+                    "symbols": symbols,
+                    "matched_pairs": total_matches,
+                    "links": links,
+                    "match_window_seconds": window,
+                    "risk_score": min(100, total_matches * 10)
+                }
+
+                severity = "HIGH" if len(members) >= high_cluster or total_matches >= high_pairs else "MEDIUM"
+
+                alert_id = str(uuid.uuid4())
+                client_id = members[0]
+                symbol = symbols[0] if len(symbols) == 1 else None
+                description = (
+                    f"Accounts {', '.join(members)} took opposite sides of {total_matches} "
+                    f"matching trades in {', '.join(symbols)} within {window} seconds"
+                )
+
+                self.conn.execute("""
+                    INSERT INTO alerts (alert_id, rule_name, severity, description, client_id, symbol, data_json)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [alert_id, "CROSS_ACCOUNT_MATCHING", severity, description, client_id, symbol, json.dumps(alert_data)])
+
+                alerts.append({
+                    "alert_id": alert_id,
+                    "rule_name": "CROSS_ACCOUNT_MATCHING",
+                    "severity": severity,
+                    "description": description,
+                    "data": alert_data
+                })
+                cluster_trades = {t for link in links for t in pair_trades[tuple(link["accounts"])]}
+                evidence.extend((alert_id, trade_id) for trade_id in sorted(cluster_trades))
+
+            # Matched trade ids come straight from the matching query, one INSERT for all clusters
+            if evidence:
+                self.conn.execute("""
+                    INSERT INTO alert_evidence (alert_id, kind, record_id)
+                    SELECT UNNEST($alert_ids), 'trade', UNNEST($record_ids)
+                """, {"alert_ids": [e[0] for e in evidence], "record_ids": [e[1] for e in evidence]})
+            return alerts
+        except Exception as e:
+            print(f"Error in detect_cross_account_matches: {e}")
+            return []
+
+    def _link_evidence(self, alerts, kind, query, params=None):
+        """Record the trades or orders behind `alerts` in alert_evidence with one INSERT ... SELECT.
+
+        `query` selects (alert_id, record_id) and reads the alerts from `flagged`:
+        alert_id, client_key, symbol_key and data (the alert data as JSON).
+        """
+        if alerts:
+            try:
+                self.conn.execute(f"""
+                    INSERT INTO alert_evidence (alert_id, kind, record_id)
+                    WITH flagged AS (
+                        SELECT a.alert_id, c.client_key, s.symbol_key, CAST(a.data_json AS JSON) AS data
+                        FROM alerts a
+                        LEFT JOIN client_dim c ON c.client_id = a.client_id
+                        LEFT JOIN symbol_dim s ON s.symbol = a.symbol
+                        WHERE a.alert_id IN (SELECT UNNEST($alert_ids))
+                    )
+                    SELECT DISTINCT alert_id, '{kind}', record_id FROM ({query})
+                """, {**(params or {}), "alert_ids": [a["alert_id"] for a in alerts]})
+            except Exception as e:
+                print(f"Error recording {kind} evidence: {e}")
+        return alerts
+
+    def _insert_alerts(self, alerts):
+        """Write detector alerts in one batch instead of one INSERT per alert"""
+        if alerts:
+            self.conn.executemany("""
+                INSERT INTO alerts (alert_id, rule_name, severity, description, client_id, symbol, data_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [
+                [a["alert_id"], a["rule_name"], a["severity"], a["description"],
+                 a["data"].get("client_id"), a["data"].get("symbol"), json.dumps(a["data"])]
+                for a in alerts
+            ])
+        return alerts
+
+    def detect_marking_the_close(self):
+        """Detect clients whose trades in the last minutes of the session move the closing price"""
+        try:
+            cfg = self.rules.get('marking_the_close', {})
+            lookback_days = int(cfg.get('lookback_days', 1))
+            session_close = str(cfg.get('session_close', '16:00:00'))
+            window_minutes = int(cfg.get('close_window_minutes', 10))
+            min_trades = int(cfg.get('min_close_trades', 3))
+            min_concentration = float(cfg.get('min_close_concentration', 0.5))
+            min_move = float(cfg.get('min_price_move_pct', 0.5))
+            min_impact = float(cfg.get('min_impact_share', 0.5))
+            high_move = float(cfg.get('high_severity_price_move_pct', 2.0))
+
+            # One sorted pass per symbol and session: LAG gives each trade's price step, so a
+            # client's impact on the close is the sum of the steps its own trades made.
+            # Ties are broken by rowid (load order); a TIMESTAMP bound keeps the filter uncast.
+            # Only sessions where some client traded enough in the close window are sorted.
+            query = """
+            WITH session_trades AS (
+                SELECT rowid AS seq, client_key, symbol_key, side, quantity, price, timestamp,
+                       CAST(timestamp AS DATE) + CAST($session_close AS TIME) AS close_at
+                FROM trades
+                WHERE timestamp >= $as_of - to_days(CAST($lookback_days AS INTEGER)) AND timestamp < $as_of
+            ),
+            candidates AS (
+                SELECT DISTINCT symbol_key, close_at
+                FROM (
+                    SELECT client_key, symbol_key, close_at
+                    FROM session_trades
+                    WHERE timestamp > close_at - to_minutes(CAST($window_minutes AS INTEGER)) AND timestamp <= close_at
+                    GROUP BY client_key, symbol_key, close_at
+                    HAVING COUNT(*) >= $min_trades
+                )
+            ),
+            stream AS (
+                SELECT t.*,
+                       price - LAG(price) OVER (PARTITION BY t.symbol_key, t.close_at ORDER BY timestamp, seq) AS step,
+                       timestamp > t.close_at - to_minutes(CAST($window_minutes AS INTEGER)) AS in_close
+                FROM session_trades t
+                SEMI JOIN candidates c ON c.symbol_key = t.symbol_key AND c.close_at = t.close_at
+                WHERE timestamp <= t.close_at
+            ),
+            symbol_close AS (
+                SELECT symbol_key, close_at,
+                       arg_max(price, timestamp) FILTER (WHERE in_close) AS close_price,
+                       COALESCE(arg_max(price, timestamp) FILTER (WHERE NOT in_close),
+                                arg_min(price, timestamp) FILTER (WHERE in_close)) AS reference_price
+                FROM stream
+                GROUP BY symbol_key, close_at
+                HAVING COUNT(*) FILTER (WHERE in_close) > 0
+            ),
+            client_close AS (
+                SELECT client_key, symbol_key, close_at,
+                       COUNT(*) FILTER (WHERE in_close) AS close_trades,
+                       COUNT(*) AS session_trades,
+                       SUM(CASE WHEN side = 'BUY' THEN quantity ELSE -quantity END) FILTER (WHERE in_close) AS close_net_quantity,
+                       SUM(COALESCE(step, 0)) FILTER (WHERE in_close) AS price_impact
+                FROM stream
+                GROUP BY client_key, symbol_key, close_at
+                HAVING COUNT(*) FILTER (WHERE in_close) >= $min_trades
+            ),
+            scored AS (
+                SELECT cc.*, sc.reference_price, sc.close_price,
+                       CAST(sc.close_price - sc.reference_price AS DOUBLE) AS price_move,
+                       CAST(sc.close_price - sc.reference_price AS DOUBLE) / CAST(sc.reference_price AS DOUBLE) * 100 AS move_pct
+                FROM client_close cc
+                JOIN symbol_close sc ON sc.symbol_key = cc.symbol_key AND sc.close_at = cc.close_at
+            )
+            SELECT c.client_id, s.symbol, a.close_at, a.close_trades, a.session_trades, a.close_net_quantity,
+                   CAST(a.reference_price AS DOUBLE), CAST(a.close_price AS DOUBLE), a.move_pct,
+                   CAST(a.price_impact AS DOUBLE) / a.price_move AS impact_share
+            FROM scored a
+            JOIN client_dim c ON c.client_key = a.client_key
+            JOIN symbol_dim s ON s.symbol_key = a.symbol_key
+            WHERE ABS(a.move_pct) >= $min_move
+              AND a.close_trades >= $min_concentration * a.session_trades
+              AND SIGN(a.close_net_quantity) = SIGN(a.price_move)
+              AND CAST(a.price_impact AS DOUBLE) / a.price_move >= $min_impact
+            ORDER BY a.close_at, c.client_id, s.symbol
+            """
+
+            results = self.conn.execute(query, {
+                "as_of": self.as_of,
+                "session_close": session_close, "lookback_days": lookback_days, "window_minutes": window_minutes,
+                "min_trades": min_trades, "min_move": min_move, "min_concentration": min_concentration,
+                "min_impact": min_impact,
+            }).fetchall()
+            alerts = []
+
+            for row in results:
+                client_id, symbol, close_at, close_trades, session_trades, net_qty, ref_price, close_price, move_pct, impact = row
+                direction = "up" if move_pct > 0 else "down"
+
+                alert_data = {
+                    "client_id": client_id,
+                    "symbol": symbol,
+                    "session_close": close_at.isoformat(),
+                    "close_window_minutes": window_minutes,
+                    "close_trades": close_trades,
+                    "session_trades": session_trades,
+                    "close_net_quantity": net_qty,
+                    "reference_price": ref_price,
+                    "closing_price": close_price,
+                    "price_move_pct": round(move_pct, 4),
+                    "impact_share": round(impact, 4),
+                    "risk_score": min(100, round(abs(move_pct) / high_move * 50 + min(impact, 1) * 50, 2))
+                }
+
+                severity = "HIGH" if abs(move_pct) >= high_move else "MEDIUM"
+                description = (
+                    f"Client {client_id} placed {close_trades} trades in {symbol} in the last {window_minutes} minutes "
+                    f"before the close, moving the closing price {direction} {abs(move_pct):.2f}%"
+                )
+                alerts.append({
+                    "alert_id": str(uuid.uuid4()),
+                    "rule_name": "MARKING_THE_CLOSE",
+                    "severity": severity,
+                    "description": description,
+                    "data": alert_data
+                })
+
+            return self._link_evidence(self._insert_alerts(alerts), "trade", """
+                SELECT f.alert_id, t.trade_id AS record_id
+                FROM flagged f
+                JOIN trades t ON t.client_key = f.client_key AND t.symbol_key = f.symbol_key
+                WHERE t.timestamp > CAST(f.data->>'session_close' AS TIMESTAMP)
+                                    - to_minutes(CAST(f.data->>'close_window_minutes' AS INTEGER))
+                  AND t.timestamp <= CAST(f.data->>'session_close' AS TIMESTAMP)
+            """)
+        except Exception as e:
+            print(f"Error in detect_marking_the_close: {e}")
+            return []
+
+    def detect_ramping(self):
+        """Detect runs of same-side trades that push a symbol's price steadily up or down"""
+        try:
+            cfg = self.rules.get('ramping', {})
+            lookback_days = int(cfg.get('lookback_days', 1))
+            max_gap = int(cfg.get('max_gap_minutes', 10))
+            min_trades = int(cfg.get('min_run_trades', 5))
+            min_move = float(cfg.get('min_price_move_pct', 1.0))
+            min_monotonic = float(cfg.get('min_monotonic_ratio', 0.8))
+            high_move = float(cfg.get('high_severity_price_move_pct', 3.0))
+
+            # Gaps-and-islands over each client's sorted trades in a symbol: a run ends when
+            # the side flips or the client pauses longer than max_gap_minutes
+            # Only client/symbol pairs with enough trades for a run are sorted at all
+            query = """
+            WITH window_trades AS (
+                SELECT rowid AS seq, client_key, symbol_key, side, quantity, price, timestamp
+                FROM trades
+                WHERE timestamp >= $as_of - to_days(CAST($lookback_days AS INTEGER)) AND timestamp < $as_of
+            ),
+            candidates AS (
+                SELECT client_key, symbol_key
+                FROM window_trades
+                GROUP BY client_key, symbol_key
+                HAVING COUNT(*) >= $min_trades
+            ),
+            recent AS (
+                SELECT t.*,
+                       LAG(side) OVER w AS prev_side,
+                       LAG(timestamp) OVER w AS prev_timestamp,
+                       LAG(price) OVER w AS prev_price
+                FROM window_trades t
+                SEMI JOIN candidates c ON c.client_key = t.client_key AND c.symbol_key = t.symbol_key
+                WINDOW w AS (PARTITION BY t.client_key, t.symbol_key ORDER BY t.timestamp, t.seq)
+            ),
+            marked AS (
+                SELECT *,
+                       prev_side IS NULL OR side <> prev_side
+                           OR timestamp - prev_timestamp > to_minutes(CAST($max_gap AS INTEGER)) AS run_start
+                FROM recent
+            ),
+            numbered AS (
+                SELECT *,
+                       SUM(CASE WHEN run_start THEN 1 ELSE 0 END) OVER (
+                           PARTITION BY client_key, symbol_key ORDER BY timestamp, seq
+                           ROWS UNBOUNDED PRECEDING
+                       ) AS run_id
+                FROM marked
+            ),
+            runs AS (
+                SELECT client_key, symbol_key, run_id,
+                       ANY_VALUE(side) AS side,
+                       COUNT(*) AS trades,
+                       SUM(quantity) AS quantity,
+                       MIN(timestamp) AS started_at,
+                       MAX(timestamp) AS ended_at,
+                       CAST(arg_min(price, timestamp) AS DOUBLE) AS first_price,
+                       CAST(arg_max(price, timestamp) AS DOUBLE) AS last_price,
+                       COUNT(*) FILTER (WHERE NOT run_start AND (
+                           (side = 'BUY' AND price > prev_price) OR (side = 'SELL' AND price < prev_price)
+                       )) AS favourable_steps
+                FROM numbered
+                GROUP BY client_key, symbol_key, run_id
+                HAVING COUNT(*) >= $min_trades
+            )
+            SELECT c.client_id, s.symbol, r.side, r.trades, r.quantity, r.started_at, r.ended_at,
+                   r.first_price, r.last_price,
+                   (r.last_price - r.first_price) / r.first_price * 100 AS move_pct,
+                   r.favourable_steps / (r.trades - 1) AS monotonic_ratio
+            FROM runs r
+            JOIN client_dim c ON c.client_key = r.client_key
+            JOIN symbol_dim s ON s.symbol_key = r.symbol_key
+            WHERE (CASE WHEN r.side = 'BUY' THEN 1 ELSE -1 END) * (r.last_price - r.first_price) / r.first_price * 100 >= $min_move
+              AND r.favourable_steps / (r.trades - 1) >= $min_monotonic
+            ORDER BY r.started_at, c.client_id, s.symbol
+            """
+
+            results = self.conn.execute(query, {
+                "as_of": self.as_of,
+                "lookback_days": lookback_days, "max_gap": max_gap, "min_trades": min_trades,
+                "min_move": min_move, "min_monotonic": min_monotonic,
+            }).fetchall()
+            alerts = []
+
+            for row in results:
+                client_id, symbol, side, trades, quantity, started, ended, first_price, last_price, move_pct, monotonic = row
+                minutes = (ended - started).total_seconds() / 60
+
+                alert_data = {
+                    "client_id": client_id,
+                    "symbol": symbol,
+                    "side": side,
+                    "run_trades": trades,
+                    "run_quantity": quantity,
+                    "started_at": started.isoformat(),
+                    "ended_at": ended.isoformat(),
+                    "first_price": first_price,
+                    "last_price": last_price,
+                    "price_move_pct": round(move_pct, 4),
+                    "monotonic_ratio": round(monotonic, 4),
+                    "risk_score": min(100, round(abs(move_pct) / high_move * 100, 2))
+                }
+
+                severity = "HIGH" if abs(move_pct) >= high_move else "MEDIUM"
+                description = (
+                    f"Client {client_id} made {trades} consecutive {side} trades in {symbol} over {minutes:.0f} minutes, "
+                    f"moving the price {abs(move_pct):.2f}% {'up' if move_pct > 0 else 'down'}"
+                )
+                alerts.append({
+                    "alert_id": str(uuid.uuid4()),
+                    "rule_name": "RAMPING",
+                    "severity": severity,
+                    "description": description,
+                    "data": alert_data
+                })
+
+            # A run is consecutive in the client's stream, so its time span holds only its own trades
+            return self._link_evidence(self._insert_alerts(alerts), "trade", """
+                SELECT f.alert_id, t.trade_id AS record_id
+                FROM flagged f
+                JOIN trades t ON t.client_key = f.client_key AND t.symbol_key = f.symbol_key
+                WHERE t.side = (f.data->>'side')
+                  AND t.timestamp BETWEEN CAST(f.data->>'started_at' AS TIMESTAMP)
+                                      AND CAST(f.data->>'ended_at' AS TIMESTAMP)
+            """)
+        except Exception as e:
+            print(f"Error in detect_ramping: {e}")
+            return []
+
+    def detect_front_running(self):
+        """Detect traders placing house-account orders just ahead of large client orders they handle"""
+        try:
+            cfg = self.rules.get('front_running', {})
+            lookback_days = int(cfg.get('lookback_days', 1))
+            min_notional = float(cfg.get('min_client_notional', 100000))
+            max_lead = int(cfg.get('max_lead_seconds', 60))
+            house_types = [str(t).upper() for t in cfg.get('house_client_types', ['PROP_TRADING', 'HOUSE', 'EMPLOYEE'])]
+            high_lead = int(cfg.get('high_severity_lead_seconds', 10))
+
+            # Each large client order is as-of joined to the latest earlier house order by the
+            # same trader in the same symbol and side: a sort-merge per key, no time-range join.
+            # Only client orders whose key has any house order at all go into the sort.
+            query = """
+            WITH house_keys AS (
+                SELECT cd.client_key
+                FROM client_dim cd
+                JOIN clients cl ON cl.client_id = cd.client_id
+                WHERE UPPER(cl.client_type) IN (SELECT UNNEST($house_types))
+            ),
+            recent AS (
+                SELECT order_id, client_key, trader_id, symbol_key, side, quantity, price, timestamp
+                FROM orders
+                WHERE timestamp >= $as_of - to_days(CAST($lookback_days AS INTEGER)) AND timestamp < $as_of
+                  AND trader_id IS NOT NULL
+            ),
+            house_orders AS (
+                SELECT * FROM recent SEMI JOIN house_keys USING (client_key)
+            ),
+            house_order_keys AS (
+                SELECT DISTINCT trader_id, symbol_key, side FROM house_orders
+            ),
+            large AS (
+                SELECT r.*
+                FROM recent r
+                SEMI JOIN house_order_keys k
+                  ON k.trader_id = r.trader_id AND k.symbol_key = r.symbol_key AND k.side = r.side
+                WHERE r.quantity * r.price >= $min_notional
+                  AND r.client_key NOT IN (SELECT client_key FROM house_keys)
+            )
+            SELECT l.order_id, h.order_id, l.trader_id, cl.client_id, ch.client_id, s.symbol, l.side,
+                   l.quantity, CAST(l.price AS DOUBLE), l.timestamp,
+                   h.quantity, CAST(h.price AS DOUBLE), h.timestamp,
+                   EPOCH(l.timestamp - h.timestamp) AS lead_seconds
+            FROM large l
+            ASOF JOIN house_orders h
+              ON h.trader_id = l.trader_id
+             AND h.symbol_key = l.symbol_key
+             AND h.side = l.side
+             AND h.timestamp < l.timestamp
+            JOIN client_dim cl ON cl.client_key = l.client_key
+            JOIN client_dim ch ON ch.client_key = h.client_key
+            JOIN symbol_dim s ON s.symbol_key = l.symbol_key
+            WHERE EPOCH(l.timestamp - h.timestamp) <= $max_lead
+            ORDER BY l.timestamp, l.order_id
+            """
+
+            results = self.conn.execute(query, {
+                "as_of": self.as_of,
+                "lookback_days": lookback_days, "min_notional": min_notional,
+                "max_lead": max_lead, "house_types": house_types,
+            }).fetchall()
+            alerts = []
+
+            for row in results:
+                (client_order, lead_order, trader_id, client_id, house_client, symbol, side,
+                 quantity, price, placed_at, lead_quantity, lead_price, lead_at, lead_seconds) = row
+
+                alert_data = {
+                    "client_id": client_id,
+                    "symbol": symbol,
+                    "trader_id": trader_id,
+                    "side": side,
+                    "leading_order_id": lead_order,
+                    "lagging_order_id": client_order,
+                    "house_account": house_client,
+                    "lead_seconds": lead_seconds,
+                    "client_order": {"quantity": quantity, "price": price, "timestamp": placed_at.isoformat(),
+                                     "notional": round(quantity * price, 2)},
+                    "leading_order": {"quantity": lead_quantity, "price": lead_price, "timestamp": lead_at.isoformat()},
+                    "risk_score": min(100, round(100 * (1 - lead_seconds / (max_lead + 1)), 2))
+                }
+
+                severity = "HIGH" if lead_seconds <= high_lead else "MEDIUM"
+                description = (
+                    f"Trader {trader_id} placed a {side} order in {symbol} for house account {house_client} "
+                    f"{lead_seconds:.0f}s before client {client_id}'s {quantity * price:,.0f} {side} order"
+                )
+                alerts.append({
+                    "alert_id": str(uuid.uuid4()),
+                    "rule_name": "FRONT_RUNNING",
+                    "severity": severity,
+                    "description": description,
+                    "data": alert_data
+                })
+
+            return self._link_evidence(self._insert_alerts(alerts), "order", """
+                SELECT alert_id, UNNEST([data->>'leading_order_id', data->>'lagging_order_id']) AS record_id
+                FROM flagged
+            """)
+        except Exception as e:
+            print(f"Error in detect_front_running: {e}")
+            return []
+
+    def detect_declarative_rules(self):
+        """Run the rule pack's declarative rules, each as one set-based statement"""
+        compiled, errors = compile_rule_pack(self.rules)
+        for name, error in errors.items():
+            print(f"Skipping declarative rule {name}: {error}")
+        alerts = []
+        for rule in compiled:
+            try:
+                started = time.perf_counter()
+                rule_alerts = run_compiled_rule(self.conn, rule, self.as_of)
+                self.timings[rule.name] = {"alerts": len(rule_alerts), "seconds": round(time.perf_counter() - started, 3)}
+                alerts.extend(rule_alerts)
+            except Exception as e:
+                print(f"Error in declarative rule {rule.name}: {e}")
+        return alerts
+
     def run_all_detectors(self):
-        """Run all detection algorithms"""
+        """Run all detection algorithms, recording per-detector time in self.timings"""
         try:
             all_alerts = []
-            
-            print("Running self-trade detection...")
-            self_trade_alerts = self.detect_self_trades()
-            all_alerts.extend(self_trade_alerts)
-            print(f"Generated {len(self_trade_alerts)} self-trade alerts")
-            
-            print("Running wash trade detection...")
-            wash_trade_alerts = self.detect_wash_trades()
-            all_alerts.extend(wash_trade_alerts)
-            print(f"Generated {len(wash_trade_alerts)} wash trade alerts")
-            
-            print("Running high frequency pattern detection...")
-            hf_alerts = self.detect_high_frequency_patterns()
-            all_alerts.extend(hf_alerts)
-            print(f"Generated {len(hf_alerts)} high frequency alerts")
+            for label, method in DETECTORS:
+                print(f"Running {label} detection...")
+                started = time.perf_counter()
+                alerts = getattr(self, method)()
+                self.timings[label] = {"alerts": len(alerts), "seconds": round(time.perf_counter() - started, 3)}
+                all_alerts.extend(alerts)
+                print(f"Generated {len(alerts)} {label} alerts")
             
             print(f"Total alerts generated: {len(all_alerts)}")
             return all_alerts
@@ -0,0 +1,281 @@
+import asyncio
+import glob
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+import duckdb
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.core.database import get_db_connection
+from app.core.resources import connection_config
+from app.core.tenancy import tenant_database_path
+
+
+def _file_bytes(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, f"{path}.wal") if os.path.exists(p))
+
+
+def database_path(conn) -> str:
+    return conn.execute(
+        "SELECT path FROM duckdb_databases() WHERE database_name = current_database()"
+    ).fetchone()[0]
+
+
+def storage_stats(conn) -> dict:
+    """Block usage of the attached database file; `fragmentation` is the share of free blocks."""
+    _, _, block_size, total_blocks, used_blocks, free_blocks, *_ = conn.execute("PRAGMA database_size").fetchone()
+    path = database_path(conn)
+    return {
+        "path": path,
+        "file_bytes": _file_bytes(path),
+        "block_size": block_size,
+        "total_blocks": total_blocks,
+        "used_blocks": used_blocks,
+        "free_blocks": free_blocks,
+        "fragmentation": round(free_blocks / total_blocks, 4) if total_blocks else 0.0,
+    }
+
+
+def checkpoint_and_analyze(conn) -> None:
+    """Refresh optimizer statistics and fold the WAL into the file.
+
+    DuckDB's VACUUM only refreshes statistics (same as ANALYZE); freed blocks
+    are reused by later writes and trailing ones are truncated at checkpoint,
+    but space in the middle of the file is only given back by a rebuild.
+    """
+    conn.execute("ANALYZE")
+    conn.execute("CHECKPOINT")
+
+
+def write_compacted_copy(conn) -> str:
+    """Copy every table, view, type and sequence into a fresh file next to the database.
+
+    Returns the copy's path; `swap_in_copy` moves it over the original once
+    every connection to the database is closed.
+    """
+    path = database_path(conn)
+    name = conn.execute("SELECT current_database()").fetchone()[0]
+    compact_path = f"{path}.compact"
+    for stale in (compact_path, f"{compact_path}.wal"):
+        if os.path.exists(stale):
+            os.remove(stale)
+    conn.execute(f"ATTACH '{compact_path.replace(chr(39), chr(39) * 2)}' AS compact_target")
+    try:
+        conn.execute(f'COPY FROM DATABASE "{name}" TO compact_target')
+    finally:
+        conn.execute("DETACH compact_target")
+    return compact_path
+
+
+def swap_in_copy(path: str, compact_path: str) -> None:
+    os.replace(compact_path, path)
+    if os.path.exists(f"{path}.wal"):
+        os.remove(f"{path}.wal")
+
+
+def maintain(conn, reopen, rebuild_fragmentation: float, rebuild_min_free_bytes: int):
+    """Checkpoint and analyze, then rebuild the file if too much of it is free blocks.
+
+    `reopen()` returns a new connection to the same file and is only called
+    after a rebuild. Returns (connection to use from now on, report dict).
+    """
+    started = time.perf_counter()
+    before = storage_stats(conn)
+    checkpoint_and_analyze(conn)
+    stats = checkpointed = storage_stats(conn)
+    actions = ["analyze", "checkpoint"]
+    free_bytes = stats["free_blocks"] * stats["block_size"]
+    if stats["fragmentation"] >= rebuild_fragmentation and free_bytes >= rebuild_min_free_bytes:
+        compact_path = write_compacted_copy(conn)
+        # The caller holds the only connection; the file is swapped while it is closed
+        conn.close()
+        try:
+            swap_in_copy(before["path"], compact_path)
+        finally:
+            conn = reopen()
+        actions.append("rebuild")
+        stats = storage_stats(conn)
+    return conn, {
+        "path": before["path"],
+        "at": datetime.now().isoformat(),
+        "actions": actions,
+        "bytes_before": before["file_bytes"],
+        "bytes_after": stats["file_bytes"],
+        "bytes_reclaimed": before["file_bytes"] - stats["file_bytes"],
+        "fragmentation_before": checkpointed["fragmentation"],
+        "fragmentation_after": stats["fragmentation"],
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+class MaintenanceGate:
+    """Holds new requests back while a maintenance pass has the database to itself."""
+
+    def __init__(self):
+        self._open = asyncio.Event()
+        self._open.set()
+
+    @property
+    def closed(self) -> bool:
+        return not self._open.is_set()
+
+    def close(self) -> None:
+        self._open.clear()
+
+    def open(self) -> None:
+        self._open.set()
+
+    async def wait(self, timeout: float | None = None) -> bool:
+        """Wait until the gate is open; False if `timeout` seconds pass first."""
+        if self._open.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._open.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class MaintenanceGateMiddleware:
+    """ASGI middleware making requests wait for a running maintenance pass.
+
+    Requests still waiting after settings.maintenance_gate_wait_seconds get a
+    503 with Retry-After. /health is always answered.
+    """
+
+    EXEMPT_PATHS = ("/health",)
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        maintenance = getattr(scope["app"].state, "maintenance", None) if "app" in scope else None
+        if (scope["type"] == "http" and maintenance is not None and maintenance.gate.closed
+                and scope["path"] not in self.EXEMPT_PATHS):
+            wait_seconds = settings.maintenance_gate_wait_seconds
+            if not await maintenance.gate.wait(wait_seconds):
+                response = JSONResponse(
+                    {"detail": "Database maintenance in progress"},
+                    status_code=503,
+                    headers={"Retry-After": str(max(1, int(wait_seconds + 0.999)))},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class MaintenanceScheduler:
+    """Periodic storage maintenance that runs only while the database is quiet.
+
+    Quiet means no request in flight and none for `quiet_seconds`, and no batch
+    job or startup warmup running (per tenant in multi-tenant mode). Databases whose block counts
+    have not changed since their last pass are skipped.
+    """
+
+    def __init__(self, interval_seconds: float, quiet_seconds: float,
+                 rebuild_fragmentation: float, rebuild_min_free_bytes: int, history_size: int = 50):
+        self.interval_seconds = interval_seconds
+        self.quiet_seconds = quiet_seconds
+        self.rebuild_fragmentation = rebuild_fragmentation
+        self.rebuild_min_free_bytes = rebuild_min_free_bytes
+        self.history: deque[dict] = deque(maxlen=history_size)
+        self.gate = MaintenanceGate()
+        self.skipped_busy = 0
+        self.last_pass_at: str | None = None
+        # path -> (total_blocks, used_blocks, file bytes) after its last pass
+        self._signatures: dict[str, tuple] = {}
+
+    def _unchanged(self, conn) -> bool:
+        stats = storage_stats(conn)
+        return self._signatures.get(stats["path"]) == (stats["total_blocks"], stats["used_blocks"], stats["file_bytes"])
+
+    def _record(self, conn, report: dict, tenant_id: str | None) -> None:
+        stats = storage_stats(conn)
+        self._signatures[stats["path"]] = (stats["total_blocks"], stats["used_blocks"], stats["file_bytes"])
+        report["tenant_id"] = tenant_id
+        self.history.append(report)
+        print(f"Maintenance of {report['path']}: {', '.join(report['actions'])}, "
+              f"{report['bytes_reclaimed']} bytes reclaimed in {report['seconds']}s")
+
+    def _maintain(self, conn, reopen, tenant_id: str | None, force: bool):
+        if not force and self._unchanged(conn):
+            return conn
+        conn, report = maintain(conn, reopen, self.rebuild_fragmentation, self.rebuild_min_free_bytes)
+        self._record(conn, report, tenant_id)
+        return conn
+
+    async def run_single(self, app, force: bool = False) -> bool:
+        """One pass over the application database; returns False if it was busy.
+
+        The quiet check and closing the gate happen together on the event
+        loop, so no request can reach the connection after the check; the pass
+        itself (and a possible file swap) runs in a thread, keeping the loop,
+        /health and SSE heartbeats responsive while new requests wait.
+        """
+        profiler = app.state.profiler
+        if not force and (profiler.in_flight or time.monotonic() - profiler.last_request_at < self.quiet_seconds
+                          or app.state.job_scheduler.running()
+                          or app.state.startup.warmup.get("status") == "running"):
+            self.skipped_busy += 1
+            return False
+        self.gate.close()
+        try:
+            app.state.db = await asyncio.to_thread(self._maintain, app.state.db, get_db_connection, None, force)
+        finally:
+            self.gate.open()
+        self.last_pass_at = datetime.now().isoformat()
+        return True
+
+    def run_tenants(self, app, force: bool = False) -> int:
+        """One pass over every tenant file that is idle; busy tenants wait for the next pass."""
+        pool = app.state.tenant_pool
+        running = set(app.state.job_scheduler.running())
+        done = 0
+        for path in sorted(glob.glob(os.path.join(settings.tenant_data_dir, "*.db"))):
+            tenant_id = os.path.splitext(os.path.basename(path))[0]
+            if tenant_id in running or not pool.take_offline(tenant_id, 0 if force else self.quiet_seconds):
+                self.skipped_busy += 1
+                continue
+            try:
+                # Closed in the pool, so this is the only connection to the file
+                def connect(tenant_id=tenant_id):
+                    return duckdb.connect(tenant_database_path(tenant_id),
+                                          config=connection_config(pool.memory_limit, temp_subdir=tenant_id))
+
+                conn = connect()
+                try:
+                    conn = self._maintain(conn, connect, tenant_id, force)
+                finally:
+                    conn.close()
+                done += 1
+            except Exception as e:
+                print(f"Maintenance failed for tenant {tenant_id}: {e}")
+            finally:
+                pool.bring_online(tenant_id)
+        self.last_pass_at = datetime.now().isoformat()
+        return done
+
+    async def run_forever(self, app):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                if settings.multi_tenant:
+                    await asyncio.to_thread(self.run_tenants, app)
+                else:
+                    await self.run_single(app)
+            except Exception as e:
+                print(f"Storage maintenance failed: {e}")
+
+    def report(self) -> dict:
+        runs = list(self.history)
+        return {
+            "interval_seconds": self.interval_seconds,
+            "quiet_seconds": self.quiet_seconds,
+            "rebuild_fragmentation": self.rebuild_fragmentation,
+            "last_pass_at": self.last_pass_at,
+            "skipped_busy": self.skipped_busy,
+            "total_bytes_reclaimed": sum(r["bytes_reclaimed"] for r in runs),
+            "runs": runs[::-1],
+        }
@@ -0,0 +1,292 @@
+"""Declarative surveillance rules (the `declarative_rules` block of a rule pack).
+
+Each rule groups one source table by its partition keys over a lookback
+window, computes aggregates, keeps the groups matching `having`, and tiers
+severity and risk from SQL expressions over the aggregates:
+
+    CONCENTRATED_NOTIONAL:
+      source: trades                    # trades | orders (decoded columns)
+      partition_by: [client_id, symbol]
+      window: {lookback_hours: 24}      # or lookback_days; bucket: minute|hour|day
+      where: "quantity > 0"             # optional row filter
+      aggregates:
+        trades: "COUNT(*)"
+        notional: "SUM(quantity * price)"
+      having: "notional >= $min_notional"
+      params: {min_notional: 1000000}
+      severity:
+        - {when: "notional >= 5 * $min_notional", level: HIGH}
+        - {level: MEDIUM}
+      risk_score: "LEAST(100, notional / $min_notional * 20)"
+      description: "Client {client_id} traded {notional:,.0f} in {symbol}"
+
+Expressions are DuckDB SQL over the source columns (`where`, aggregates) or
+over partition keys and aggregate names (`having`, severity, risk_score);
+`$name` refers to a param, and `$lookback_hours` and `$as_of` (the end of the
+window) are always available. The
+description may reference any output column or param as `{name[:format]}`.
+Each rule compiles to a single INSERT ... SELECT that writes its alerts, plus
+one that links each alert to the source rows of its group in alert_evidence.
+"""
+
+import json
+import re
+import string
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from app.core.database import TABLE_COLUMNS
+
+SEVERITY_LEVELS = ("LOW", "MEDIUM", "HIGH")
+BUCKETS = ("minute", "hour", "day")
+RULE_KEYS = {
+    "enabled", "source", "partition_by", "window", "where", "aggregates", "having",
+    "params", "severity", "risk_score", "description",
+}
+RESERVED_NAMES = {"severity", "risk_score", "window_start", "lookback_hours", "as_of", "alert_ids"}
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_PARAM_RE = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)")
+
+
+class RuleSpecError(ValueError):
+    """A declarative rule that cannot be compiled."""
+
+
+EVIDENCE = {"trades": ("trade", "trade_id"), "orders": ("order", "order_id")}
+
+
+@dataclass
+class CompiledRule:
+    name: str
+    sql: str
+    params: dict = field(default_factory=dict)
+    lookback_hours: int = 24
+    evidence_sql: str = ""
+    evidence_params: dict = field(default_factory=dict)
+    key_fields: tuple = ()
+
+
+def _identifier(rule: str, value, what: str) -> str:
+    if not isinstance(value, str) or not _IDENTIFIER_RE.match(value):
+        raise RuleSpecError(f"{rule}: invalid {what} {value!r}")
+    return value
+
+
+def _expression(rule: str, value, what: str) -> str:
+    """SQL fragments stay single expressions: no statement separators or comments."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return repr(value)
+    if not isinstance(value, str) or not value.strip():
+        raise RuleSpecError(f"{rule}: {what} must be a SQL expression")
+    if ";" in value or "--" in value or "/*" in value:
+        raise RuleSpecError(f"{rule}: {what} may not contain ';' or comments")
+    return f"({value.strip()})"
+
+
+def _lookback_hours(rule: str, window) -> tuple[int, str | None]:
+    window = window or {}
+    if not isinstance(window, dict) or set(window) - {"lookback_hours", "lookback_days", "bucket"}:
+        raise RuleSpecError(f"{rule}: window takes lookback_hours or lookback_days, and bucket")
+    if "lookback_hours" in window and "lookback_days" in window:
+        raise RuleSpecError(f"{rule}: give lookback_hours or lookback_days, not both")
+    hours = int(window.get("lookback_hours", int(window.get("lookback_days", 1)) * 24))
+    if hours <= 0:
+        raise RuleSpecError(f"{rule}: window must be positive")
+    bucket = window.get("bucket")
+    if bucket is not None and bucket not in BUCKETS:
+        raise RuleSpecError(f"{rule}: bucket must be one of {list(BUCKETS)}")
+    return hours, bucket
+
+
+def _description_sql(rule: str, template: str, columns: set[str], params: dict) -> str:
+    """Turn "Client {client_id} ... {notional:,.0f}" into a DuckDB format(...) call."""
+    pattern, args = [], []
+    try:
+        parts = list(string.Formatter().parse(template))
+    except ValueError as e:
+        raise RuleSpecError(f"{rule}: bad description template: {e}")
+    for literal, name, spec, conversion in parts:
+        pattern.append(literal.replace("{", "{{").replace("}", "}}"))
+        if name is None:
+            continue
+        if conversion:
+            raise RuleSpecError(f"{rule}: conversions like !r are not supported in descriptions")
+        if name in columns:
+            args.append(name)
+        elif name in params:
+            args.append(f"${name}")
+        else:
+            raise RuleSpecError(f"{rule}: description references unknown field {name!r}")
+        pattern.append("{:" + spec + "}" if spec else "{}")
+    fmt = "".join(pattern).replace("'", "''")
+    return f"format('{fmt}'{''.join(', ' + a for a in args)})"
+
+
+def compile_rule(name: str, spec: dict) -> CompiledRule:
+    """Compile one declarative rule to a parameterized INSERT INTO alerts statement."""
+    rule = _identifier(name, name, "rule name").upper()
+    if not isinstance(spec, dict):
+        raise RuleSpecError(f"{rule}: rule must be a mapping")
+    unknown = set(spec) - RULE_KEYS
+    if unknown:
+        raise RuleSpecError(f"{rule}: unknown keys {sorted(unknown)}")
+
+    source = spec.get("source", "trades")
+    if source not in TABLE_COLUMNS:
+        raise RuleSpecError(f"{rule}: source must be one of {sorted(TABLE_COLUMNS)}")
+    source_columns = TABLE_COLUMNS[source]
+
+    partition_by = [_identifier(rule, k, "partition key") for k in spec.get("partition_by") or []]
+    for key in partition_by:
+        if key not in source_columns:
+            raise RuleSpecError(f"{rule}: {key!r} is not a column of {source}")
+
+    hours, bucket = _lookback_hours(rule, spec.get("window"))
+    keys = partition_by + (["window_start"] if bucket else [])
+
+    aggregates = spec.get("aggregates") or {}
+    if not isinstance(aggregates, dict) or not aggregates:
+        raise RuleSpecError(f"{rule}: at least one aggregate is required")
+    agg_exprs = []
+    for agg_name, expr in aggregates.items():
+        _identifier(rule, agg_name, "aggregate name")
+        if agg_name in RESERVED_NAMES or agg_name in keys:
+            raise RuleSpecError(f"{rule}: aggregate name {agg_name!r} is reserved")
+        agg_exprs.append(f"{_expression(rule, expr, f'aggregate {agg_name}')} AS {agg_name}")
+
+    params = dict(spec.get("params") or {})
+    for param, value in params.items():
+        _identifier(rule, param, "param name")
+        if param in RESERVED_NAMES:
+            raise RuleSpecError(f"{rule}: param name {param!r} is reserved")
+        if not isinstance(value, (int, float, str, bool)):
+            raise RuleSpecError(f"{rule}: param {param} must be a scalar")
+    params["lookback_hours"] = hours
+
+    where = _expression(rule, spec["where"], "where") if spec.get("where") is not None else "TRUE"
+    having = _expression(rule, spec["having"], "having") if spec.get("having") is not None else "TRUE"
+    risk = _expression(rule, spec.get("risk_score"), "risk_score")
+
+    tiers = spec.get("severity") or [{"level": "MEDIUM"}]
+    if not isinstance(tiers, list):
+        raise RuleSpecError(f"{rule}: severity must be a list of {{when, level}} tiers")
+    cases, default = [], None
+    for i, tier in enumerate(tiers):
+        level = str((tier or {}).get("level", "")).upper()
+        if level not in SEVERITY_LEVELS:
+            raise RuleSpecError(f"{rule}: severity level must be one of {list(SEVERITY_LEVELS)}")
+        if tier.get("when") is None:
+            if i != len(tiers) - 1:
+                raise RuleSpecError(f"{rule}: only the last severity tier may omit 'when'")
+            default = level
+        else:
+            cases.append(f"WHEN {_expression(rule, tier['when'], 'severity condition')} THEN '{level}'")
+    severity_sql = f"CASE {' '.join(cases)} ELSE '{default or 'LOW'}' END" if cases else f"'{default}'"
+
+    output_columns = set(keys) | set(aggregates) | {"risk_score", "severity"}
+    description = spec.get("description") or f"{rule} matched"
+    description_sql = _description_sql(rule, description, output_columns, params)
+
+    data_fields = [*keys, *aggregates, "risk_score"]
+    data_sql = f"CAST(to_json(struct_pack({', '.join(f'{c} := {c}' for c in data_fields)})) AS VARCHAR)"
+    client_sql = "client_id" if "client_id" in keys else "NULL"
+    symbol_sql = "symbol" if "symbol" in keys else "NULL"
+    bucket_sql = f", date_trunc('{bucket}', timestamp) AS window_start" if bucket else ""
+    group_sql = f"GROUP BY {', '.join(keys)}" if keys else ""
+
+    src_sql = f"""
+        src AS (
+            SELECT *{bucket_sql}
+            FROM {source}_named
+            WHERE timestamp >= $as_of - to_hours(CAST($lookback_hours AS BIGINT))
+              AND timestamp < $as_of
+              AND {where}
+        )"""
+    sql = f"""
+        INSERT INTO alerts (alert_id, rule_name, severity, description, client_id, symbol, data_json)
+        WITH {src_sql},
+        grouped AS (
+            SELECT {', '.join(keys + agg_exprs)}
+            FROM src
+            {group_sql}
+        ),
+        matched AS (
+            SELECT *, CAST({risk} AS DOUBLE) AS risk_score
+            FROM grouped
+            WHERE {having}
+        ),
+        tiered AS (
+            SELECT *, {severity_sql} AS severity FROM matched
+        )
+        SELECT CAST(uuid() AS VARCHAR), '{rule}', severity, {description_sql},
+               {client_sql}, {symbol_sql}, {data_sql}
+        FROM tiered
+        RETURNING alert_id, rule_name, severity, description, data_json
+    """
+
+    # Evidence: the source rows of each alert's group, matched on the keys recorded in its data
+    kind, id_column = EVIDENCE[source]
+    key_match = [f"CAST(src.{k} AS VARCHAR) = (f.data->>'{k}')" for k in partition_by]
+    if bucket:
+        key_match.append("src.window_start = CAST(f.data->>'window_start' AS TIMESTAMP)")
+    evidence_sql = f"""
+        INSERT INTO alert_evidence (alert_id, kind, record_id)
+        WITH {src_sql},
+        flagged AS (
+            SELECT alert_id, CAST(data_json AS JSON) AS data
+            FROM alerts
+            WHERE alert_id IN (SELECT UNNEST($alert_ids))
+        )
+        SELECT f.alert_id, '{kind}', src.{id_column}
+        FROM flagged f
+        JOIN src ON {' AND '.join(key_match) or 'TRUE'}
+    """
+
+    used = set(_PARAM_RE.findall(sql)) - {"as_of"}
+    missing = used - set(params)
+    if missing:
+        raise RuleSpecError(f"{rule}: undefined params {sorted(missing)}")
+    evidence_used = set(_PARAM_RE.findall(evidence_sql))
+    return CompiledRule(
+        rule, sql, {p: v for p, v in params.items() if p in used}, hours,
+        evidence_sql, {p: v for p, v in params.items() if p in evidence_used}, tuple(keys),
+    )
+
+
+def compile_rule_pack(rules: dict) -> tuple[list[CompiledRule], dict[str, str]]:
+    """Compile the enabled rules of a pack's `declarative_rules`; returns (rules, errors by name)."""
+    compiled, errors = [], {}
+    for name, spec in (rules.get("declarative_rules") or {}).items():
+        if isinstance(spec, dict) and not spec.get("enabled", True):
+            continue
+        try:
+            compiled.append(compile_rule(name, spec))
+        except RuleSpecError as e:
+            errors[str(name)] = str(e)
+    return compiled, errors
+
+
+def run_compiled_rule(conn, rule: CompiledRule, as_of: datetime | None = None) -> list[dict]:
+    """Execute a compiled rule over the window ending at `as_of` (default now).
+
+    Alerts and their evidence are written by the statements themselves.
+    """
+    as_of = as_of or datetime.now()
+    rows = conn.execute(rule.sql, {**rule.params, "as_of": as_of}).fetchall()
+    if rows:
+        try:
+            conn.execute(rule.evidence_sql, {**rule.evidence_params, "as_of": as_of,
+                                             "alert_ids": [row[0] for row in rows]})
+        except Exception as e:
+            print(f"Error recording evidence for {rule.name}: {e}")
+    return [
+        {
+            "alert_id": alert_id,
+            "rule_name": rule_name,
+            "severity": severity,
+            "description": description,
+            "data": json.loads(data_json),
+        }
+        for alert_id, rule_name, severity, description, data_json in rows
+    ]
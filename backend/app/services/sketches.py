@@ -0,0 +1,297 @@
+import hashlib
+import json
+import math
+from datetime import datetime, timedelta
+
+# Trades are summarized per hour; coarser windows merge the hourly sketches
+BUCKET = "hour"
+HLL_PRECISION = 12  # 4096 registers, ~1.6% standard error
+TOPK_CAPACITY = 64
+
+
+def _hash64(value: str) -> int:
+    # First 8 bytes of the MD5, big-endian: the same value HLL_HASH_SQL computes in
+    # DuckDB, stable across processes and versions so persisted sketches stay mergeable
+    return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], "big")
+
+
+# _hash64 and the register index / rank HyperLogLog.add derives from it, in SQL
+HLL_HASH_SQL = "CAST('0x' || substr(md5(CAST({value} AS VARCHAR)), 1, 16) AS UBIGINT)"
+_REST_MASK = (1 << (64 - HLL_PRECISION)) - 1
+HLL_INDEX_SQL = f"({{hash}} >> {64 - HLL_PRECISION})"
+# Rank = leading zeros of the low 64-p bits, plus one; bit_position finds the first
+# 1 in the 64-bit string, whose top p bits are zero after masking
+HLL_RANK_SQL = (
+    f"CASE WHEN ({{hash}} & {_REST_MASK}) = 0 THEN {64 - HLL_PRECISION + 1} "
+    f"ELSE bit_position('1'::BIT, CAST({{hash}} & {_REST_MASK} AS BIT)) - {HLL_PRECISION} END"
+)
+
+
+class HyperLogLog:
+    """Distinct-count sketch; merge is a register-wise max, so buckets combine losslessly."""
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: bytes | None = None):
+        self.p = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, value) -> None:
+        h = _hash64(value)
+        idx = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # Small-range correction: linear counting is more accurate here
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.p]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(data[0], data[1:])
+
+
+class SpaceSaving:
+    """Heavy-hitter sketch keeping at most `capacity` counters.
+
+    Each counter's count overestimates the true frequency by at most its
+    `error`, and any item more frequent than total/capacity is guaranteed to
+    be tracked. Items also carry the latest timestamp seen for them.
+    """
+
+    def __init__(self, capacity: int = TOPK_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        # item -> [count, error, last_seen]
+        self.counters: dict[str, list] = {}
+
+    def offer(self, item: str, count: int = 1, last_seen=None) -> None:
+        self.total += count
+        entry = self.counters.get(item)
+        if entry is None:
+            if len(self.counters) < self.capacity:
+                self.counters[item] = [count, 0, last_seen]
+                return
+            # Replace the smallest counter; its count becomes the new item's error
+            victim = min(self.counters, key=lambda k: self.counters[k][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + count, floor, last_seen]
+            return
+        entry[0] += count
+        if last_seen is not None and (entry[2] is None or last_seen > entry[2]):
+            entry[2] = last_seen
+
+    def _floor(self) -> int:
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(entry[0] for entry in self.counters.values())
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        # Items missing from a full summary may still have occurred up to its floor
+        floor_a, floor_b = self._floor(), other._floor()
+        merged = {}
+        for item in set(self.counters) | set(other.counters):
+            a = self.counters.get(item, [floor_a, floor_a, None])
+            b = other.counters.get(item, [floor_b, floor_b, None])
+            last = max((x for x in (a[2], b[2]) if x is not None), default=None)
+            merged[item] = [a[0] + b[0], a[1] + b[1], last]
+        keep = sorted(merged, key=lambda k: merged[k][0], reverse=True)[:self.capacity]
+        self.counters = {item: merged[item] for item in keep}
+        self.total += other.total
+        return self
+
+    def top(self, n: int) -> list[tuple[str, int, int, object]]:
+        """(item, estimated count, max overestimate, last seen), most frequent first."""
+        ranked = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        return [(item, entry[0], entry[1], entry[2]) for item, entry in ranked]
+
+    def to_bytes(self) -> bytes:
+        return json.dumps({"capacity": self.capacity, "total": self.total, "counters": self.counters}).encode()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SpaceSaving":
+        raw = json.loads(data)
+        sketch = cls(raw["capacity"])
+        sketch.total = raw["total"]
+        sketch.counters = raw["counters"]
+        return sketch
+
+
+SKETCH_TYPES = {
+    "clients_hll": HyperLogLog,
+    "symbols_hll": HyperLogLog,
+    "symbol_topk": SpaceSaving,
+}
+
+# HyperLogLog sketch type -> the column of the trades it counts
+HLL_COLUMNS = {"clients_hll": "client_id", "symbols_hll": "symbol"}
+
+# All-time rollups of the hourly HyperLogLogs, so unbounded counts read one row
+TOTAL_BUCKET = datetime(1970, 1, 1)
+TOTAL_SUFFIX = "_total"
+
+
+def _load_buckets(conn, buckets, sketch_type: str) -> dict:
+    if not buckets:
+        return {}
+    rows = conn.execute(
+        "SELECT bucket_start, payload FROM trade_sketches "
+        "WHERE sketch_type = ? AND bucket_start IN (SELECT UNNEST(?))",
+        [sketch_type, list(buckets)],
+    ).fetchall()
+    return {b: SKETCH_TYPES[sketch_type].from_bytes(payload) for b, payload in rows}
+
+
+def _write_sketches(conn, rows: list) -> None:
+    # One statement over unnested lists instead of a row-at-a-time executemany
+    if rows:
+        buckets, kinds, payloads = (list(column) for column in zip(*rows))
+        conn.execute("""
+            INSERT OR REPLACE INTO trade_sketches (bucket_start, sketch_type, payload)
+            SELECT UNNEST(?), UNNEST(?), UNNEST(CAST(? AS BLOB[]))
+        """, [buckets, kinds, payloads])
+
+
+def _max_registers(payloads) -> "np.ndarray":
+    """Register-wise max of serialized HyperLogLog sketches, vectorized."""
+    import numpy as np
+
+    merged = np.zeros(1 << HLL_PRECISION, dtype=np.uint8)
+    if payloads:
+        stacked = np.frombuffer(b"".join(payloads), dtype=np.uint8).reshape(len(payloads), -1)
+        if (stacked[:, 0] != HLL_PRECISION).any():
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(merged, stacked[:, 1:].max(axis=0), out=merged)
+    return merged
+
+
+def _update_hll_sketches(conn, source: str, sketch_type: str) -> set:
+    """Fold distinct (hour, value) pairs of `source` into the hourly and all-time `sketch_type` HLLs.
+
+    DuckDB hashes each value once and reduces the pairs to the max rank per
+    (hour, register); numpy scatters those into register arrays.
+    """
+    import numpy as np
+
+    column = HLL_COLUMNS[sketch_type]
+    rows = conn.execute(f"""
+        WITH pairs AS (
+            SELECT DISTINCT date_trunc('{BUCKET}', CAST(timestamp AS TIMESTAMP)) AS bucket,
+                   CAST({column} AS VARCHAR) AS value
+            FROM {source} WHERE timestamp IS NOT NULL AND {column} IS NOT NULL
+        ),
+        hashed AS (
+            SELECT value, {HLL_HASH_SQL.format(value="value")} AS h
+            FROM (SELECT DISTINCT value FROM pairs)
+        )
+        SELECT bucket, CAST({HLL_INDEX_SQL.format(hash="h")} AS USMALLINT) AS idx,
+               CAST(MAX({HLL_RANK_SQL.format(hash="h")}) AS UTINYINT) AS rank
+        FROM pairs JOIN hashed USING (value)
+        GROUP BY ALL
+    """).fetchnumpy()
+    if not len(rows["bucket"]):
+        return set()
+
+    buckets, position = np.unique(rows["bucket"], return_inverse=True)
+    registers = np.zeros((len(buckets), 1 << HLL_PRECISION), dtype=np.uint8)
+    np.maximum.at(registers, (position, rows["idx"].astype(np.intp)), rows["rank"])
+
+    bucket_starts = [b.astype("datetime64[us]").item() for b in buckets]
+    existing = _load_buckets(conn, bucket_starts, sketch_type)
+    total = conn.execute(
+        "SELECT payload FROM trade_sketches WHERE sketch_type = ? AND bucket_start = ?",
+        [sketch_type + TOTAL_SUFFIX, TOTAL_BUCKET],
+    ).fetchall()
+    header = bytes([HLL_PRECISION])
+    written = []
+    for i, bucket in enumerate(bucket_starts):
+        if bucket in existing:
+            np.maximum(registers[i], np.frombuffer(existing[bucket].registers, dtype=np.uint8), out=registers[i])
+        written.append([bucket, sketch_type, header + registers[i].tobytes()])
+    all_time = np.maximum(_max_registers([p for (p,) in total]), registers.max(axis=0))
+    written.append([TOTAL_BUCKET, sketch_type + TOTAL_SUFFIX, header + all_time.tobytes()])
+    _write_sketches(conn, written)
+    return set(bucket_starts)
+
+
+def update_trade_sketches(conn, source: str = "trades_named") -> int:
+    """Fold trades from `source` (client_id, symbol, timestamp) into the hourly sketches.
+
+    Existing buckets are merged with the new rows, so this can run after every
+    ingest; returns the number of buckets touched.
+    """
+    symbols = conn.execute(f"""
+        SELECT date_trunc('{BUCKET}', CAST(timestamp AS TIMESTAMP)) AS bucket, CAST(symbol AS VARCHAR),
+               COUNT(*), MAX(CAST(timestamp AS TIMESTAMP))
+        FROM {source} WHERE timestamp IS NOT NULL AND symbol IS NOT NULL
+        GROUP BY ALL
+    """).fetchall()
+
+    sketches = _load_buckets(conn, {row[0] for row in symbols}, "symbol_topk")
+    for bucket, symbol, count, last_seen in symbols:
+        sketches.setdefault(bucket, SpaceSaving()).offer(symbol, count, last_seen.isoformat())
+    _write_sketches(conn, [[bucket, "symbol_topk", s.to_bytes()] for bucket, s in sketches.items()])
+    touched = set(sketches)
+    for sketch_type in HLL_COLUMNS:
+        touched |= _update_hll_sketches(conn, source, sketch_type)
+    return len(touched)
+
+
+def rebuild_trade_sketches(conn) -> int:
+    """Recompute all sketches from the live trades table (after replace, clear or archive)."""
+    conn.execute("DELETE FROM trade_sketches")
+    return update_trade_sketches(conn, "trades_named")
+
+
+def merged_sketch(conn, sketch_type: str, since: datetime | None = None):
+    """Merge the `sketch_type` sketches of all buckets starting at or after `since`.
+
+    HyperLogLog merges run register-wise in numpy; without `since` they read
+    the all-time rollup instead of every hourly bucket.
+    """
+    is_hll = SKETCH_TYPES[sketch_type] is HyperLogLog
+    sql = "SELECT payload FROM trade_sketches WHERE sketch_type = ?"
+    params: list = [sketch_type + TOTAL_SUFFIX if is_hll and since is None else sketch_type]
+    if since is not None:
+        sql += " AND bucket_start >= date_trunc(?, CAST(? AS TIMESTAMP))"
+        params += [BUCKET, since]
+    payloads = [payload for (payload,) in conn.execute(sql, params).fetchall()]
+    if is_hll:
+        return HyperLogLog(registers=_max_registers(payloads).tobytes())
+    merged = SKETCH_TYPES[sketch_type]()
+    for payload in payloads:
+        merged.merge(SKETCH_TYPES[sketch_type].from_bytes(payload))
+    return merged
+
+
+def approximate_distinct(conn, sketch_type: str, since: datetime | None = None) -> dict:
+    hll = merged_sketch(conn, sketch_type, since)
+    return {"estimate": hll.count(), "relative_error": round(hll.relative_error, 4)}
+
+
+def approximate_top_symbols(conn, n: int = 5, window: timedelta = timedelta(days=1)) -> list[dict]:
+    """Most traded symbols over roughly the last `window`, to hourly bucket granularity."""
+    topk = merged_sketch(conn, "symbol_topk", datetime.now() - window)
+    return [
+        {"symbol": symbol, "trade_count": count, "max_overcount": error, "last_trade": last_seen}
+        for symbol, count, error, last_seen in topk.top(n)
+    ]
@@ -0,0 +1,170 @@
+import uuid
+
+# Primary key column per uploadable table
+PRIMARY_KEYS = {"orders": "order_id", "trades": "trade_id", "clients": "client_id"}
+
+REQUIRED_COLUMNS = {
+    "orders": ['order_id', 'client_id', 'symbol', 'side', 'quantity', 'price', 'timestamp'],
+    "trades": ['trade_id', 'client_id', 'symbol', 'side', 'quantity', 'price', 'timestamp'],
+    "clients": ['client_id', 'client_name'],
+}
+
+
+def _text(col: str) -> str:
+    return f"NULLIF(TRIM(CAST(src.{col} AS VARCHAR)), '')"
+
+
+def _typed_exprs(table_type: str, target_cols: list[str]) -> list[str]:
+    """Typed projections of the raw upload; unparseable values become NULL."""
+    exprs = []
+    for col in target_cols:
+        if col == "timestamp":
+            exprs.append(f"TRY_CAST({_text(col)} AS TIMESTAMP) AS timestamp")
+        elif col == "created_date":
+            exprs.append(f"TRY_CAST({_text(col)} AS DATE) AS created_date")
+        elif col == "quantity":
+            exprs.append(f"TRY_CAST({_text(col)} AS DOUBLE) AS quantity")
+        elif col == "price":
+            exprs.append(f"TRY_CAST({_text(col)} AS DECIMAL(10,4)) AS price")
+        elif col == "side":
+            exprs.append(f"UPPER({_text(col)}) AS side")
+        elif col == "order_type":
+            exprs.append(f"UPPER({_text(col)}) AS order_type")
+        else:
+            exprs.append(f"{_text(col)} AS {col}")
+    return exprs
+
+
+def _reject_checks(table_type: str, target_cols: list[str], append: bool = False) -> list[str]:
+    """One CASE per rule; each yields a reason string for rows that fail it."""
+    checks = []
+    for col in REQUIRED_COLUMNS[table_type]:
+        checks.append(f"CASE WHEN raw_{col} IS NULL THEN 'missing {col}' END")
+    if "timestamp" in target_cols:
+        checks.append("CASE WHEN raw_timestamp IS NOT NULL AND timestamp IS NULL THEN 'invalid timestamp' END")
+    if "created_date" in target_cols:
+        checks.append("CASE WHEN raw_created_date IS NOT NULL AND created_date IS NULL THEN 'invalid created_date' END")
+    if "quantity" in target_cols:
+        checks.append(
+            "CASE WHEN raw_quantity IS NOT NULL AND (quantity IS NULL OR quantity != TRUNC(quantity) "
+            "OR TRY_CAST(quantity AS INTEGER) IS NULL) THEN 'invalid quantity' "
+            "WHEN quantity <= 0 THEN 'non-positive quantity' END"
+        )
+    if "price" in target_cols:
+        checks.append(
+            "CASE WHEN raw_price IS NOT NULL AND price IS NULL THEN 'invalid price' "
+            "WHEN price <= 0 THEN 'non-positive price' END"
+        )
+    if "side" in target_cols:
+        checks.append("CASE WHEN side IS NOT NULL AND side NOT IN ('BUY', 'SELL') THEN 'invalid side' END")
+    if "order_type" in target_cols:
+        # Checked against the order_type ENUM so loading cannot silently store NULL
+        checks.append(
+            "CASE WHEN order_type IS NOT NULL AND TRY_CAST(order_type AS order_type) IS NULL "
+            "THEN 'invalid order_type' END"
+        )
+    pk = PRIMARY_KEYS[table_type]
+    checks.append(f"CASE WHEN {pk} IS NOT NULL AND pk_occurrence > 1 THEN 'duplicate {pk}' END")
+    if table_type == "trades":
+        checks.append("CASE WHEN order_id IS NOT NULL AND NOT order_known THEN 'unknown order_id' END")
+    if append:
+        checks.append(f"CASE WHEN already_loaded THEN 'duplicate {pk} (already loaded)' END")
+    return checks
+
+
+def validate_upload(conn, table_type: str, target_cols: list[str], source: str = "df_temp",
+                    upload_id: str | None = None, append: bool = False) -> dict:
+    """Validate the registered upload `source` in bulk and quarantine rejected rows.
+
+    Creates the temp view `upload_valid` with the typed, accepted rows in
+    `target_cols` order, and copies every rejected row with its reasons into
+    `upload_quarantine`. With `append`, rows whose key is already in the
+    table are rejected too. Returns the upload id and accepted/rejected counts.
+    """
+    upload_id = upload_id or str(uuid.uuid4())
+    pk = PRIMARY_KEYS[table_type]
+    raw_exprs = [f"{_text(col)} AS raw_{col}" for col in REQUIRED_COLUMNS[table_type]]
+    for col in ("timestamp", "created_date", "quantity", "price"):
+        if col in target_cols and col not in REQUIRED_COLUMNS[table_type]:
+            raw_exprs.append(f"{_text(col)} AS raw_{col}")
+
+    order_known = "TRUE AS order_known"
+    order_join = ""
+    if table_type == "trades":
+        order_known = "o.order_id IS NOT NULL AS order_known"
+        order_join = "LEFT JOIN (SELECT DISTINCT order_id FROM orders) o ON o.order_id = typed.order_id"
+    loaded = "FALSE AS already_loaded"
+    loaded_join = ""
+    if append:
+        loaded = "e.pk IS NOT NULL AS already_loaded"
+        loaded_join = f"LEFT JOIN (SELECT {pk} AS pk FROM {table_type}) e ON e.pk = typed.{pk}"
+
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE upload_staging AS
+        WITH typed AS (
+            SELECT
+                row_number() OVER () AS source_row,
+                src AS raw_src,
+                {', '.join(raw_exprs)},
+                {', '.join(_typed_exprs(table_type, target_cols))}
+            FROM {source} src
+        ), keyed AS (
+            SELECT typed.*,
+                   row_number() OVER (PARTITION BY typed.{pk} ORDER BY typed.source_row) AS pk_occurrence,
+                   {order_known},
+                   {loaded}
+            FROM typed
+            {order_join}
+            {loaded_join}
+        ), checked AS (
+            SELECT keyed.*,
+                   NULLIF(concat_ws('; ', {', '.join(_reject_checks(table_type, target_cols, append))}), '') AS reject_reason
+            FROM keyed
+        )
+        -- The raw JSON record is only built for rejected rows, from the same numbered scan
+        SELECT checked.* EXCLUDE (raw_src),
+               CASE WHEN reject_reason IS NOT NULL THEN to_json(raw_src) END AS raw_record
+        FROM checked
+    """)
+
+    conn.execute("""
+        INSERT INTO upload_quarantine (upload_id, table_type, source_row, reason, raw_record)
+        SELECT ?, ?, source_row, reject_reason, raw_record
+        FROM upload_staging
+        WHERE reject_reason IS NOT NULL
+    """, [upload_id, table_type])
+
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP VIEW upload_valid AS
+        SELECT {', '.join(target_cols)}
+        FROM upload_staging
+        WHERE reject_reason IS NULL
+        ORDER BY source_row
+    """)
+
+    accepted, rejected = conn.execute("""
+        SELECT COUNT(*) FILTER (WHERE reject_reason IS NULL),
+               COUNT(*) FILTER (WHERE reject_reason IS NOT NULL)
+        FROM upload_staging
+    """).fetchone()
+    reasons = conn.execute("""
+        SELECT reason, COUNT(*) FROM (
+            SELECT UNNEST(string_split(reject_reason, '; ')) AS reason
+            FROM upload_staging WHERE reject_reason IS NOT NULL
+        ) GROUP BY reason ORDER BY COUNT(*) DESC
+    """).fetchall()
+
+    return {
+        "upload_id": upload_id,
+        "accepted": accepted,
+        "rejected": rejected,
+        "rejection_reasons": {reason: count for reason, count in reasons},
+    }
+
+
+def drop_staging(conn) -> None:
+    for stmt in ("DROP VIEW IF EXISTS upload_valid", "DROP TABLE IF EXISTS upload_staging"):
+        try:
+            conn.execute(stmt)
+        except Exception:
+            pass
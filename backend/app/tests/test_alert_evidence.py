@@ -0,0 +1,96 @@
+import duckdb
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.database import init_database, load_encoded
+from app.main import app
+from app.services.archival import archive_root, run_archive
+from app.services.detection_rules import ComplianceDetector
+from app.tests.test_detectors import seed_trades
+
+
+def evidence(conn, alert_id):
+    return conn.execute(
+        "SELECT kind, record_id FROM alert_evidence WHERE alert_id = ? ORDER BY record_id", [alert_id]
+    ).fetchall()
+
+
+def test_detectors_link_alerts_to_their_trades(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        seed_trades(conn)
+        # Another client's trades in the same symbol must not show up as evidence
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE staged_trades AS
+            SELECT 'o' || i AS trade_id, NULL AS order_id, 'C2' AS client_id, 'AAPL' AS symbol, 'BUY' AS side,
+                   10 AS quantity, 100.0 AS price, CURRENT_TIMESTAMP AS timestamp
+            FROM range(3) r(i)
+        """)
+        load_encoded(conn, "trades", "staged_trades")
+
+        [alert] = [a for a in ComplianceDetector(conn).detect_self_trades() if a["data"]["client_id"] == "C1"]
+        assert evidence(conn, alert["alert_id"]) == [("trade", t) for t in ("t1", "t2", "t3", "t4")]
+
+        rules = {"declarative_rules": {"BUSY_PAIR": {
+            "partition_by": ["client_id", "symbol"],
+            "aggregates": {"trades": "COUNT(*)"},
+            "having": "trades >= 3",
+            "risk_score": 50,
+        }}}
+        alerts = ComplianceDetector(conn, rules=rules).detect_declarative_rules()
+        by_client = {a["data"]["client_id"]: a["alert_id"] for a in alerts}
+        assert [r for _, r in evidence(conn, by_client["C1"])] == ["t1", "t2", "t3", "t4"]
+        assert [r for _, r in evidence(conn, by_client["C2"])] == ["o0", "o1", "o2"]
+    finally:
+        conn.close()
+
+
+def test_evidence_endpoint_returns_decoded_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "test.db"))
+    with TestClient(app) as client:
+        conn = app.state.db
+        seed_trades(conn)
+        [alert] = ComplianceDetector(conn).detect_self_trades()
+
+        r = client.get(f"/api/v1/alerts/{alert['alert_id']}/evidence", params={"limit": 3})
+        assert r.status_code == 200
+        body = r.json()
+        assert body["rule_name"] == "SELF_TRADE_DETECTION"
+        assert body["trade_count"] == 4 and body["order_count"] == 0 and body["truncated"]
+        assert [t["trade_id"] for t in body["trades"]] == ["t1", "t2", "t3"]
+        assert {(t["client_id"], t["symbol"]) for t in body["trades"]} == {("C1", "AAPL")}
+
+        assert client.get("/api/v1/alerts/missing/evidence").status_code == 404
+
+        client.delete(f"/api/v1/alerts/{alert['alert_id']}")
+        assert evidence(conn, alert["alert_id"]) == []
+
+
+def test_evidence_endpoint_resolves_archived_alerts_and_trades(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "test.db"))
+    monkeypatch.setattr(settings, "archive_dir", str(tmp_path / "archive"))
+    with TestClient(app) as client:
+        conn = app.state.db
+        seed_trades(conn)
+        [alert] = ComplianceDetector(conn).detect_self_trades()
+        conn.execute("""
+            UPDATE alerts SET status = 'CLOSED', created_at = CURRENT_TIMESTAMP - INTERVAL 200 DAY
+            WHERE alert_id = ?
+        """, [alert["alert_id"]])
+        conn.execute("UPDATE trades SET timestamp = timestamp - INTERVAL 60 DAY")
+        # A trade corrected away before archiving cannot be resolved anywhere
+        conn.execute("DELETE FROM trades WHERE trade_id = 't4'")
+
+        result = run_archive(conn, archive_root("default"), alert_age_days=90, trade_margin_days=1)
+        assert result["alerts_archived"] == 1 and result["trades_archived"] == 3
+        assert evidence(conn, alert["alert_id"]) == []
+
+        r = client.get(f"/api/v1/alerts/{alert['alert_id']}/evidence")
+        assert r.status_code == 200
+        body = r.json()
+        assert body["archived"] and body["rule_name"] == "SELF_TRADE_DETECTION"
+        assert body["trade_count"] == 4
+        assert [t["trade_id"] for t in body["trades"]] == ["t1", "t2", "t3"]
+        assert {(t["client_id"], t["symbol"]) for t in body["trades"]} == {("C1", "AAPL")}
+        assert body["missing_trade_ids"] == ["t4"]
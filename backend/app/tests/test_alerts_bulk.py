@@ -0,0 +1,43 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+
+
+def test_bulk_status_and_delete_by_filter(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "test.db"))
+    with TestClient(app) as client:
+        conn = app.state.db
+        conn.execute("""
+            INSERT INTO alerts (alert_id, rule_name, severity, description, data_json) VALUES
+            ('a1', 'NOISY', 'LOW', 'x', '{"risk_score": 10}'),
+            ('a2', 'NOISY', 'LOW', 'x', '{"risk_score": 90}'),
+            ('a3', 'OTHER', 'HIGH', 'x', '{"risk_score": 10}')
+        """)
+
+        r = client.put("/api/v1/alerts/bulk/status", json={
+            "status": "false_positive",
+            "filters": {"rule_name": "NOISY", "max_risk": 50},
+        })
+        assert r.status_code == 200 and r.json()["updated"] == 1
+        assert conn.execute("SELECT status FROM alerts WHERE alert_id = 'a1'").fetchone()[0] == "FALSE_POSITIVE"
+
+        r = client.get("/api/v1/alerts/", params={"min_risk": 50})
+        assert [a["alert_id"] for a in r.json()] == ["a2"]
+
+        r = client.post("/api/v1/alerts/bulk/delete", json={"alert_ids": ["a2", "a3", "missing"]})
+        assert r.json()["deleted"] == 2
+        assert client.post("/api/v1/alerts/bulk/delete", json={}).status_code == 400
+
+
+def test_bulk_selection_must_narrow_the_alerts(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "test.db"))
+    with TestClient(app) as client:
+        conn = app.state.db
+        conn.execute("INSERT INTO alerts (alert_id, rule_name, severity, description) VALUES ('a1', 'R', 'LOW', 'x')")
+
+        assert client.post("/api/v1/alerts/bulk/delete", json={"filters": {}}).status_code == 400
+        assert client.post("/api/v1/alerts/bulk/delete", json={"alert_ids": []}).status_code == 400
+        r = client.put("/api/v1/alerts/bulk/status", json={"status": "closed", "filters": {}})
+        assert r.status_code == 400
+        assert conn.execute("SELECT status FROM alerts").fetchall() == [("OPEN",)]
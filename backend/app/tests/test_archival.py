@@ -0,0 +1,120 @@
+import glob
+import os
+
+import pytest
+import duckdb
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.database import init_database, load_encoded
+from app.core.security import DEFAULT_TENANT, create_access_token
+from app.main import app
+from app.services.archival import run_archive
+from app.services.client_profiles import update_trade_activity
+from app.services.compliance_snapshots import record_snapshot
+
+
+def test_closed_alerts_and_cold_trades_move_to_parquet(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    root = str(tmp_path / "archive")
+    try:
+        init_database(conn)
+        conn.execute("""
+            INSERT INTO alerts (alert_id, rule_name, severity, description, status, created_at) VALUES
+            ('old-closed', 'R', 'LOW', 'x', 'CLOSED', CURRENT_TIMESTAMP - INTERVAL 200 DAY),
+            ('old-open', 'R', 'LOW', 'x', 'OPEN', CURRENT_TIMESTAMP - INTERVAL 200 DAY),
+            ('new-closed', 'R', 'LOW', 'x', 'CLOSED', CURRENT_TIMESTAMP)
+        """)
+        conn.execute("""
+            CREATE TEMP TABLE staged AS SELECT * FROM (VALUES
+                ('t-old', NULL, 'C1', 'AAPL', 'BUY', 1, 10.0, CURRENT_TIMESTAMP - INTERVAL 30 DAY),
+                ('t-new', NULL, 'C1', 'AAPL', 'SELL', 1, 10.0, CURRENT_TIMESTAMP)
+            ) v(trade_id, order_id, client_id, symbol, side, quantity, price, timestamp)
+        """)
+        load_encoded(conn, "trades", "staged")
+
+        result = run_archive(conn, root, alert_age_days=90, trade_margin_days=1)
+
+        assert result["alerts_archived"] == 1 and result["trades_archived"] == 1
+        assert conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] == 2
+        assert conn.execute("SELECT trade_id FROM trades").fetchall() == [("t-new",)]
+        archived = conn.execute("SELECT alert_id FROM alerts_all WHERE archived").fetchall()
+        assert archived == [("old-closed",)]
+        assert conn.execute(
+            "SELECT client_id, symbol FROM trades_all WHERE trade_id = 't-old'"
+        ).fetchone() == ("C1", "AAPL")
+    finally:
+        conn.close()
+
+
+class FailingDelete:
+    """Connection proxy whose trade DELETE fails, as a crash between write and delete would."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, parameters=None):
+        if "DELETE FROM trades" in sql:
+            raise duckdb.IOException("disk went away")
+        return self._conn.execute(sql) if parameters is None else self._conn.execute(sql, parameters)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def test_failed_archive_leaves_no_files_and_rerun_archives_once(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    root = str(tmp_path / "archive")
+    try:
+        init_database(conn)
+        conn.execute("""
+            INSERT INTO alerts (alert_id, rule_name, severity, description, status, created_at) VALUES
+            ('old-closed', 'R', 'LOW', 'x', 'CLOSED', CURRENT_TIMESTAMP - INTERVAL 200 DAY)
+        """)
+        conn.execute("""
+            CREATE TEMP TABLE staged AS SELECT 't-old' AS trade_id, NULL AS order_id, 'C1' AS client_id,
+                'AAPL' AS symbol, 'BUY' AS side, 1 AS quantity, 10.0 AS price,
+                CURRENT_TIMESTAMP - INTERVAL 30 DAY AS timestamp
+        """)
+        load_encoded(conn, "trades", "staged")
+
+        with pytest.raises(duckdb.IOException):
+            run_archive(FailingDelete(conn), root, alert_age_days=90, trade_margin_days=1)
+        assert glob.glob(os.path.join(root, "**", "*.parquet"), recursive=True) == []
+        assert conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0] == 1
+
+        run_archive(conn, root, alert_age_days=90, trade_margin_days=1)
+        assert conn.execute("SELECT COUNT(*) FROM alerts_all WHERE archived").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM trades_all WHERE archived").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_archiving_keeps_activity_history_and_publishes_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "test.db"))
+    monkeypatch.setattr(settings, "archive_dir", str(tmp_path / "archive"))
+    headers = {"Authorization": f"Bearer {create_access_token('admin', 'admin')}"}
+    with TestClient(app) as client:
+        conn = app.state.db
+        conn.execute("""
+            CREATE TEMP TABLE staged AS SELECT * FROM (VALUES
+                ('t-old', NULL, 'C1', 'AAPL', 'BUY', 1, 10.0, CURRENT_TIMESTAMP - INTERVAL 30 DAY),
+                ('t-new', NULL, 'C1', 'MSFT', 'SELL', 2, 10.0, CURRENT_TIMESTAMP)
+            ) v(trade_id, order_id, client_id, symbol, side, quantity, price, timestamp)
+        """)
+        load_encoded(conn, "trades", "staged")
+        update_trade_activity(conn)
+        profile = "SELECT total_trades, symbols_traded, first_trade FROM client_profiles WHERE client_id = 'C1'"
+        before = conn.execute(profile).fetchone()
+        old_day = conn.execute("SELECT CAST(timestamp AS DATE) FROM trades WHERE trade_id = 't-old'").fetchone()[0]
+
+        r = client.post("/api/v1/data/archive", headers=headers)
+        assert r.status_code == 200 and r.json()["trades_archived"] == 1
+
+        assert conn.execute(profile).fetchone() == before
+        assert conn.execute("SELECT SUM(trades) FROM client_activity_daily").fetchone()[0] == 2
+        row = record_snapshot(conn, old_day)
+        assert row["total_trades"] == 2 and row["trades_on_day"] == 1
+        assert app.state.events.latest_values(DEFAULT_TENANT, "stats")["total_trades"] == 1
+        assert app.state.events.latest_values(DEFAULT_TENANT, "compliance_score")["total_trades"] == 2
@@ -0,0 +1,87 @@
+import random
+import statistics
+from datetime import datetime, timedelta
+
+import duckdb
+from app.core.database import init_database, load_encoded
+from app.services.baselines import baseline_scores, rebuild_baselines, update_baselines
+from app.services.detection_rules import ComplianceDetector
+
+
+def load_hours(conn, counts_by_hour: dict[datetime, int], client_id: str = "MM1", replace: bool = True,
+               tag: str = "") -> None:
+    """Load `count` BUYs of 10 @ 100 in each given hour and add them to the baselines, as an upload would."""
+    rows = []
+    for hour, count in counts_by_hour.items():
+        rows += [
+            (f"{client_id}_{hour:%Y%m%d%H}_{tag}{i}", None, client_id, "AAPL", "BUY", 10, 100.0,
+             hour + timedelta(seconds=i))
+            for i in range(count)
+        ]
+    if replace:
+        conn.execute("DELETE FROM trades")
+        conn.execute("DELETE FROM client_hourly_activity")
+    conn.execute("""
+        CREATE OR REPLACE TEMP TABLE staged (trade_id VARCHAR, order_id VARCHAR, client_id VARCHAR, symbol VARCHAR,
+                                             side VARCHAR, quantity INTEGER, price DOUBLE, timestamp TIMESTAMP)
+    """)
+    conn.executemany("INSERT INTO staged VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    load_encoded(conn, "trades", "staged")
+    update_baselines(conn, "staged")
+
+
+def test_incremental_updates_match_rebuild_and_window(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        rng = random.Random(3)
+        start = datetime(2024, 1, 1)
+        counts = {start + timedelta(hours=h): rng.randint(20, 60) for h in range(40)}
+        hours = sorted(counts)
+        load_hours(conn, {h: counts[h] for h in hours[:15]})
+        load_hours(conn, {h: counts[h] for h in hours[15:]}, replace=False)
+        # Late trades for hours that were already recorded are added to those hours
+        late = {h: 5 for h in hours[:3]}
+        load_hours(conn, late, replace=False, tag="late")
+        for h in late:
+            counts[h] += late[h]
+
+        incremental = conn.execute("SELECT * FROM client_hourly_activity ORDER BY hour").fetchall()
+        assert [row[3] for row in incremental] == [counts[h] for h in hours]
+        rebuild_baselines(conn)
+        assert conn.execute("SELECT * FROM client_hourly_activity ORDER BY hour").fetchall() == incremental
+
+        # The last hour is scored against the one-day window of hours before it
+        [score] = baseline_scores(conn, lookback_hours=1, min_hours=2, now=hours[-1] + timedelta(hours=1),
+                                  window_days=1)
+        window = [counts[h] for h in hours[-25:-1]]
+        assert score["baseline_hours"] == 24
+        expected = (counts[hours[-1]] - statistics.fmean(window)) / statistics.stdev(window)
+        assert abs(score["z_trades"] - expected) < 1e-9
+    finally:
+        conn.close()
+
+
+def test_spike_is_scored_against_own_baseline(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        rng = random.Random(5)
+        now = datetime.now().replace(minute=30, second=0, microsecond=0)
+        # A market maker doing ~40 trades an hour for two days, then 150 in the last complete hour
+        history = {now.replace(minute=0) - timedelta(hours=h): rng.randint(35, 45) for h in range(2, 50)}
+        history[now.replace(minute=0) - timedelta(hours=1)] = 150
+        load_hours(conn, history)
+
+        scores = baseline_scores(conn, lookback_hours=3, min_hours=20, now=now)
+        spike = max(scores, key=lambda s: s["z_trades"])
+        assert spike["trades"] == 150 and spike["z_trades"] > 10
+
+        detector = ComplianceDetector(conn)
+        anomalies = detector.detect_behavioral_anomalies()
+        assert [a["data"]["metric"] for a in anomalies] and anomalies[0]["severity"] == "HIGH"
+        # The usual ~40/hour pace is above the global threshold but normal for this client
+        hf = detector.detect_high_frequency_patterns()
+        assert [a["data"]["max_hourly_trades"] for a in hf] == [150]
+    finally:
+        conn.close()
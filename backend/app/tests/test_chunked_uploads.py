@@ -0,0 +1,93 @@
+import hashlib
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services.chunked_uploads import UploadSessionStore
+
+SAMPLE_DIR = Path(__file__).resolve().parents[3] / "sample_data"
+
+
+def line_chunks(lines: list[bytes], size: int) -> list[bytes]:
+    return [b"".join(lines[i:i + size]) for i in range(0, len(lines), size)]
+
+
+def put(client, session_id: str, index: int, body: bytes, checksum: str | None = None):
+    return client.put(
+        f"/api/v1/data/upload/sessions/{session_id}/chunks/{index}",
+        content=body,
+        headers={"X-Chunk-SHA256": checksum or hashlib.sha256(body).hexdigest()},
+    )
+
+
+def test_resumable_chunked_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "test.db"))
+    monkeypatch.setattr(settings, "upload_spool_dir", str(tmp_path / "uploads"))
+    lines = (SAMPLE_DIR / "trades.csv").read_bytes().splitlines(keepends=True)
+    header, rows = lines[0], lines[1:]
+    first, rest = rows[: len(rows) // 2], rows[len(rows) // 2:]
+
+    with TestClient(app) as client:
+        r = client.post("/api/v1/data/upload/sessions", json={"table_type": "trades", "total_chunks": 3})
+        assert r.status_code == 200, r.text
+        session_id = r.json()["session_id"]
+
+        chunks = line_chunks([header] + first, max(1, (len(first) + 1) // 3 + 1))
+        assert len(chunks) == 3
+        # Out of order; a corrupted transfer is rejected and simply resent
+        assert put(client, session_id, 2, chunks[2]).status_code == 200
+        assert put(client, session_id, 1, chunks[1], checksum="0" * 64).status_code == 422
+        assert put(client, session_id, 0, chunks[0]).status_code == 200
+        status = client.get(f"/api/v1/data/upload/sessions/{session_id}").json()
+        assert status["received_chunks"] == [0, 2] and status["missing_chunks"] == [1]
+        assert client.post(f"/api/v1/data/upload/sessions/{session_id}/finalize").status_code == 400
+
+        assert put(client, session_id, 1, chunks[1]).status_code == 200
+        r = client.post(f"/api/v1/data/upload/sessions/{session_id}/finalize")
+        assert r.status_code == 200, r.text
+        assert r.json()["records_uploaded"] == len(first) and r.json()["chunks"] == 3
+        assert app.state.db.execute("SELECT COUNT(*) FROM trades").fetchone()[0] == len(first)
+        assert client.get(f"/api/v1/data/upload/sessions/{session_id}").status_code == 404
+
+        # Append the remainder plus one row that is already loaded
+        r = client.post("/api/v1/data/upload/sessions", json={"table_type": "trades", "mode": "append"})
+        session_id = r.json()["session_id"]
+        assert put(client, session_id, 0, header + first[0] + b"".join(rest)).status_code == 200
+        r = client.post(f"/api/v1/data/upload/sessions/{session_id}/finalize")
+        assert r.status_code == 200, r.text
+        result = r.json()
+        assert result["records_uploaded"] == len(rest) and result["records_rejected"] == 1
+        assert "already loaded" in str(result["rejection_reasons"])
+        conn = app.state.db
+        assert conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0] == len(rows)
+        # Client activity and hourly baselines are accumulated across the two loads
+        assert conn.execute("SELECT SUM(total_trades) FROM client_profiles").fetchone()[0] == len(rows)
+        assert conn.execute("SELECT SUM(trades) FROM client_hourly_activity").fetchone()[0] == len(rows)
+
+        assert client.delete("/api/v1/data/clear", params={"table_type": "trades"}).status_code == 200
+        assert conn.execute("SELECT COUNT(*) FROM client_hourly_activity").fetchone()[0] == 0
+
+
+def test_stale_parse_does_not_replace_a_resent_chunk(tmp_path):
+    store = UploadSessionStore(str(tmp_path))
+    meta = store.create("default", "trades", "replace")
+    directory = tmp_path / "default" / meta["session_id"]
+    old, new = b"trade_id\nt1\n", b"trade_id\nt1\nt2\n"
+    (directory / "chunk_000000.csv").write_bytes(new)
+    meta["chunks"]["0"] = {"sha256": hashlib.sha256(new).hexdigest(), "bytes": len(new), "rows": None}
+    store._write("default", meta)
+    parquet = str(directory / "chunk_000000.parquet")
+
+    # A parse scheduled for the first transfer finishes after the chunk was re-sent
+    stale = store._parse_and_record("default", meta["session_id"], 0, hashlib.sha256(old).hexdigest(),
+                                    str(directory / "chunk_000000.csv"), parquet, None)
+    assert stale is None
+    assert not (directory / "chunk_000000.parquet").exists()
+    assert store.status("default", meta["session_id"])["parsed_chunks"] == []
+
+    rows = store._parse_and_record("default", meta["session_id"], 0, hashlib.sha256(new).hexdigest(),
+                                   str(directory / "chunk_000000.csv"), parquet, None)
+    assert rows == 2 and store.status("default", meta["session_id"])["parsed_chunks"] == [0]
+    assert [p.name for p in directory.iterdir() if p.suffix == ".tmp"] == []
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+
+SAMPLE_DIR = Path(__file__).resolve().parents[3] / "sample_data"
+
+
+def upload(client, table_type: str) -> None:
+    with (SAMPLE_DIR / f"{table_type}.csv").open("rb") as f:
+        r = client.post("/api/v1/data/upload/csv", files={"file": (f"{table_type}.csv", f, "text/csv")},
+                        data={"table_type": table_type})
+    assert r.status_code == 200, r.text
+
+
+def test_client_profile_matches_live_tables(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "test.db"))
+    with TestClient(app) as client:
+        for table_type in ("clients", "orders", "trades"):
+            upload(client, table_type)
+        conn = app.state.db
+        conn.execute("""
+            INSERT INTO alerts (alert_id, rule_name, severity, description, client_id)
+            VALUES ('manual', 'MANUAL_REVIEW', 'LOW', 'x', 'CLIENT_001')
+        """)
+        client.put("/api/v1/alerts/bulk/status", json={"status": "OPEN", "alert_ids": ["manual"]})
+
+        r = client.get("/api/v1/clients/CLIENT_001/profile")
+        assert r.status_code == 200
+        profile = r.json()
+        assert profile["client"]["client_name"] == "Acme Trading Corp"
+
+        trades, notional = conn.execute("""
+            SELECT COUNT(*), SUM(quantity * price) FROM trades_named WHERE client_id = 'CLIENT_001'
+        """).fetchone()
+        summary = profile["summary"]
+        assert summary["total_trades"] == trades
+        assert abs(summary["total_notional"] - float(notional)) < 1e-6
+        assert summary["total_orders"] == conn.execute(
+            "SELECT COUNT(*) FROM orders_named WHERE client_id = 'CLIENT_001'"
+        ).fetchone()[0]
+        assert sum(s["trades"] for s in profile["by_symbol"]) == trades
+        latest = client.get("/api/v1/clients/CLIENT_001/profile", params={"days": 1}).json()["daily_activity"]
+        assert {d["trade_date"] for d in latest} == {max(d["trade_date"] for d in profile["daily_activity"])}
+        open_alerts = conn.execute("""
+            SELECT COUNT(*) FROM alerts WHERE client_id = 'CLIENT_001' AND status IN ('OPEN', 'IN_REVIEW')
+        """).fetchone()[0]
+        assert summary["open_alerts"] == open_alerts and summary["open_alerts_by_rule"]["MANUAL_REVIEW"] == 1
+
+        # Closing an alert updates that client's summary
+        client.put("/api/v1/alerts/manual/status", params={"status": "CLOSED"})
+        summary = client.get("/api/v1/clients/CLIENT_001/profile").json()["summary"]
+        assert summary["open_alerts"] == open_alerts - 1 and "MANUAL_REVIEW" not in summary["open_alerts_by_rule"]
+
+        assert client.get("/api/v1/clients/NOBODY/profile").status_code == 404
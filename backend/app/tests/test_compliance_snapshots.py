@@ -0,0 +1,23 @@
+from datetime import date
+
+import duckdb
+from app.core.database import init_database
+from app.services.compliance_snapshots import record_snapshot
+
+
+def test_snapshot_is_upserted_per_day(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        day = date(2024, 9, 8)
+        record_snapshot(conn, day)
+        conn.execute("""
+            INSERT INTO alerts (alert_id, rule_name, severity, description)
+            VALUES ('a1', 'WASH_TRADE_DETECTION', 'HIGH', 'x'), ('a2', 'WASH_TRADE_DETECTION', 'LOW', 'y')
+        """)
+        row = record_snapshot(conn, day)
+        assert row["open_alerts"] == 2 and row["open_high"] == 1
+        assert row["rule_counts"] == {"WASH_TRADE_DETECTION": 2}
+        assert conn.execute("SELECT COUNT(*), MAX(open_alerts) FROM compliance_snapshots").fetchone() == (1, 2)
+    finally:
+        conn.close()
@@ -0,0 +1,60 @@
+import duckdb
+from app.services.detect import main
+
+
+def write_inputs(tmp_path):
+    trades_dir = tmp_path / "trades"
+    trades_dir.mkdir()
+    parts = [[("t1", "BUY", 100.0), ("t2", "SELL", 100.1)], [("t3", "BUY", 100.0), ("t4", "SELL", 100.2)]]
+    conn = duckdb.connect()
+    try:
+        for i, rows in enumerate(parts):
+            values = ", ".join(
+                f"('{trade_id}', NULL, 'C1', 'AAPL', '{side}', 10, {price}, CURRENT_TIMESTAMP)"
+                for trade_id, side, price in rows
+            )
+            conn.execute(f"""
+                COPY (SELECT * FROM (VALUES {values})
+                      AS v(trade_id, order_id, client_id, symbol, side, quantity, price, timestamp))
+                TO '{trades_dir / f"part_{i}.parquet"}' (FORMAT PARQUET)
+            """)
+    finally:
+        conn.close()
+    clients = tmp_path / "clients.csv"
+    clients.write_text(
+        "client_id,client_name,client_type,risk_rating,account_status,created_date\n"
+        "C1,Client One,RETAIL,LOW,ACTIVE,2020-01-01\n"
+    )
+    return trades_dir, clients
+
+
+def test_cli_runs_detectors_over_files(tmp_path, capsys):
+    trades_dir, clients = write_inputs(tmp_path)
+    out = tmp_path / "alerts.parquet"
+    db = tmp_path / "live.db"
+
+    code = main(["--trades", str(trades_dir / "*.parquet"), "--clients", str(clients),
+                 "--out", str(out), "--db", str(db), "--threads", "2"])
+    assert code == 0
+
+    report = capsys.readouterr().out
+    assert "Loaded            4 trades" in report
+    assert "self-trade" in report and "Total alerts:" in report
+
+    conn = duckdb.connect(str(db))
+    try:
+        from_db = conn.execute("SELECT rule_name, client_id FROM alerts ORDER BY ALL").fetchall()
+        from_file = conn.execute(f"SELECT rule_name, client_id FROM read_parquet('{out}') ORDER BY ALL").fetchall()
+    finally:
+        conn.close()
+    assert ("SELF_TRADE_DETECTION", "C1") in from_db
+    assert from_db == from_file
+
+
+def test_cli_requires_inputs_and_output(tmp_path, capsys):
+    try:
+        main(["--out", str(tmp_path / "alerts.parquet")])
+    except SystemExit as e:
+        assert e.code == 2
+    else:
+        raise AssertionError("expected a usage error")
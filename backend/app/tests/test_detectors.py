@@ -1,5 +1,5 @@
 import duckdb
-from app.core.database import init_database
+from app.core.database import init_database, load_encoded
 from app.services.detection_rules import ComplianceDetector
 
 
@@ -7,13 +7,15 @@ def seed_trades(conn: duckdb.DuckDBPyConnection) -> None:
     conn.execute("DELETE FROM trades")
     conn.execute("DELETE FROM alerts")
     conn.execute("""
-        INSERT INTO trades (trade_id, order_id, client_id, symbol, side, quantity, price, timestamp)
-        VALUES
+        CREATE OR REPLACE TEMP TABLE staged_trades AS
+        SELECT * FROM (VALUES
         ('t1', NULL, 'C1', 'AAPL', 'BUY', 10, 100.0, CURRENT_TIMESTAMP),
         ('t2', NULL, 'C1', 'AAPL', 'SELL', 10, 100.1, CURRENT_TIMESTAMP),
         ('t3', NULL, 'C1', 'AAPL', 'BUY', 10, 100.0, CURRENT_TIMESTAMP),
         ('t4', NULL, 'C1', 'AAPL', 'SELL', 10, 100.2, CURRENT_TIMESTAMP)
+        ) AS v(trade_id, order_id, client_id, symbol, side, quantity, price, timestamp)
     """)
+    load_encoded(conn, "trades", "staged_trades")
 
 
 def test_self_trade_detector_flags_pairs(tmp_path):
@@ -29,3 +31,86 @@ def test_self_trade_detector_flags_pairs(tmp_path):
         conn.close()
 
 
+def test_trades_are_dictionary_encoded(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        seed_trades(conn)
+        assert conn.execute("SELECT COUNT(*) FROM client_dim").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM symbol_dim").fetchone()[0] == 1
+        # Loading the same names again must reuse the existing keys
+        seed_trades(conn)
+        assert conn.execute("SELECT COUNT(*) FROM client_dim").fetchone()[0] == 1
+        row = conn.execute(
+            "SELECT client_id, symbol, side FROM trades_named WHERE trade_id = 't2'"
+        ).fetchone()
+        assert row == ("C1", "AAPL", "SELL")
+    finally:
+        conn.close()
+
+
+def test_legacy_varchar_layout_is_migrated(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        conn.execute("""
+            CREATE TABLE trades (
+                trade_id VARCHAR PRIMARY KEY, order_id VARCHAR, client_id VARCHAR, symbol VARCHAR,
+                side VARCHAR, quantity INTEGER, price DECIMAL(10,4), timestamp TIMESTAMP
+            )
+        """)
+        conn.execute("INSERT INTO trades VALUES ('t1', NULL, 'C9', 'MSFT', 'BUY', 5, 10.0, CURRENT_TIMESTAMP)")
+        init_database(conn)
+        cols = [r[0] for r in conn.execute("DESCRIBE trades").fetchall()]
+        assert "client_key" in cols and "client_id" not in cols
+        assert conn.execute("SELECT client_id, symbol FROM trades_named").fetchall() == [("C9", "MSFT")]
+    finally:
+        conn.close()
+
+
+def test_legacy_orders_with_unknown_order_types_are_quarantined(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        conn.execute("""
+            CREATE TABLE orders (
+                order_id VARCHAR PRIMARY KEY, client_id VARCHAR, trader_id VARCHAR, symbol VARCHAR, side VARCHAR,
+                quantity INTEGER, price DECIMAL(10,4), timestamp TIMESTAMP, order_type VARCHAR
+            )
+        """)
+        conn.execute("""
+            INSERT INTO orders VALUES
+            ('o1', 'C9', 'T1', 'MSFT', 'BUY', 5, 10.0, CURRENT_TIMESTAMP, 'limit'),
+            ('o2', 'C9', 'T1', 'MSFT', 'BUY', 5, 10.0, CURRENT_TIMESTAMP, 'IOC'),
+            ('o3', 'C9', 'T1', 'MSFT', 'BUY', 5, 10.0, CURRENT_TIMESTAMP, '')
+        """)
+        init_database(conn)
+        assert conn.execute("SELECT order_id, order_type FROM orders ORDER BY order_id").fetchall() == [
+            ("o1", "LIMIT"), ("o3", None),
+        ]
+        [(reason, record)] = conn.execute("SELECT reason, raw_record FROM upload_quarantine").fetchall()
+        assert reason == "invalid order_type" and '"order_id":"o2"' in record
+    finally:
+        conn.close()
+
+
+def test_cross_account_matches_are_clustered(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        # A buys what B sells, and B buys what C sells, at the same price and size
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE staged_trades AS
+            SELECT 'x' || i || side AS trade_id, NULL AS order_id, client_id, 'MSFT' AS symbol, side,
+                   100 AS quantity, 50.0 AS price,
+                   CURRENT_TIMESTAMP - INTERVAL 1 HOUR + to_seconds(i * 60 + offset_s) AS timestamp
+            FROM range(3) r(i),
+                 (VALUES ('A', 'BUY', 0), ('B', 'SELL', 2), ('B', 'BUY', 20), ('C', 'SELL', 23)) v(client_id, side, offset_s)
+        """)
+        conn.execute("UPDATE staged_trades SET trade_id = trade_id || client_id")
+        load_encoded(conn, "trades", "staged_trades")
+        alerts = ComplianceDetector(conn).detect_cross_account_matches()
+        assert len(alerts) == 1
+        assert alerts[0]["data"]["accounts"] == ["A", "B", "C"]
+        assert alerts[0]["data"]["matched_pairs"] == 6
+        assert alerts[0]["severity"] == "HIGH"
+    finally:
+        conn.close()
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.core.events import EventBroadcaster, format_sse
+
+
+def test_deltas_replay_and_slow_subscribers():
+    async def main():
+        events = EventBroadcaster(history=3, queue_size=2)
+        queue = events.subscribe("t1")
+        assert events.publish_values("t1", "stats", {"total": 1, "high": 0})["data"] == {"total": 1, "high": 0}
+        assert events.publish_values("t1", "stats", {"total": 1, "high": 0}) is None
+        assert events.publish_values("t1", "stats", {"total": 2, "high": 0})["data"] == {"total": 2}
+        assert [e["id"] for e in (queue.get_nowait(), queue.get_nowait())] == [1, 2]
+
+        events.publish("t1", "alerts", [])
+        events.publish("t1", "alerts", [])
+        assert [e["id"] for e in events.replay("t1", 2)] == [3, 4]
+        # Event 1 has fallen out of the 3-event buffer, so resume is impossible
+        assert events.replay("t1", 0) is None
+        # The subscriber never drained events 3 and 4 and gets dropped on the next publish
+        events.publish("t1", "alerts", [])
+        assert events.subscriber_count("t1") == 0
+        assert queue.get_nowait() is None
+        assert events.last_event_id("t2") == 0
+
+    asyncio.run(main())
+
+
+def test_format_sse():
+    frame = format_sse({"id": 7, "type": "stats", "data": {"total": 1}})
+    assert frame == 'id: 7\nevent: stats\ndata: {"total": 1}\n\n'
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+import duckdb
+
+from app.core.database import init_database, load_encoded
+from app.services.detection_rules import ComplianceDetector
+
+
+def test_front_running_pairs_house_order_with_later_client_order(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        conn.execute("""
+            INSERT INTO clients (client_id, client_name, client_type) VALUES
+            ('HOUSE1', 'Desk book', 'PROP_TRADING'), ('BIG', 'Pension fund', 'INSTITUTIONAL')
+        """)
+        t0 = conn.execute("SELECT CAST(CURRENT_TIMESTAMP AS TIMESTAMP) - INTERVAL 1 HOUR").fetchone()[0]
+        at = lambda seconds: t0 + timedelta(seconds=seconds)
+        rows = [
+            # T1 buys for the house 20s before the client's large buy: flagged
+            ("h1", "HOUSE1", "T1", "XYZ", "BUY", 100, 50.0, at(0)),
+            ("c1", "BIG", "T1", "XYZ", "BUY", 5000, 50.1, at(20)),
+            # Opposite side, other trader, too early, or too small: not flagged
+            ("h2", "HOUSE1", "T1", "XYZ", "SELL", 100, 50.0, at(100)),
+            ("c2", "BIG", "T1", "XYZ", "BUY", 5000, 50.0, at(110)),
+            ("h3", "HOUSE1", "T2", "ABC", "BUY", 100, 20.0, at(200)),
+            ("c3", "BIG", "T1", "ABC", "BUY", 10000, 20.0, at(205)),
+            ("c4", "BIG", "T2", "ABC", "BUY", 10000, 20.0, at(400)),
+            ("h4", "HOUSE1", "T2", "ABC", "BUY", 100, 20.0, at(500)),
+            ("c5", "BIG", "T2", "ABC", "BUY", 10, 20.0, at(505)),
+        ]
+        conn.execute("""
+            CREATE TEMP TABLE staged_orders (
+                order_id VARCHAR, client_id VARCHAR, trader_id VARCHAR, symbol VARCHAR, side VARCHAR,
+                quantity INTEGER, price DECIMAL(10,4), timestamp TIMESTAMP, order_type VARCHAR
+            )
+        """)
+        conn.executemany("INSERT INTO staged_orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'LIMIT')", rows)
+        load_encoded(conn, "orders", "staged_orders")
+
+        alerts = ComplianceDetector(conn).detect_front_running()
+        assert [(a["data"]["leading_order_id"], a["data"]["lagging_order_id"]) for a in alerts] == [("h1", "c1")]
+        alert = alerts[0]
+        assert alert["severity"] == "MEDIUM" and alert["data"]["lead_seconds"] == 20
+        assert alert["data"]["house_account"] == "HOUSE1" and alert["data"]["client_id"] == "BIG"
+        assert conn.execute("SELECT client_id, symbol FROM alerts WHERE rule_name = 'FRONT_RUNNING'").fetchall() == [
+            ("BIG", "XYZ")
+        ]
+    finally:
+        conn.close()
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+import duckdb
+
+from app.core.database import init_database, load_encoded
+from app.services.detection_rules import ComplianceDetector
+
+
+def load_trades(conn, rows) -> None:
+    conn.execute("""
+        CREATE OR REPLACE TEMP TABLE staged_trades (
+            trade_id VARCHAR, order_id VARCHAR, client_id VARCHAR, symbol VARCHAR,
+            side VARCHAR, quantity INTEGER, price DECIMAL(10,4), timestamp TIMESTAMP
+        )
+    """)
+    conn.executemany("INSERT INTO staged_trades VALUES (?, NULL, ?, ?, ?, ?, ?, ?)", rows)
+    load_encoded(conn, "trades", "staged_trades")
+
+
+def detector(conn) -> ComplianceDetector:
+    d = ComplianceDetector(conn)
+    d.rules = {**d.rules, "marking_the_close": {**d.rules.get("marking_the_close", {}), "lookback_days": 3}}
+    return d
+
+
+def test_marking_the_close_flags_client_moving_the_close(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        day = conn.execute("SELECT CAST(CURRENT_DATE - 1 AS TIMESTAMP)").fetchone()[0]
+        at = lambda h, m: day.replace(hour=h, minute=m)
+        rows = [
+            # Quiet session for both clients, then C1 buys into the close and lifts it 3%
+            ("t1", "C2", "XYZ", "BUY", 100, 100.0, at(11, 0)),
+            ("t2", "C1", "XYZ", "SELL", 100, 100.0, at(14, 0)),
+            ("t3", "C2", "XYZ", "SELL", 100, 100.0, at(15, 40)),
+            ("t4", "C1", "XYZ", "BUY", 500, 100.8, at(15, 52)),
+            ("t5", "C1", "XYZ", "BUY", 500, 101.9, at(15, 55)),
+            ("t6", "C2", "XYZ", "SELL", 10, 101.8, at(15, 57)),
+            ("t7", "C1", "XYZ", "BUY", 500, 103.0, at(15, 59)),
+            # After the close: ignored
+            ("t8", "C1", "XYZ", "SELL", 1500, 99.0, at(16, 30)),
+        ]
+        load_trades(conn, rows)
+        alerts = detector(conn).detect_marking_the_close()
+        assert [(a["data"]["client_id"], a["severity"]) for a in alerts] == [("C1", "HIGH")]
+        data = alerts[0]["data"]
+        assert data["close_trades"] == 3 and data["session_trades"] == 4
+        assert data["reference_price"] == 100.0 and data["closing_price"] == 103.0
+        assert abs(data["price_move_pct"] - 3.0) < 1e-9 and data["impact_share"] > 1
+        assert conn.execute("SELECT COUNT(*) FROM alerts WHERE rule_name = 'MARKING_THE_CLOSE'").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_ramping_flags_monotonic_same_side_runs(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        start = conn.execute("SELECT CAST(CURRENT_TIMESTAMP AS TIMESTAMP) - INTERVAL 3 HOUR").fetchone()[0]
+        minute = lambda n: start + timedelta(minutes=n)
+        rows = []
+        # C1: six buys, each a little higher (+1.5%); C2: same prices but alternating sides
+        for i, price in enumerate([50.0, 50.1, 50.25, 50.3, 50.5, 50.75]):
+            rows.append((f"a{i}", "C1", "RAMP", "BUY", 100, price, minute(i * 2)))
+            rows.append((f"b{i}", "C2", "RAMP", "BUY" if i % 2 else "SELL", 100, price, minute(i * 2 + 1)))
+        # C3: a long enough run, but with a pause that splits it
+        for i, price in enumerate([20.0, 20.2, 20.4, 20.6, 20.8, 21.0]):
+            rows.append((f"c{i}", "C3", "RAMP", "SELL", 100, 40 - price, minute(i * 5 + (30 if i >= 3 else 0))))
+        load_trades(conn, rows)
+
+        alerts = detector(conn).detect_ramping()
+        assert [a["data"]["client_id"] for a in alerts] == ["C1"]
+        data = alerts[0]["data"]
+        assert data["run_trades"] == 6 and data["monotonic_ratio"] == 1.0
+        assert abs(data["price_move_pct"] - 1.5) < 1e-9 and alerts[0]["severity"] == "MEDIUM"
+    finally:
+        conn.close()
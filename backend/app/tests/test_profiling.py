@@ -0,0 +1,60 @@
+import asyncio
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.profiling import LatencyHistogram, SamplingProfiler, _current_sampler, to_thread
+from app.core.security import create_access_token
+from app.main import app
+
+
+def test_histogram_percentiles_within_bucket_error():
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000, db_seconds=ms / 2000)
+    assert 0.040 <= histogram.percentile(0.50) <= 0.050 * 1.2
+    assert 0.095 <= histogram.percentile(0.99) <= 0.100
+    summary = histogram.summary()
+    assert summary["count"] == 100 and summary["avg_db_ms"] == summary["avg_python_ms"]
+
+
+def test_route_latency_and_on_demand_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "test.db"))
+    headers = {"Authorization": f"Bearer {create_access_token('admin', 'admin')}"}
+    with TestClient(app) as client:
+        assert client.get("/api/v1/admin/latency").status_code == 401
+        r = client.post("/api/v1/admin/profile", json={"route": "GET /api/v1/dashboard/stats", "requests": 2},
+                        headers=headers)
+        assert r.status_code == 200
+        for _ in range(3):
+            client.get("/api/v1/dashboard/stats")
+        latency = client.get("/api/v1/admin/latency", headers=headers).json()
+        stats = latency["GET /api/v1/dashboard/stats"]
+        assert stats["count"] >= 3 and stats["avg_db_ms"] > 0
+        assert app.state.profiler.armed() == {}
+        r = client.get("/api/v1/admin/profile", params={"route": "GET /api/v1/dashboard/stats"}, headers=headers)
+        assert r.status_code == 200
+
+
+def spin_in_worker(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_profile_follows_request_work_into_worker_threads():
+    async def handler():
+        sampler = SamplingProfiler(threading.get_ident(), interval=0.002).start()
+        token = _current_sampler.set(sampler)
+        try:
+            await to_thread(spin_in_worker, 0.2)
+        finally:
+            _current_sampler.reset(token)
+        return sampler.stop()
+
+    samples = asyncio.run(handler())
+    worker = [stack for stack in samples if "spin_in_worker" in stack]
+    assert worker and all(not stack.startswith("thread MainThread") for stack in worker)
+    assert sum(samples[stack] for stack in worker) > 10
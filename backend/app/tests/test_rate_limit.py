@@ -0,0 +1,103 @@
+import socketserver
+import threading
+
+from app.core.rate_limit import MemoryBackend, RedisBackend, SharedMemoryBackend
+
+
+def _drain(backend, key, limit, now):
+    return sum(backend.hit(key, limit, 60, now=now)[0] for _ in range(limit + 5))
+
+
+def test_memory_backend_limits_and_evicts_idle_keys():
+    backend = MemoryBackend(max_keys=2)
+    assert _drain(backend, "a", 10, now=600.0) == 10
+    allowed, retry_after = backend.hit("a", 10, 60, now=630.0)
+    assert not allowed and retry_after == 30
+    # Half of the previous window still overlaps the sliding window
+    assert _drain(backend, "a", 10, now=690.0) == 5
+    backend.hit("b", 10, 60, now=690.0)
+    backend.hit("c", 10, 60, now=690.0)
+    assert len(backend) == 2
+    backend.hit("d", 10, 60, now=1000.0)
+    assert len(backend) == 1
+
+
+def test_shared_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "rl.bin")
+    first, second = SharedMemoryBackend(path, slots=64), SharedMemoryBackend(path, slots=64)
+    try:
+        assert _drain(first, "ip|rule", 3, now=600.0) == 3
+        assert not second.hit("ip|rule", 3, 60, now=601.0)[0]
+        assert second.hit("other", 3, 60, now=601.0)[0]
+    finally:
+        first.close()
+        second.close()
+
+
+def test_shared_backend_overflow_does_not_reset_other_keys(tmp_path):
+    backend = SharedMemoryBackend(str(tmp_path / "rl.bin"), slots=4)
+    try:
+        # Four live keys fill every slot; the keys after them share the overflow counter
+        for key in ("a", "b", "c", "d"):
+            assert _drain(backend, key, 3, now=600.0) == 3
+        assert _drain(backend, "e", 3, now=601.0) == 3
+        assert not backend.hit("f", 3, 60, now=601.0)[0]
+        assert not any(backend.hit(key, 3, 60, now=602.0)[0] for key in ("a", "b", "c", "d"))
+    finally:
+        backend.close()
+
+
+class _FakeRedis(socketserver.StreamRequestHandler):
+    """Just enough of the RESP protocol for the limiter's commands."""
+
+    store: dict = {}
+
+    def handle(self):
+        while True:
+            header = self.rfile.readline()
+            if not header:
+                return
+            args = []
+            for _ in range(int(header[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2].decode())
+            cmd, key = args[0].upper(), args[1]
+            if cmd in ("INCR", "DECR"):
+                self.store[key] = self.store.get(key, 0) + (1 if cmd == "INCR" else -1)
+                self.wfile.write(b":%d\r\n" % self.store[key])
+            elif cmd == "PEXPIRE":
+                self.wfile.write(b":1\r\n")
+            elif cmd == "GET":
+                value = self.store.get(key)
+                if value is None:
+                    self.wfile.write(b"$-1\r\n")
+                else:
+                    data = str(value).encode()
+                    self.wfile.write(b"$%d\r\n%s\r\n" % (len(data), data))
+
+
+def test_redis_backend_against_resp_stand_in():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _FakeRedis)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    backend = RedisBackend(f"redis://127.0.0.1:{server.server_address[1]}/0")
+    try:
+        assert _drain(backend, "ip|rule", 4, now=600.0) == 4
+        assert _drain(backend, "ip|rule", 4, now=690.0) == 2
+    finally:
+        backend.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_redis_backend_fails_open_and_backs_off(monkeypatch):
+    backend = RedisBackend("redis://127.0.0.1:1/0", timeout=0.1)
+    attempts = []
+    connect = backend._connect
+    monkeypatch.setattr(backend, "_connect", lambda: attempts.append(1) or connect())
+    assert backend.hit("k", 1, 60)[0]
+    # Within the backoff the server is not tried again
+    assert all(backend.hit("k", 1, 60)[0] for _ in range(20))
+    assert len(attempts) == 1
+    backend._retry_at = 0.0
+    assert backend.hit("k", 1, 60)[0] and len(attempts) == 2
@@ -0,0 +1,73 @@
+import time
+from types import SimpleNamespace
+
+import duckdb
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.resources import PROFILES, GovernedConnection, QueryTimeout, ResourceProfile, connection_config, governor
+from app.core.security import create_access_token
+from app.main import app
+
+
+def test_runaway_query_is_interrupted(monkeypatch):
+    conn = duckdb.connect()
+    monkeypatch.setitem(PROFILES, "batch", ResourceProfile("batch", 0.2))
+    governed = GovernedConnection(conn, "batch")
+    started = time.monotonic()
+    with pytest.raises(QueryTimeout):
+        governed.execute("SELECT COUNT(*) FROM range(100000) a, range(100000) b WHERE a.range + b.range = -1")
+    assert time.monotonic() - started < 5
+    # The connection stays usable and later statements are not affected by the old deadline
+    assert governed.execute("SELECT 42").fetchone() == (42,)
+    assert governor.snapshot()["active_queries"] == []
+    conn.close()
+
+
+class SharedConnection:
+    """The app-scoped connection; records whether a request's timeout interrupted it."""
+
+    def __init__(self):
+        self._conn = duckdb.connect()
+        self.interrupted = False
+
+    def cursor(self):
+        return self._conn.cursor()
+
+    def interrupt(self):
+        self.interrupted = True
+        self._conn.interrupt()
+
+
+def test_request_timeout_interrupts_only_its_own_cursor(monkeypatch):
+    shared = SharedConnection()
+    monkeypatch.setitem(PROFILES, "interactive", ResourceProfile("interactive", 0.2))
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(db=shared)), state=SimpleNamespace())
+    dependency = get_db(request)
+    conn = next(dependency)
+    with pytest.raises(QueryTimeout):
+        conn.execute("SELECT COUNT(*) FROM range(100000) a, range(100000) b WHERE a.range + b.range = -1")
+    dependency.close()
+    assert not shared.interrupted
+    assert shared.cursor().execute("SELECT 42").fetchone() == (42,)
+
+
+def test_connection_config_and_resource_report(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "test.db"))
+    monkeypatch.setattr(settings, "duckdb_memory_limit", "512MB")
+    monkeypatch.setattr(settings, "duckdb_threads", 2)
+    monkeypatch.setattr(settings, "duckdb_temp_directory", str(tmp_path / "spill"))
+    config = connection_config(temp_subdir="acme")
+    assert config["threads"] == 2 and config["temp_directory"].endswith("acme")
+
+    headers = {"Authorization": f"Bearer {create_access_token('admin', 'admin')}"}
+    with TestClient(app) as client:
+        r = client.get("/api/v1/admin/resources", headers=headers)
+        assert r.status_code == 200
+        usage = r.json()
+        assert usage["limits"]["threads"] == "2"
+        assert usage["limits"]["temp_directory"] == str(tmp_path / "spill")
+        assert usage["profiles"]["interactive"]["queries"] > 0
+        assert usage["batch_jobs"]["running"] == []
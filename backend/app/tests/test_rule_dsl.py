@@ -0,0 +1,86 @@
+import duckdb
+import pytest
+
+from app.core.database import init_database, load_encoded
+from app.services.detection_rules import ComplianceDetector
+from app.services.rule_dsl import RuleSpecError, compile_rule, compile_rule_pack, run_compiled_rule
+
+NOTIONAL_RULE = {
+    "partition_by": ["client_id", "symbol"],
+    "window": {"lookback_hours": 24},
+    "where": "side = 'BUY'",
+    "aggregates": {"buys": "COUNT(*)", "notional": "SUM(quantity * price)"},
+    "having": "notional >= $min_notional",
+    "params": {"min_notional": 1500},
+    "severity": [{"when": "buys >= 3", "level": "HIGH"}, {"level": "LOW"}],
+    "risk_score": "LEAST(100, notional / 100)",
+    "description": "{client_id} bought {notional:,.2f} of {symbol} in {lookback_hours}h",
+}
+
+
+def seed(conn) -> None:
+    conn.execute("""
+        CREATE OR REPLACE TEMP TABLE staged_trades AS
+        SELECT * FROM (VALUES
+        ('t1', NULL, 'C1', 'AAPL', 'BUY', 10, 100.0, CURRENT_TIMESTAMP::TIMESTAMP),
+        ('t2', NULL, 'C1', 'AAPL', 'BUY', 10, 100.0, CURRENT_TIMESTAMP::TIMESTAMP),
+        ('t3', NULL, 'C2', 'AAPL', 'BUY', 20, 100.0, CURRENT_TIMESTAMP::TIMESTAMP),
+        ('t4', NULL, 'C3', 'MSFT', 'BUY', 10, 100.0, CURRENT_TIMESTAMP::TIMESTAMP),
+        ('t5', NULL, 'C3', 'MSFT', 'BUY', 10, 100.0, CURRENT_TIMESTAMP::TIMESTAMP - INTERVAL 3 DAY)
+        ) AS v(trade_id, order_id, client_id, symbol, side, quantity, price, timestamp)
+    """)
+    load_encoded(conn, "trades", "staged_trades")
+
+
+def test_compiled_rule_writes_alerts_in_one_statement(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        seed(conn)
+        rule = compile_rule("big_buyer", NOTIONAL_RULE)
+        assert rule.params == {"min_notional": 1500, "lookback_hours": 24}
+
+        alerts = run_compiled_rule(conn, rule)
+        by_client = {a["data"]["client_id"]: a for a in alerts}
+        # C3's second trade is outside the window, so it stays under the threshold
+        assert sorted(by_client) == ["C1", "C2"]
+        assert by_client["C1"]["description"] == "C1 bought 2,000.00 of AAPL in 24h"
+        assert by_client["C1"]["severity"] == "LOW" and by_client["C1"]["data"]["risk_score"] == 20
+        stored = conn.execute("""
+            SELECT rule_name, client_id, symbol, severity FROM alerts ORDER BY client_id
+        """).fetchall()
+        assert stored == [("BIG_BUYER", "C1", "AAPL", "LOW"), ("BIG_BUYER", "C2", "AAPL", "LOW")]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"colour": "red"}, "unknown keys"),
+    ({"partition_by": ["client_id; DROP TABLE alerts"]}, "invalid partition key"),
+    ({"partition_by": ["trader_id"]}, "not a column of trades"),
+    ({"having": "notional >= $missing"}, "undefined params"),
+    ({"where": "1=1; DELETE FROM alerts"}, "may not contain"),
+    ({"severity": [{"level": "LOW"}, {"when": "buys > 1", "level": "HIGH"}]}, "only the last"),
+    ({"description": "{nope}"}, "unknown field"),
+])
+def test_invalid_rules_are_rejected(change, message):
+    with pytest.raises(RuleSpecError, match=message):
+        compile_rule("bad", {**NOTIONAL_RULE, **change})
+
+
+def test_detector_runs_enabled_pack_rules(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        seed(conn)
+        detector = ComplianceDetector(conn)
+        detector.rules = {"declarative_rules": {
+            "big_buyer": NOTIONAL_RULE,
+            "disabled": {**NOTIONAL_RULE, "enabled": False},
+            "broken": {**NOTIONAL_RULE, "source": "quotes"},
+        }}
+        compiled, errors = compile_rule_pack(detector.rules)
+        assert [r.name for r in compiled] == ["BIG_BUYER"] and list(errors) == ["broken"]
+        assert len(detector.detect_declarative_rules()) == 2
+    finally:
+        conn.close()
@@ -0,0 +1,101 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import duckdb
+from app.core.database import init_database, load_encoded
+from app.services.dashboard_metrics import dashboard_stats
+from app.services.sketches import (
+    HyperLogLog, SpaceSaving, approximate_distinct, approximate_top_symbols, rebuild_trade_sketches,
+    update_trade_sketches,
+)
+
+
+def test_hyperloglog_estimate_and_merge():
+    a, b = HyperLogLog(), HyperLogLog()
+    for i in range(20_000):
+        (a if i % 2 else b).add(f"CLIENT_{i}")
+        a.add(f"CLIENT_{i % 100}")  # duplicates don't count
+    merged = HyperLogLog.from_bytes(a.to_bytes()).merge(b)
+    assert abs(merged.count() - 20_000) / 20_000 < 4 * merged.relative_error
+    assert HyperLogLog().count() == 0
+
+
+def test_space_saving_keeps_heavy_hitters_across_merge():
+    rng = random.Random(7)
+    left, right = SpaceSaving(capacity=10), SpaceSaving(capacity=10)
+    truth = Counter()
+    for sketch in (left, right):
+        for _ in range(2000):
+            item = rng.choice(["AAPL", "MSFT"]) if rng.random() < 0.5 else f"S{rng.randint(0, 500)}"
+            truth[item] += 1
+            sketch.offer(item)
+    merged = SpaceSaving.from_bytes(left.to_bytes()).merge(right)
+    top = [item for item, *_ in merged.top(2)]
+    assert sorted(top) == ["AAPL", "MSFT"]
+    for item, count, error, _ in merged.top(2):
+        assert count - error <= truth[item] <= count
+    assert merged.total == 4000
+
+
+def test_dashboard_answers_from_sketches(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        now = datetime.now().replace(microsecond=0)
+        rows = [
+            (f"T{i}", None, f"C{i % 300}", "AAPL" if i % 3 else f"SYM{i % 7}", "BUY", 10, 1.0, now - timedelta(minutes=i))
+            for i in range(1200)
+        ]
+        conn.execute("""
+            CREATE TEMP TABLE staged (trade_id VARCHAR, order_id VARCHAR, client_id VARCHAR, symbol VARCHAR,
+                                      side VARCHAR, quantity INTEGER, price DOUBLE, timestamp TIMESTAMP)
+        """)
+        conn.executemany("INSERT INTO staged VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        load_encoded(conn, "trades", "staged")
+        update_trade_sketches(conn, "staged")
+
+        exact = dashboard_stats(conn, approximate=False)
+        approx = dashboard_stats(conn, approximate=True)
+        assert exact["total_clients"] == 300 and not exact["approximate"]
+        assert approx["approximate"] and abs(approx["total_clients"] - 300) <= 15
+        # AAPL plus SYM0..SYM6
+        assert exact["total_symbols"] == 8 and approx["total_symbols"] == 8
+
+        top = approximate_top_symbols(conn, 1)
+        assert top[0]["symbol"] == "AAPL"
+
+        # Rebuilding from the live table gives the same sketches as ingest-time updates
+        before = conn.execute("SELECT sketch_type, COUNT(*) FROM trade_sketches GROUP BY ALL ORDER BY 1").fetchall()
+        rebuild_trade_sketches(conn)
+        assert conn.execute("SELECT sketch_type, COUNT(*) FROM trade_sketches GROUP BY ALL ORDER BY 1").fetchall() == before
+        assert dashboard_stats(conn, approximate=True)["total_clients"] == approx["total_clients"]
+    finally:
+        conn.close()
+
+
+def test_sql_built_sketches_match_python_and_roll_up(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        start = datetime(2024, 1, 1)
+        conn.execute("""
+            CREATE TEMP TABLE staged AS
+            SELECT 'T' || i AS trade_id, NULL AS order_id, 'C' || (i % 2000) AS client_id, 'AAPL' AS symbol,
+                   'BUY' AS side, 1 AS quantity, 1.0 AS price, ? + to_minutes(i) AS timestamp
+            FROM range(6000) r(i)
+        """, [start])
+        load_encoded(conn, "trades", "staged")
+        update_trade_sketches(conn, "staged")
+
+        expected = HyperLogLog()
+        for i in range(2000):
+            expected.add(f"C{i}")
+        total = conn.execute("SELECT payload FROM trade_sketches WHERE sketch_type = 'clients_hll_total'").fetchone()[0]
+        assert HyperLogLog.from_bytes(total).registers == expected.registers
+        # The rollup and a merge of every hourly bucket agree
+        assert approximate_distinct(conn, "clients_hll")["estimate"] == expected.count()
+        assert approximate_distinct(conn, "clients_hll", since=start)["estimate"] == expected.count()
+        assert approximate_distinct(conn, "symbols_hll")["estimate"] == 1
+    finally:
+        conn.close()
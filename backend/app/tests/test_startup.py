@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.database import SCHEMA_VERSION, current_schema_version
+from app.core.security import create_access_token
+from app.core.startup import LAZY_MODULES
+from app.main import app
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# Loose wall-clock ceiling for `import app.main` in a fresh interpreter; it only catches gross
+# regressions (the laziness check is the real guard). Tighten it locally via the environment.
+IMPORT_BUDGET_SECONDS = float(os.environ.get("COMPLYLITE_IMPORT_BUDGET_SECONDS", "10"))
+
+
+def test_import_stays_lazy_and_within_budget():
+    code = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        "import app.main\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    print(f"import app.main: {result['seconds']:.3f}s (budget {IMPORT_BUDGET_SECONDS}s)")
+    assert result["loaded"] == []
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS, result
+
+
+def test_restart_skips_schema_init_and_warms_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "test.db"))
+    headers = {"Authorization": f"Bearer {create_access_token('admin', 'admin')}"}
+    with TestClient(app):
+        assert app.state.startup.schema_initialized is True
+        assert current_schema_version(app.state.db) == SCHEMA_VERSION
+
+    with TestClient(app) as client:
+        r = client.get("/api/v1/admin/startup", headers=headers)
+        assert r.status_code == 200
+        report = r.json()
+        assert report["schema_initialized"] is False
+        assert {"import", "open_database", "init_schema"} <= set(report["phases"])
+    # Shutdown waits for the warmup, which has imported the lazy modules and read the hot tables
+    warmup = app.state.startup.warmup
+    assert warmup["status"] == "done" and "scan trades" in warmup["steps"]
+    assert all(f"import {m}" in warmup["steps"] for m in LAZY_MODULES)
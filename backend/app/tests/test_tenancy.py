@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+from app.core.config import settings
+from app.core.tenancy import FairJobScheduler, TenantConnectionPool
+
+
+def test_pool_evicts_least_recently_used_idle_tenant(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "tenant_data_dir", str(tmp_path))
+    pool = TenantConnectionPool(max_open=2, idle_seconds=0, memory_limit=None)
+    try:
+        for tenant in ("a", "b"):
+            pool.acquire(tenant)
+            pool.release(tenant)
+        busy = pool.acquire("a")
+        pool.acquire("c")
+        # "b" was least recently used and idle; "a" is checked out
+        assert pool.open_tenants() == ["a", "c"]
+        assert busy.execute("SELECT COUNT(*) FROM trades").fetchone()[0] == 0
+        pool.release("a")
+        pool.release("c")
+        assert pool.evict_idle() == 2
+        assert (tmp_path / "b.db").exists()
+    finally:
+        pool.close()
+
+
+def test_scheduler_round_robins_between_tenants():
+    order = []
+    gate = threading.Event()
+
+    def job(name):
+        gate.wait(5)
+        order.append(name)
+
+    async def main():
+        scheduler = FairJobScheduler(max_concurrent=1)
+        jobs = [scheduler.submit("big", job, f"big-{i}") for i in range(3)]
+        jobs.append(scheduler.submit("small", job, "small-0"))
+        tasks = [asyncio.ensure_future(j) for j in jobs]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["big-0", "small-0", "big-1", "big-2"]
@@ -0,0 +1,94 @@
+import json
+
+import duckdb
+import pandas as pd
+from app.core.database import init_database, load_encoded, TABLE_COLUMNS
+from app.services.upload_validation import validate_upload
+
+
+def test_bad_rows_are_quarantined_and_good_rows_load(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        df = pd.DataFrame({
+            "trade_id": ["t1", "t2", "t3", "t4", "t4", "t6", "t7"],
+            "order_id": [None, None, None, None, None, "missing", None],
+            "client_id": ["C1"] * 7,
+            "symbol": ["AAPL"] * 7,
+            "side": ["buy", "HOLD", "SELL", "SELL", "BUY", "BUY", "SELL"],
+            "quantity": ["10", "10", "-5", "10", "10", "10", "10"],
+            "price": ["100.5", "100", "100", "100", "100", "100", "n/a"],
+            "timestamp": ["2024-09-08 09:30:00"] * 6 + ["yesterday-ish"],
+        })
+        conn.register("df_temp", df)
+        result = validate_upload(conn, "trades", TABLE_COLUMNS["trades"])
+        load_encoded(conn, "trades", "upload_valid")
+
+        assert result["accepted"] == 2
+        assert result["rejected"] == 5
+        assert conn.execute("SELECT list(trade_id ORDER BY trade_id) FROM trades").fetchone()[0] == ["t1", "t4"]
+        reasons = dict(conn.execute(
+            "SELECT source_row, reason FROM upload_quarantine WHERE upload_id = ?", [result["upload_id"]]
+        ).fetchall())
+        assert reasons == {
+            2: "invalid side",
+            3: "non-positive quantity",
+            5: "duplicate trade_id",
+            6: "unknown order_id",
+            7: "invalid timestamp; invalid price",
+        }
+    finally:
+        conn.close()
+
+
+def test_unknown_order_types_are_rejected(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        df = pd.DataFrame({
+            "order_id": ["o1", "o2", "o3", "o4"],
+            "client_id": ["C1"] * 4,
+            "trader_id": ["T1"] * 4,
+            "symbol": ["AAPL"] * 4,
+            "side": ["BUY"] * 4,
+            "quantity": ["10"] * 4,
+            "price": ["100"] * 4,
+            "timestamp": ["2024-09-08 09:30:00"] * 4,
+            "order_type": ["limit", "IOC", None, "STOP_LIMIT"],
+        })
+        conn.register("df_temp", df)
+        result = validate_upload(conn, "orders", TABLE_COLUMNS["orders"])
+        load_encoded(conn, "orders", "upload_valid")
+
+        assert result["rejection_reasons"] == {"invalid order_type": 1}
+        raw = conn.execute("SELECT source_row, raw_record FROM upload_quarantine").fetchall()
+        assert [(row, json.loads(record)["order_type"]) for row, record in raw] == [(2, "IOC")]
+        assert conn.execute("SELECT order_id, order_type FROM orders ORDER BY order_id").fetchall() == [
+            ("o1", "LIMIT"), ("o3", None), ("o4", "STOP_LIMIT"),
+        ]
+    finally:
+        conn.close()
+
+
+def test_quarantined_rows_keep_their_own_raw_record(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "test.db"))
+    try:
+        init_database(conn)
+        # Several Parquet files read as one source, as a chunked upload is finalized
+        for part in range(4):
+            conn.execute(f"""
+                COPY (
+                    SELECT 't{part}_' || i AS trade_id, NULL AS order_id, 'C1' AS client_id, 'AAPL' AS symbol,
+                           CASE WHEN i % 7 = 0 THEN 'HOLD' ELSE 'BUY' END AS side, '10' AS quantity,
+                           '100' AS price, '2024-09-08 09:30:00' AS timestamp
+                    FROM range(5000) r(i)
+                ) TO '{tmp_path / f"part{part}.parquet"}' (FORMAT PARQUET)
+            """)
+        conn.execute(f"CREATE TEMP VIEW parts AS SELECT * FROM read_parquet('{tmp_path / 'part*.parquet'}')")
+        result = validate_upload(conn, "trades", TABLE_COLUMNS["trades"], source="parts")
+
+        raw = conn.execute("SELECT reason, raw_record FROM upload_quarantine").fetchall()
+        assert result["rejected"] == len(raw) == 4 * 715
+        assert {(reason, json.loads(record)["side"]) for reason, record in raw} == {("invalid side", "HOLD")}
+    finally:
+        conn.close()
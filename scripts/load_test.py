@@ -0,0 +1,263 @@
+"""Async HTTP load test for the ComplyLite API.
+
+Replays a weighted mix of dashboard polling, alert paging, status updates,
+CSV uploads and detection runs against a running server (or one started
+locally with --start-server), reports throughput and latency percentiles per
+endpoint, and compares them with a committed baseline.
+
+    python scripts/load_test.py --start-server --duration 20 --concurrency 16
+    python scripts/load_test.py --start-server --write-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_BASELINE = ROOT / "scripts" / "load_baseline.json"
+
+# scenario name -> relative weight in the request mix
+MIX = {
+    "dashboard_stats": 25,
+    "dashboard_activity": 10,
+    "compliance_score": 10,
+    "alerts_page": 25,
+    "alert_status": 15,
+    "upload_trades": 5,
+    "run_detection": 5,
+    "table_info": 5,
+}
+
+
+def make_trades_csv(rng: random.Random, rows: int) -> bytes:
+    """Synthetic trades with enough repetition to trigger the detectors."""
+    now = datetime.now()
+    lines = ["trade_id,client_id,symbol,side,quantity,price,timestamp"]
+    for i in range(rows):
+        ts = now - timedelta(seconds=rng.randint(0, 6 * 3600))
+        lines.append(
+            f"LT_{i:07d},CLIENT_{rng.randint(0, 49):03d},{rng.choice(['AAPL', 'MSFT', 'TSLA', 'NVDA'])},"
+            f"{rng.choice(['BUY', 'SELL'])},{rng.choice([100, 200, 500])},{rng.choice([100.0, 100.5, 101.0])},"
+            f"{ts:%Y-%m-%d %H:%M:%S}"
+        )
+    return ("\n".join(lines) + "\n").encode()
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.throttled: dict[str, int] = {}
+
+    def add(self, name: str, seconds: float, status: int) -> None:
+        if status == 429:
+            self.throttled[name] = self.throttled.get(name, 0) + 1
+        elif status >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        else:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def report(self, elapsed: float) -> dict:
+        out = {}
+        for name in sorted(set(self.samples) | set(self.errors) | set(self.throttled)):
+            values = sorted(self.samples.get(name, []))
+
+            def pct(q):
+                return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2) if values else None
+
+            out[name] = {
+                "requests": len(values),
+                "errors": self.errors.get(name, 0),
+                "throttled": self.throttled.get(name, 0),
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": pct(0.50),
+                "p95_ms": pct(0.95),
+                "p99_ms": pct(0.99),
+            }
+        return out
+
+
+async def run_scenario(name: str, client: httpx.AsyncClient, rng: random.Random, state: dict):
+    if name == "dashboard_stats":
+        return await client.get("/api/v1/dashboard/stats")
+    if name == "dashboard_activity":
+        return await client.get("/api/v1/dashboard/recent-activity")
+    if name == "compliance_score":
+        return await client.get("/api/v1/dashboard/compliance-score")
+    if name == "table_info":
+        return await client.get("/api/v1/data/tables/info")
+    if name == "alerts_page":
+        r = await client.get("/api/v1/alerts/", params={"limit": 50, "offset": rng.choice([0, 50, 100])})
+        if r.status_code == 200 and r.json():
+            state["alert_ids"] = [a["alert_id"] for a in r.json()]
+        return r
+    if name == "alert_status":
+        if not state.get("alert_ids"):
+            return await client.get("/api/v1/alerts/", params={"limit": 50})
+        alert_id = rng.choice(state["alert_ids"])
+        status = rng.choice(["OPEN", "IN_REVIEW", "CLOSED"])
+        return await client.put(f"/api/v1/alerts/{alert_id}/status", params={"status": status})
+    if name == "upload_trades":
+        files = {"file": ("trades.csv", state["trades_csv"], "text/csv")}
+        return await client.post("/api/v1/data/upload/csv", files=files, data={"table_type": "trades"})
+    if name == "run_detection":
+        return await client.post("/api/v1/data/run-detection")
+    raise ValueError(name)
+
+
+async def worker(client, deadline: float, recorder: Recorder, rng: random.Random, state: dict):
+    names, weights = zip(*MIX.items())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = await run_scenario(name, client, rng, state)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 599
+        recorder.add(name, time.perf_counter() - started, status)
+
+
+async def run_load(base_url: str, duration: float, concurrency: int, upload_rows: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    state = {"trades_csv": make_trades_csv(rng, upload_rows)}
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        # Prime the database so reads have data to work on
+        files = {"file": ("trades.csv", state["trades_csv"], "text/csv")}
+        (await client.post("/api/v1/data/upload/csv", files=files, data={"table_type": "trades"})).raise_for_status()
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            worker(client, deadline, recorder, random.Random(seed + i), state) for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    endpoints = recorder.report(elapsed)
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "duration_s": round(elapsed, 2),
+        "concurrency": concurrency,
+        "total_requests": total,
+        "total_rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, min_samples: int = 30) -> list[str]:
+    """Regressions of p95 latency (slower by more than `tolerance`) or lost throughput.
+
+    Endpoints with fewer than `min_samples` requests only fail on errors; their
+    p95 is too noisy to gate on.
+    """
+    problems = []
+    for name, base in baseline.get("endpoints", {}).items():
+        current = result["endpoints"].get(name)
+        if current is None or not current["requests"]:
+            problems.append(f"{name}: no successful requests")
+            continue
+        enough = current["requests"] >= min_samples and base.get("requests", 0) >= min_samples
+        if enough and base.get("p95_ms") and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p95 {current['p95_ms']} ms > baseline {base['p95_ms']} ms (+{tolerance:.0%})")
+        if current["errors"]:
+            problems.append(f"{name}: {current['errors']} errors")
+    if result["total_rps"] < baseline.get("total_rps", 0) * (1 - tolerance):
+        problems.append(f"total throughput {result['total_rps']} rps < baseline {baseline['total_rps']} rps (-{tolerance:.0%})")
+    return problems
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir: str) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        COMPLYLITE_DATABASE_URL=os.path.join(workdir, "loadtest.db"),
+        COMPLYLITE_ARCHIVE_DIR=os.path.join(workdir, "archive"),
+        # The load generator is a single client IP; don't let the limiter skew results
+        COMPLYLITE_RATE_LIMIT_DEFAULT_PER_MINUTE="0",
+        COMPLYLITE_RATE_LIMIT_RULES="{}",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT / "backend",
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("Server did not start")
+
+
+def print_report(result: dict) -> None:
+    print(f"{'endpoint':<22}{'reqs':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>6}{'429':>6}")
+    for name, e in result["endpoints"].items():
+        print(f"{name:<22}{e['requests']:>7}{e['rps']:>9}{e['p50_ms'] or '-':>9}{e['p95_ms'] or '-':>9}"
+              f"{e['p99_ms'] or '-':>9}{e['errors']:>6}{e['throttled']:>6}")
+    print(f"total: {result['total_requests']} requests, {result['total_rps']} rps over {result['duration_s']} s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--start-server", action="store_true", help="start a server on a temp database")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--upload-rows", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative regression")
+    parser.add_argument("--min-samples", type=int, default=30, help="requests needed to gate on p95")
+    parser.add_argument("--write-baseline", action="store_true")
+    parser.add_argument("--json", type=Path, help="also write the result to this file")
+    args = parser.parse_args()
+
+    proc = None
+    with tempfile.TemporaryDirectory() as workdir:
+        base_url = args.base_url
+        if args.start_server:
+            proc, base_url = start_server(workdir)
+        try:
+            result = asyncio.run(run_load(base_url, args.duration, args.concurrency, args.upload_rows, args.seed))
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=10)
+
+    print_report(result)
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2))
+    if args.write_baseline:
+        args.baseline.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print("no baseline to compare against")
+        return 0
+    problems = compare(result, json.loads(args.baseline.read_text()), args.tolerance, args.min_samples)
+    for problem in problems:
+        print("REGRESSION:", problem)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())